@@ -1,3 +1,5 @@
+from pathlib import Path
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from app import constants
@@ -18,10 +20,10 @@ class Settings(BaseSettings):
     # Path to the pre-downloaded ONNX model directory (used when ocr_engine="onnx").
     onnx_model_path: str = "/opt/hf_cache/florence2-onnx"
 
-    # HuggingFace model name used to load the processor/tokenizer for the ONNX engine.
-    # Must be resolvable via the standard HF cache — the flat local_dir layout used for
-    # the ONNX weights doesn't include the custom tokenizer Python files that
-    # trust_remote_code needs. Defaults to the source model of the ONNX export.
+    # HuggingFace model name whose cached tokenizer.json / preprocessor_config.json
+    # the ONNX engine falls back to when they are not in ONNX_MODEL_PATH.
+    # Only the standard HF cache is read (no network, no trust_remote_code).
+    # Defaults to the source model of the ONNX export.
     onnx_processor_name: str = constants.FLORENCE2_PROCESSOR_MODEL
 
     # HuggingFace model name or local path for the PyTorch engine (used when ocr_engine="pytorch").
@@ -32,18 +34,244 @@ class Settings(BaseSettings):
     # Set PYTORCH_FLORENCE2_REVISION in the environment to override.
     pytorch_florence2_revision: str = constants.FLORENCE2_PYTORCH_REVISION
 
+    # PyTorch Florence-2 inference (used when ocr_engine="pytorch").
+    # PYTORCH_KV_CACHE decodes greedily on the decoder's cached keys/values
+    # instead of re-running the whole prefix per token (ignored with beam
+    # search). PYTORCH_NUM_THREADS sets torch's intra-op threads when no CPU
+    # budget applies (0 = torch default). PYTORCH_INT8 dynamically quantizes
+    # the linear layers to int8; PYTORCH_BF16 runs under bf16 autocast on CPUs
+    # with native bf16 (AVX512-BF16/AMX) and is ignored elsewhere. Both can
+    # change the transcription, so check the fixture set with
+    # scripts/benchmark_pytorch_ocr.py before enabling either.
+    pytorch_kv_cache: bool = True
+    pytorch_num_threads: int = 0
+    pytorch_int8: bool = False
+    pytorch_bf16: bool = False
+
     # Pinned revision of the GLiNER model to load from the HF cache.
     # Must match the revision used in the Dockerfile snapshot_download step.
     # Set GLINER_MODEL_REVISION in the environment to override.
     gliner_model_revision: str = constants.GLINER_REVISION
 
-    # ONNX Runtime thread count per session.
+    # GLiNER model for the PyTorch NLP engine. GLINER_LABEL_EMBEDDINGS
+    # encodes the fixed label set once at load so each request only encodes
+    # the OCR text; it needs a bi-encoder model (e.g.
+    # knowledgator/gliner-bi-large-v1.0, with GLINER_MODEL_REVISION set to
+    # one of its revisions). PyTorch engine only. Compare against the
+    # default model with scripts/benchmark_label_embeddings.py first.
+    gliner_model_name: str = constants.GLINER_MODEL
+    gliner_label_embeddings: bool = False
+
+    # Which NLP engine to use at runtime.
+    # Options: "gliner" (PyTorch), "gliner_onnx" (ONNX Runtime). The ONNX
+    # engine loads GLINER_ONNX_MODEL_FILE from GLINER_ONNX_MODEL_PATH, a
+    # directory written by scripts/export_gliner_onnx.py; model_int8.onnx is
+    # the dynamically int8-quantized graph, model.onnx the float export.
+    nlp_engine: str = "gliner"
+    gliner_onnx_model_path: str = "/opt/hf_cache/gliner-onnx"
+    gliner_onnx_model_file: str = "model_int8.onnx"
+
+    # Concurrent NLP requests arriving within NLP_BATCH_WINDOW_MS are run
+    # through GLiNER as one batch of up to NLP_MAX_BATCH_SIZE texts; set the
+    # max to 1 to disable.
+    nlp_max_batch_size: int = 8
+    nlp_batch_window_ms: float = 5.0
+
+    # Geometry-based pruning of OCR regions before GLiNER. Regions shorter
+    # than NLP_PRUNE_MIN_HEIGHT_RATIO x the tallest region are dropped, as
+    # are regions shorter than NLP_PRUNE_FINE_PRINT_HEIGHT_RATIO x the tallest
+    # with more than NLP_PRUNE_FINE_PRINT_MAX_WORDS words (blurbs, quotes,
+    # series lines). On the fixture covers the smallest true author is 0.27x
+    # the tallest region and reviewer quotes are at most 0.10x. Set a ratio
+    # to 0 to disable its rule.
+    nlp_prune_min_height_ratio: float = 0.2
+    nlp_prune_fine_print_height_ratio: float = 0.4
+    nlp_prune_fine_print_max_words: int = 3
+
+    # Name index written by scripts/build_name_index.py (known first names and
+    # surnames). When set, covers with exactly one all-caps first name +
+    # surname are answered from the index and GLiNER only runs for the rest.
+    # Empty disables the cascade.
+    name_index_path: str = ""
+
+    # Offline model bundle built by `scripts/sync_onnx_model.py --bundle`.
+    # When set, the ONNX Florence-2 graphs, embedding table, optimized graphs
+    # and GLiNER are all loaded from it and ONNX_MODEL_PATH (and, with
+    # NLP_ENGINE=gliner_onnx, GLINER_ONNX_MODEL_PATH) is ignored. Each
+    # file is checked against the manifest's sizes at start-up;
+    # MODEL_BUNDLE_VERIFY=true also checks SHA-256, reading the whole bundle.
+    model_bundle_path: str | None = None
+    model_bundle_verify: bool = False
+
+    # Warm-up after the models load: the pipeline runs on WARMUP_IMAGE_PATH
+    # (default: the cover bundled in app/assets) so the first real request
+    # doesn't pay for ORT arena growth and lazy allocations. GET /ready
+    # returns 200 only once a run finishes within WARMUP_LATENCY_BUDGET_MS
+    # (0 = any), retrying up to WARMUP_MAX_RUNS times. With WARMUP=false
+    # the service is ready as soon as the models load.
+    warmup: bool = True
+    warmup_image_path: str | None = None
+    warmup_latency_budget_ms: float = 0
+    warmup_max_runs: int = 3
+
+    # Quantization variant of the ONNX graphs to load: the suffix of the
+    # onnx-community export files ("q4", "int8", "fp16", ... or "" for fp32).
+    onnx_quantization: str = "q4"
+
+    # Per-session overrides of ONNX_QUANTIZATION for the vision encoder, text
+    # encoder and merged decoder (embed_tokens always follows
+    # ONNX_QUANTIZATION). Unset means ONNX_QUANTIZATION. Compare mixes with
+    # scripts/benchmark_quantization.py before changing them.
+    # ONNX_VISION_QUANTIZATION=qdq_int8 loads the statically quantized encoder
+    # built by scripts/quantize_vision_encoder.py.
+    onnx_vision_quantization: str | None = None
+    onnx_encoder_quantization: str | None = None
+    onnx_decoder_quantization: str | None = None
+
+    # Startup autotune for the ONNX engine. When enabled, the fixture covers
+    # in ONNX_AUTOTUNE_IMAGES_DIR are run through every available
+    # quantization variant at a range of thread counts, and the fastest
+    # configuration that still passes the fixture keyword checks replaces
+    # ONNX_QUANTIZATION and the OCR thread count. The result is persisted to
+    # ONNX_AUTOTUNE_PATH (default: autotune.json in ONNX_MODEL_PATH) and
+    # reused until the CPU, ONNX Runtime version or model revision changes.
+    # The search takes several minutes; run scripts/autotune_onnx.py ahead
+    # of time to keep it off the startup path. Without persisted results or
+    # fixture images the configured settings are used unchanged. The
+    # default images dir is the repo's fixtures; the Docker image ships them
+    # and sets ONNX_AUTOTUNE_IMAGES_DIR.
+    onnx_autotune: bool = False
+    onnx_autotune_images_dir: str = str(Path(__file__).resolve().parent.parent / "tests" / "integration" / "images")
+    onnx_autotune_path: str | None = None
+
+    # ONNX Runtime thread count per session when CPU_BUDGET is disabled.
     # Set ONNX_NUM_THREADS in the environment or .env to override.
     # Rule of thumb: match the number of physical cores available to the
     # container. Setting it too high (past physical cores) causes contention
     # and significant slowdowns — see benchmark results in issue #12.
     onnx_num_threads: int = 4
 
+    # Micro-batching for the ONNX vision + text encoder stage.
+    # Concurrent requests arriving within ONNX_BATCH_WINDOW_MS of each other
+    # are encoded in a single batched run, up to ONNX_MAX_BATCH_SIZE images.
+    # Set ONNX_MAX_BATCH_SIZE=1 to disable batching.
+    # Trade-off: a lone request always waits the full window before the
+    # encoder runs, so this adds up to ONNX_BATCH_WINDOW_MS of latency at
+    # low load. Keep it small relative to per-request inference time.
+    onnx_max_batch_size: int = 4
+    onnx_batch_window_ms: float = 5.0
+
+    # Maximum number of sequences the ONNX decoder has in flight at once.
+    # Requests encoded in the same batch are decoded as one cohort sharing a
+    # decoder call per token; requests that arrive later form their own
+    # cohort (rows of different lengths can't share a call). Cohorts run on
+    # the OCR executor, so at most OCR_WORKERS decode at once. Queued
+    # requests start as capacity frees.
+    onnx_max_decode_batch: int = 8
+
+    # Run decode steps through an ONNX Runtime IOBinding: encoder states and
+    # pinned encoder KV stay bound per cohort and decoder KV is handed back to
+    # ORT as OrtValues instead of numpy feeds. Off by default — it measured at
+    # parity with the feed-dict path on a synthetic Florence-sized decoder, so
+    # enable it only after benchmarking on the target host.
+    onnx_decode_io_binding: bool = False
+
+    # Run each generation as a single session.run on the in-graph greedy
+    # generator built by scripts/export_greedy_generate.py (an ONNX Loop over
+    # the merged decoder with ArgMax + EOS stop inside the graph). Requests are
+    # generated one per run, up to OCR_WORKERS in parallel, instead
+    # of sharing per-step decoder calls. Requires the exported
+    # greedy_generate_<quantization>.onnx next to the other ONNX graphs.
+    onnx_in_graph_generation: bool = False
+
+    # Persist the ONNX embedding table next to the model as an .npy keyed by
+    # model revision, quantization and dtype, and memory-map it on start-up.
+    # Skips ~50 embed_tokens runs per start and lets workers on the same host
+    # share the table through the page cache. ONNX_EMBEDDING_DTYPE=float16
+    # halves the table (~79 MB instead of ~157 MB); looked-up rows are upcast
+    # to float32, but fp16 rounding can change greedy output, so check
+    # accuracy on the fixture set before switching.
+    onnx_embedding_cache: bool = True
+    onnx_embedding_dtype: str = "float32"
+
+    # Save each ONNX session's graph after ORT's optimization passes and load
+    # it directly on later starts, skipping graph optimization at boot
+    # (ONNX_OPTIMIZED_CACHE). Files are keyed by source graph, ORT version,
+    # optimization level and CPU features, so an upgrade or a new host
+    # rebuilds them. ONNX_OPTIMIZED_CACHE_DIR defaults to
+    # ONNX_MODEL_PATH/onnx/optimized; if it isn't writable the graphs are
+    # optimized at every start as before.
+    onnx_optimized_cache: bool = True
+    onnx_optimized_cache_dir: str | None = None
+
+    # Image decoding for both OCR engines. Uploads whose header dimensions
+    # exceed IMAGE_MAX_PIXELS are rejected before any pixels are decoded.
+    # JPEGs are decoded at the smallest DCT scale that keeps both sides at
+    # least IMAGE_DECODE_SIZE (Florence-2's 768 px input); set it to 0 to
+    # always decode at full resolution.
+    image_max_pixels: int = 50_000_000
+    image_decode_size: int = 768
+
+    # Content-addressed cache of successful /analyze responses, keyed by a
+    # SHA-256 of the image bytes plus the pinned model revisions and the
+    # settings that affect output. RESULT_CACHE_SIZE bounds the in-memory LRU
+    # (0 disables caching). Set RESULT_CACHE_DIR to also persist entries as
+    # JSON files that survive restarts; RESULT_CACHE_DISK_MAX_ENTRIES bounds
+    # that tier, pruning least recently used files first.
+    result_cache_size: int = 1024
+    result_cache_dir: str | None = None
+    result_cache_disk_max_entries: int = 100_000
+
+    # Near-duplicate cache: a perceptual hash (64-bit DCT pHash) of each
+    # successfully analysed photo is indexed, and a later upload within
+    # NEAR_DUPLICATE_MAX_DISTANCE bits reuses that result, skipping OCR and
+    # NLP. NEAR_DUPLICATE_CACHE_SIZE bounds the in-memory index (0 disables).
+    # Off by default: scripts/benchmark_near_duplicate.py shows distance 8
+    # catches re-compression, lighting changes, 1-degree rotations and
+    # 1% crops with no false matches among the fixture covers, but the false
+    # match rate across a large catalogue has not been measured.
+    near_duplicate_cache_size: int = 0
+    near_duplicate_max_distance: int = 8
+
+    # CPU budget shared by the OCR and NLP stages. The usable core count is
+    # read from the container's cgroup CPU quota (capped by the affinity
+    # mask) unless CPU_BUDGET_CORES is set; ONNX Runtime sessions get
+    # CPU_BUDGET_OCR_SHARE of it and GLiNER's torch threads get the rest, so
+    # OCR and NLP running together don't oversubscribe the container. While
+    # no OCR is running, CPU_BUDGET_REBALANCE lets NLP use every core.
+    # ONNX_GLOBAL_THREAD_POOL makes all ONNX sessions share one ORT thread
+    # pool; CPU_AFFINITY pins OCR and NLP threads to disjoint cores (ORT
+    # intra-op pinning needs per-session pools, so it is skipped with the
+    # global pool). With CPU_BUDGET=false, ONNX_NUM_THREADS applies and
+    # torch keeps its default of one thread per core.
+    cpu_budget: bool = True
+    cpu_budget_cores: int = 0
+    cpu_budget_ocr_share: float = 0.5
+    cpu_budget_rebalance: bool = True
+    onnx_global_thread_pool: bool = False
+    cpu_affinity: bool = False
+
+    # Worker threads for each pipeline stage's dedicated executor. Image
+    # decode (and perceptual hashing), OCR model runs and NLP model runs each
+    # get their own pool instead of sharing asyncio's default executor, so
+    # OCR of one request overlaps NLP of another without queueing behind it.
+    # Every ONNX Runtime / torch call also runs its stage's intra-op threads
+    # (see CPU_BUDGET), so keep OCR_WORKERS and NLP_WORKERS small: the OCR
+    # stage already batches concurrent requests into one encoder run.
+    decode_workers: int = 2
+    ocr_workers: int = 1
+    nlp_workers: int = 1
+
+    # Admission control for the OCR + NLP pipeline. At most
+    # ADMISSION_MAX_CONCURRENCY analyses run at once and ADMISSION_MAX_QUEUE
+    # more wait for a slot; beyond that /analyze fails fast with 503 and a
+    # Retry-After estimated from recent pipeline latency, instead of queueing
+    # until the mobile client times out. Cache hits are never queued.
+    # Keep concurrency at or above ONNX_MAX_BATCH_SIZE so micro-batching still
+    # sees concurrent requests. Set ADMISSION_MAX_CONCURRENCY=0 to disable.
+    admission_max_concurrency: int = 8
+    admission_max_queue: int = 16
+
     # When true, serves the static test webapp at /test/.
     # Set ENABLE_TEST_APP=true in the environment or .env to enable.
     # Disabled by default — not intended for production use.
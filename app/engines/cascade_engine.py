@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import logging
+import statistics
+import time
+from collections import deque
+
+from prometheus_client import Counter, Gauge
+
+from app.engines.name_index_engine import NameIndexNlpEngine
+from app.interfaces.nlp import NlpEngine
+from app.models import NlpAnalysis, OcrResult
+
+logger = logging.getLogger(__name__)
+
+# Requests the share and p50 gauges are computed over.
+STATS_WINDOW = 1000
+
+_REQUESTS = Counter(
+    "cover_detection_nlp_cascade_requests_total",
+    "NLP requests by the cascade stage that answered them",
+    ["engine"],
+)
+_SKIP_SHARE = Gauge(
+    "cover_detection_nlp_gliner_skipped_ratio",
+    f"Share of the last {STATS_WINDOW} NLP requests answered by the name index without GLiNER",
+)
+_P50 = Gauge(
+    "cover_detection_nlp_latency_p50_seconds",
+    f"Median NLP latency over the last {STATS_WINDOW} requests",
+)
+
+
+class CascadingNlpEngine(NlpEngine):
+    """Name-index lookup first, the model only when the index isn't sure.
+
+    Covers with a single unambiguous all-caps first name + surname are
+    answered from the index in well under a millisecond; everything else
+    goes to ``fallback`` (GLiNER), unchanged. The gauges are computed at
+    scrape time from a window of recent requests, so recording costs one
+    deque append.
+    """
+
+    def __init__(self, index: NameIndexNlpEngine, fallback: NlpEngine, window: int = STATS_WINDOW):
+        self._index = index
+        self._fallback = fallback
+        self._skipped: deque[bool] = deque(maxlen=window)
+        self._latencies: deque[float] = deque(maxlen=window)
+        _SKIP_SHARE.set_function(self.skipped_share)
+        _P50.set_function(self.p50_latency)
+
+    def skipped_share(self) -> float:
+        return sum(self._skipped) / len(self._skipped) if self._skipped else 0.0
+
+    def p50_latency(self) -> float:
+        return statistics.median(self._latencies) if self._latencies else 0.0
+
+    async def analyze(self, ocr_result: OcrResult) -> NlpAnalysis:
+        t0 = time.perf_counter()
+        analysis = self._index.match(ocr_result)
+        skipped = analysis is not None
+        if analysis is None:
+            analysis = await self._fallback.analyze(ocr_result)
+        duration = time.perf_counter() - t0
+        _REQUESTS.labels(engine="name_index" if skipped else "gliner").inc()
+        self._skipped.append(skipped)
+        self._latencies.append(duration)
+        logger.debug(
+            "NLP cascade completed",
+            extra={"engine": "name_index" if skipped else "gliner", "duration_ms": round(duration * 1000, 1)},
+        )
+        return analysis
@@ -1,13 +1,21 @@
 import asyncio
-import io
+import contextlib
+import logging
+import time
 
 import torch
 import transformers.dynamic_module_utils as _dmu
 from PIL import Image
 from transformers import AutoModelForCausalLM, AutoProcessor
 
+from app.config import settings
+from app.engines.florence2_processing import _build_ocr_result
 from app.interfaces.ocr import OcrEngine
-from app.models import OcrBoundingBox, OcrResult
+from app.models import OcrResult
+from app.services.autotune import cpu_isa_features
+from app.services.cpu_budget import CpuBudget, set_torch_threads
+from app.services.executors import DECODE, OCR, stage_executor
+from app.services.images import decode_image
 
 # Florence-2's modeling file unconditionally imports flash_attn, which is
 # CUDA-only and cannot be installed on CPU. Patch get_imports so the
@@ -22,11 +30,55 @@ def _get_imports_no_flash_attn(filename: str) -> list[str]:
 
 _dmu.get_imports = _get_imports_no_flash_attn
 
+logger = logging.getLogger(__name__)
+
+_TASK = "<OCR_WITH_REGION>"
+_MAX_NEW_TOKENS = 1024
+# CPU features with native bf16 matmul; elsewhere bf16 autocast is slower than fp32.
+_NATIVE_BF16 = frozenset({"avx512_bf16", "amx_bf16", "bf16"})
+
 
 class Florence2OcrEngine(OcrEngine):
-    def __init__(self, model_name: str = "microsoft/Florence-2-base", revision: str | None = None, gpu: bool = False, num_beams: int = 1) -> None:
+    """Florence-2 OCR engine using PyTorch and the model's remote code.
+
+    With ``kv_cache`` (and ``num_beams=1``) generation is a greedy loop that
+    runs the language model one token at a time on its cached keys and
+    values. ``generate()`` is not used for this: the remote code's
+    ``prepare_inputs_for_generation`` fails on the cache objects created by
+    current transformers, which is why the fallback path runs it with
+    ``use_cache=False`` and re-decodes the whole prefix for every token.
+
+    ``int8`` dynamically quantizes every ``nn.Linear`` to int8 and ``bf16``
+    runs inference under bf16 autocast. bf16 is only used on CPUs with
+    native bf16 instructions. Inference always runs in
+    ``torch.inference_mode()``.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "microsoft/Florence-2-base",
+        revision: str | None = None,
+        gpu: bool = False,
+        num_beams: int = 1,
+        cpu_budget: CpuBudget | None = None,
+        kv_cache: bool | None = None,
+        num_threads: int | None = None,
+        int8: bool | None = None,
+        bf16: bool | None = None,
+    ) -> None:
+        t0 = time.perf_counter()
         device = "cuda" if gpu else "cpu"
         dtype = torch.float16 if gpu else torch.float32
+        int8 = int8 if int8 is not None else settings.pytorch_int8
+        bf16 = bf16 if bf16 is not None else settings.pytorch_bf16
+        if int8 and bf16:
+            raise ValueError("int8 and bf16 are mutually exclusive; enable at most one")
+        if (int8 or bf16) and gpu:
+            raise ValueError("int8 and bf16 are CPU options; the GPU path already runs in float16")
+        if bf16 and not cpu_isa_features() & _NATIVE_BF16:
+            logger.warning("bf16 requested but this CPU has no native bf16 support; using float32")
+            bf16 = False
+
         self._model = AutoModelForCausalLM.from_pretrained(
             model_name,
             revision=revision,
@@ -34,54 +86,119 @@ class Florence2OcrEngine(OcrEngine):
             trust_remote_code=True,
             attn_implementation="eager"
         ).to(device)
+        self._model.eval()
+        if int8:
+            self._model = torch.ao.quantization.quantize_dynamic(self._model, {torch.nn.Linear}, dtype=torch.qint8)
         self._processor = AutoProcessor.from_pretrained(
             model_name, trust_remote_code=True
         )
         self._device = device
         self._dtype = dtype
         self._num_beams = num_beams
+        self._kv_cache = (kv_cache if kv_cache is not None else settings.pytorch_kv_cache) and num_beams == 1
+        self._bf16 = bf16
+        self._cpu_budget = cpu_budget
+        self._num_threads = num_threads if num_threads is not None else settings.pytorch_num_threads
+        self._decode_executor = stage_executor(DECODE)
+        self._ocr_executor = stage_executor(OCR)
+        logger.info(
+            "Florence2 PyTorch engine initialized",
+            extra={
+                "model": model_name,
+                "kv_cache": self._kv_cache,
+                "int8": int8,
+                "bf16": bf16,
+                "duration_ms": round((time.perf_counter() - t0) * 1000, 1),
+            },
+        )
 
     async def extract_text(self, image_bytes: bytes) -> OcrResult:
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
         loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, lambda: self._run_ocr(image))
+        image, image_size = await loop.run_in_executor(self._decode_executor, decode_image, image_bytes)
+        return await loop.run_in_executor(self._ocr_executor, self._run_ocr, image, image_size)
 
-    def _run_ocr(self, image: Image.Image) -> OcrResult:
-        task = "<OCR_WITH_REGION>"
-        inputs = self._processor(text=task, images=image, return_tensors="pt")
+    def _run_ocr(self, image: Image.Image, image_size: tuple[int, int]) -> OcrResult:
+        if self._cpu_budget is not None:
+            set_torch_threads(self._cpu_budget.ocr_threads)
+        elif self._num_threads:
+            set_torch_threads(self._num_threads)
+        inputs = self._processor(text=_TASK, images=image, return_tensors="pt")
         input_ids = inputs["input_ids"].to(self._device)
         pixel_values = inputs["pixel_values"].to(self._device, self._dtype)
-        generated_ids = self._model.generate(
-            input_ids=input_ids,
-            pixel_values=pixel_values,
-            max_new_tokens=1024,
-            use_cache=False,
-            num_beams=self._num_beams,
-            do_sample=False,
-            early_stopping=self._num_beams > 1,
-        )
+        autocast = torch.autocast("cpu", dtype=torch.bfloat16) if self._bf16 else contextlib.nullcontext()
+        with torch.inference_mode(), autocast:
+            if self._kv_cache:
+                generated_ids = [self._greedy_generate(input_ids, pixel_values)]
+            else:
+                generated_ids = self._model.generate(
+                    input_ids=input_ids,
+                    pixel_values=pixel_values,
+                    max_new_tokens=_MAX_NEW_TOKENS,
+                    use_cache=False,
+                    num_beams=self._num_beams,
+                    do_sample=False,
+                    early_stopping=self._num_beams > 1,
+                )
         generated_text = self._processor.batch_decode(
             generated_ids, skip_special_tokens=False
         )[0]
         parsed = self._processor.post_process_generation(
             generated_text,
-            task=task,
-            image_size=(image.width, image.height),
+            task=_TASK,
+            image_size=image_size,
         )
-        return _build_ocr_result(parsed[task])
+        return _build_ocr_result(parsed[_TASK])
 
+    def _greedy_generate(self, input_ids: torch.Tensor, pixel_values: torch.Tensor) -> list[int]:
+        """Greedy decoding with a KV cache, matching ``generate(num_beams=1)``.
+
+        The image and prompt are encoded once. Each step then feeds only the
+        previous token to the decoder along with its cached keys and values.
+        The model's ``forced_bos_token_id``, ``forced_eos_token_id`` and
+        ``no_repeat_ngram_size`` generation settings are applied as
+        ``generate()`` would.
+        """
+        model = self._model
+        language_model = model.language_model
+        config = language_model.generation_config
+        eos_token_id = config.eos_token_id
+        forced_bos = getattr(config, "forced_bos_token_id", None)
+        forced_eos = getattr(config, "forced_eos_token_id", None)
+        no_repeat = getattr(config, "no_repeat_ngram_size", 0) or 0
+
+        inputs_embeds = model.get_input_embeddings()(input_ids)
+        image_features = model._encode_image(pixel_values)
+        inputs_embeds, attention_mask = model._merge_input_ids_with_image_features(image_features, inputs_embeds)
+        encoder_outputs = language_model.get_encoder()(inputs_embeds=inputs_embeds, attention_mask=attention_mask)
+
+        tokens = [config.decoder_start_token_id]
+        seen_ngrams: dict[tuple[int, ...], set[int]] = {}
+        past_key_values = None
+        for step in range(_MAX_NEW_TOKENS):
+            outputs = language_model(
+                encoder_outputs=encoder_outputs,
+                attention_mask=attention_mask,
+                decoder_input_ids=torch.tensor([tokens[-1:]], device=self._device),
+                past_key_values=past_key_values,
+                use_cache=True,
+            )
+            past_key_values = outputs.past_key_values
+            if step == 0 and forced_bos is not None:
+                token = forced_bos
+            elif step == _MAX_NEW_TOKENS - 1 and forced_eos is not None:
+                token = forced_eos
+            else:
+                logits = outputs.logits[0, -1]
+                if no_repeat and len(tokens) >= no_repeat - 1:
+                    banned = seen_ngrams.get(tuple(tokens[len(tokens) - no_repeat + 1:]))
+                    if banned:
+                        logits = logits.clone()
+                        logits[list(banned)] = float("-inf")
+                token = int(logits.argmax())
+            tokens.append(token)
+            if no_repeat and len(tokens) >= no_repeat:
+                seen_ngrams.setdefault(tuple(tokens[-no_repeat:-1]), set()).add(token)
+            if token == eos_token_id:
+                break
+        return tokens
 
-def _build_ocr_result(ocr_data: dict) -> OcrResult:
-    # quad is flat [x1,y1,x2,y2,x3,y3,x4,y4] in pixel-space
-    regions = [
-        OcrBoundingBox(
-            text=label,
-            confidence=1.0,  # Florence-2 has no per-region confidence
-            coordinates=[[q[i], q[i + 1]] for i in range(0, 8, 2)],
-        )
-        for q, label in zip(
-            ocr_data.get("quad_boxes", []),
-            ocr_data.get("labels", []),
-        )
-    ]
-    return OcrResult(text=" ".join(r.text for r in regions), regions=regions)
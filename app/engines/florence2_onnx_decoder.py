@@ -0,0 +1,342 @@
+import logging
+import threading
+from concurrent.futures import Executor, Future, InvalidStateError
+from dataclasses import dataclass, field
+from typing import Callable
+
+import numpy as np
+import onnxruntime as ort
+from prometheus_client import Gauge
+
+from app.services.executors import OCR, stage_executor
+
+logger = logging.getLogger(__name__)
+
+_NUM_HEADS = 12
+_HEAD_DIM = 64
+
+_ACTIVE_SEQUENCES = Gauge(
+    "cover_detection_decode_active_sequences",
+    "Sequences currently being decoded by the continuous-batching decoder",
+)
+
+
+@dataclass
+class _Sequence:
+    max_tokens: int
+    future: Future | None = None
+    tokens: list[int] = field(default_factory=list)
+
+    def cancelled(self) -> bool:
+        return self.future is not None and self.future.cancelled()
+
+    def drop_cancelled(self) -> None:
+        """Acknowledge a cancelled future so ``concurrent.futures.wait`` callers wake up."""
+        self.future.set_running_or_notify_cancel()
+
+
+@dataclass
+class _Cohort:
+    """Sequences decoded in lockstep — every row has the same decoder length."""
+    sequences: list[_Sequence]
+    encoder_hidden: np.ndarray
+    encoder_mask: np.ndarray
+    logits: np.ndarray
+    encoder_kv: list[np.ndarray]
+    decoder_kv: list  # np.ndarray, or ort.OrtValue when decoding with IOBinding
+    binding: ort.IOBinding | None = None
+
+
+def _take_rows(value, rows: list[int]) -> np.ndarray:
+    """Slice batch rows from a numpy array or an OrtValue (copied out of ORT memory)."""
+    array = value if isinstance(value, np.ndarray) else value.numpy()
+    return array[rows]
+
+
+def _settle(seq: _Sequence, result: list[int] | None = None, error: Exception | None = None) -> None:
+    """Resolve a sequence's future unless it is already done or was cancelled."""
+    if seq.future is None or seq.future.done():
+        return
+    try:
+        if error is not None:
+            seq.future.set_exception(error)
+        else:
+            seq.future.set_result(result)
+    except InvalidStateError:
+        pass  # cancelled by the caller between the check and the set
+
+
+class ContinuousBatchDecoder:
+    """Greedy decoder for the Florence-2 merged decoder, batched per cohort.
+
+    Rows submitted together (one encode batch) are prefilled in one call and
+    then stepped in lockstep, one ``session.run`` per token for the whole
+    cohort. Rows leave between steps as they hit EOS, ``max_tokens`` or are
+    cancelled, and their KV rows are sliced out so the remaining rows keep
+    going. Queued rows join whenever capacity (``max_active``) frees up.
+
+    Rows of different decoder lengths are never merged into one call: the
+    merged decoder has no decoder-side attention mask and derives positions
+    from the past KV length, so padded KV would change the output. Instead
+    each cohort runs as one task on ``executor`` (the OCR stage executor by
+    default), so cohorts that arrived at different times decode in parallel
+    up to its worker count. Every session call already uses the OCR intra-op
+    threads, so OCR_WORKERS bounds decode concurrency like the rest of OCR.
+
+    ``decode`` runs a single request synchronously on the calling thread.
+    """
+
+    def __init__(
+        self,
+        session: ort.InferenceSession,
+        embed: Callable[[np.ndarray], np.ndarray],
+        eos_token_id: int,
+        max_active: int = 8,
+        max_tokens: int = 1024,
+        io_binding: bool = False,
+        executor: Executor | None = None,
+    ) -> None:
+        self._session = session
+        self._executor = executor if executor is not None else stage_executor(OCR)
+        self._io_binding = io_binding
+        self._embed = embed
+        self._eos_token_id = eos_token_id
+        self._max_active = max(1, max_active)
+        self._max_tokens = max_tokens
+
+        self._use_cache_false = np.array([False])
+        self._use_cache_true = np.array([True])
+
+        # Decoder KV output names (excluding logits at index 0), mapped to the
+        # matching past_key_values.* input and split into encoder vs decoder
+        # slots once so the per-step feed build is a straight loop.
+        self._out_names = [o.name for o in session.get_outputs()]
+        kv_out_names = self._out_names[1:]
+        self._kv_in_names = [n.replace("present", "past_key_values") for n in kv_out_names]
+        self._enc_kv_indices = [i for i, n in enumerate(kv_out_names) if ".encoder." in n]
+        self._dec_kv_indices = [i for i, n in enumerate(kv_out_names) if ".encoder." not in n]
+
+        self._lock = threading.Lock()
+        # Each entry is one submitted group: (sequences, encoder_hidden, encoder_mask).
+        self._queue: list[tuple[list[_Sequence], np.ndarray, np.ndarray]] = []
+        self._active = 0
+
+    def submit(
+        self,
+        encoder_hidden: np.ndarray,
+        attention_mask: np.ndarray | None = None,
+        max_tokens: int | None = None,
+    ) -> list[Future]:
+        """Queue a (batch, seq, dim) encoder output as one cohort.
+
+        Returns one future per row, each resolving to that row's token ids.
+        """
+        if attention_mask is None:
+            attention_mask = np.ones(encoder_hidden.shape[:2], dtype=np.int64)
+        seqs = [
+            _Sequence(max_tokens=max_tokens or self._max_tokens, future=Future())
+            for _ in range(encoder_hidden.shape[0])
+        ]
+        with self._lock:
+            self._queue.append((seqs, encoder_hidden, attention_mask))
+            self._dispatch_locked()
+        return [seq.future for seq in seqs]
+
+    def decode(
+        self,
+        encoder_hidden: np.ndarray,
+        attention_mask: np.ndarray,
+        max_tokens: int | None = None,
+    ) -> list[int]:
+        """Decode a single request on the calling thread."""
+        seq = _Sequence(max_tokens=max_tokens or self._max_tokens)
+        cohort = self._prefill([seq], encoder_hidden, attention_mask)
+        while self._advance(cohort):
+            pass
+        return seq.tokens
+
+    def _dispatch_locked(self) -> None:
+        """Start a cohort task for queued rows while capacity allows. Caller holds the lock."""
+        while self._queue and self._active < self._max_active:
+            seqs, hidden, mask = self._queue[0]
+            take = min(len(seqs), self._max_active - self._active)
+            if take == len(seqs):
+                self._queue.pop(0)
+            else:
+                self._queue[0] = (seqs[take:], hidden[take:], mask[take:])
+            self._active += take
+            _ACTIVE_SEQUENCES.set(self._active)
+            self._executor.submit(self._run_cohort, seqs[:take], hidden[:take], mask[:take])
+
+    def _release(self, count: int) -> None:
+        if count <= 0:
+            return
+        with self._lock:
+            self._active -= count
+            _ACTIVE_SEQUENCES.set(self._active)
+            self._dispatch_locked()
+
+    def _run_cohort(
+        self,
+        sequences: list[_Sequence],
+        encoder_hidden: np.ndarray,
+        encoder_mask: np.ndarray,
+    ) -> None:
+        held = len(sequences)
+        try:
+            rows = []
+            for row, seq in enumerate(sequences):
+                if seq.cancelled():
+                    seq.drop_cancelled()
+                else:
+                    rows.append(row)
+            if not rows:
+                return
+            if len(rows) < len(sequences):
+                encoder_hidden, encoder_mask = encoder_hidden[rows], encoder_mask[rows]
+            cohort = self._prefill([sequences[i] for i in rows], encoder_hidden, encoder_mask)
+            while True:
+                alive = self._advance(cohort)
+                remaining = len(cohort.sequences) if alive else 0
+                # Free capacity as rows retire so queued requests can start.
+                self._release(held - remaining)
+                held = remaining
+                if not alive:
+                    return
+        except Exception as e:
+            logger.error("Decode failed", extra={"batch_size": held, "error": str(e)})
+            for seq in sequences:
+                _settle(seq, error=e)
+        finally:
+            self._release(held)
+
+    def _prefill(
+        self,
+        sequences: list[_Sequence],
+        encoder_hidden: np.ndarray,
+        encoder_mask: np.ndarray,
+    ) -> _Cohort:
+        batch = len(sequences)
+        for seq in sequences:
+            seq.tokens.append(self._eos_token_id)
+
+        # Seed decoder with EOS token (BART convention: decoder_start = EOS)
+        # Prefill: use_cache_branch=False, pass empty KV cache tensors
+        empty_kv = np.zeros((batch, _NUM_HEADS, 0, _HEAD_DIM), dtype=np.float32)
+        feed = {
+            "inputs_embeds": self._embed(np.full((batch, 1), self._eos_token_id, dtype=np.int64)),
+            "encoder_hidden_states": encoder_hidden,
+            "encoder_attention_mask": encoder_mask,
+            "use_cache_branch": self._use_cache_false,
+        }
+        for name in self._kv_in_names:
+            feed[name] = empty_kv
+
+        outs = self._session.run(None, feed)
+        kv = outs[1:]
+        # Encoder KV is computed once during prefill and reused for all
+        # decode steps. The merged decoder's If node corrupts the encoder
+        # KV pass-through on the use_cache_branch=True path, so we pin it.
+        return _Cohort(
+            sequences=list(sequences),
+            encoder_hidden=encoder_hidden,
+            encoder_mask=encoder_mask,
+            logits=outs[0],
+            encoder_kv=[kv[i] for i in self._enc_kv_indices],
+            decoder_kv=[kv[i] for i in self._dec_kv_indices],
+        )
+
+    def _advance(self, cohort: _Cohort) -> bool:
+        """Emit one token per row, retire finished rows, then run one decode step.
+
+        Returns False once every sequence in the cohort has finished.
+        """
+        next_tokens = np.argmax(cohort.logits[:, -1, :], axis=-1)
+        keep: list[int] = []
+        for row, (seq, token) in enumerate(zip(cohort.sequences, next_tokens)):
+            if seq.cancelled():
+                seq.drop_cancelled()  # caller gave up; stop spending decode steps on it
+                continue
+            seq.tokens.append(int(token))
+            # tokens[0] is the EOS seed, so generated = len(tokens) - 1
+            if token == self._eos_token_id or len(seq.tokens) - 1 >= seq.max_tokens:
+                _settle(seq, result=seq.tokens)
+            else:
+                keep.append(row)
+
+        if not keep:
+            cohort.sequences = []
+            return False
+        if len(keep) < len(cohort.sequences):
+            cohort.sequences = [cohort.sequences[i] for i in keep]
+            cohort.encoder_hidden = cohort.encoder_hidden[keep]
+            cohort.encoder_mask = cohort.encoder_mask[keep]
+            cohort.encoder_kv = [kv[keep] for kv in cohort.encoder_kv]
+            cohort.decoder_kv = [_take_rows(kv, keep) for kv in cohort.decoder_kv]
+            cohort.binding = None  # static inputs changed shape; rebind
+            next_tokens = next_tokens[keep]
+
+        # Embed next tokens via numpy indexing (no session.run overhead)
+        embeds = self._embed(next_tokens[:, np.newaxis].astype(np.int64))
+        if self._io_binding:
+            self._step_bound(cohort, embeds)
+            return True
+
+        feed = {
+            "inputs_embeds": embeds,
+            "encoder_hidden_states": cohort.encoder_hidden,
+            "encoder_attention_mask": cohort.encoder_mask,
+            "use_cache_branch": self._use_cache_true,
+        }
+        for slot, i in enumerate(self._enc_kv_indices):
+            feed[self._kv_in_names[i]] = cohort.encoder_kv[slot]
+        for slot, i in enumerate(self._dec_kv_indices):
+            feed[self._kv_in_names[i]] = cohort.decoder_kv[slot]
+
+        outs = self._session.run(None, feed)
+        cohort.logits = outs[0]
+        cohort.decoder_kv = [outs[1 + i] for i in self._dec_kv_indices]
+        return True
+
+    def _step_bound(self, cohort: _Cohort, embeds: np.ndarray) -> None:
+        """Run one decode step through an IOBinding.
+
+        Encoder hidden states, mask, ``use_cache_branch`` and the pinned
+        encoder KV are bound once per cohort (and again only when rows
+        retire). Decoder KV stays in ORT-owned OrtValues: each step's
+        ``present.*`` outputs are bound straight back as the next step's
+        ``past_key_values.*`` inputs without a round trip through numpy.
+        Logits are written into a reused numpy buffer.
+        """
+        binding = cohort.binding
+        if binding is None:
+            binding = self._session.io_binding()
+            binding.bind_cpu_input("encoder_hidden_states", np.ascontiguousarray(cohort.encoder_hidden))
+            binding.bind_cpu_input("encoder_attention_mask", np.ascontiguousarray(cohort.encoder_mask))
+            binding.bind_cpu_input("use_cache_branch", self._use_cache_true)
+            for slot, i in enumerate(self._enc_kv_indices):
+                binding.bind_cpu_input(self._kv_in_names[i], np.ascontiguousarray(cohort.encoder_kv[slot]))
+            cohort.logits = np.empty((len(cohort.sequences), 1, cohort.logits.shape[-1]), dtype=np.float32)
+            cohort.binding = binding
+
+        binding.bind_cpu_input("inputs_embeds", embeds)
+        for slot, i in enumerate(self._dec_kv_indices):
+            kv = cohort.decoder_kv[slot]
+            if isinstance(kv, np.ndarray):
+                binding.bind_cpu_input(self._kv_in_names[i], np.ascontiguousarray(kv))
+            else:
+                binding.bind_ortvalue_input(self._kv_in_names[i], kv)
+
+        # Outputs are rebound every step: present.* grows by one position per
+        # step, and the previous step's outputs are now bound as inputs.
+        binding.clear_binding_outputs()
+        logits = cohort.logits
+        binding.bind_output(
+            self._out_names[0], "cpu", 0, logits.dtype, list(logits.shape), logits.ctypes.data
+        )
+        for name in self._out_names[1:]:
+            binding.bind_output(name, "cpu")
+
+        self._session.run_with_iobinding(binding)
+        outs = binding.get_outputs()
+        cohort.decoder_kv = [outs[1 + i] for i in self._dec_kv_indices]
@@ -1,107 +1,315 @@
 import asyncio
-import io
+import hashlib
 import logging
+import os
+import platform
 import time
+from concurrent.futures import Future
 from pathlib import Path
 
 import numpy as np
 import onnxruntime as ort
 from PIL import Image
-from transformers import AutoProcessor
+from prometheus_client import Gauge
 
 logger = logging.getLogger(__name__)
 
+from app import constants
 from app.config import settings
-from app.engines.florence2_engine import _build_ocr_result
+from app.engines.florence2_onnx_decoder import ContinuousBatchDecoder
+from app.engines.florence2_processing import Florence2Processor, _build_ocr_result
 from app.interfaces.ocr import OcrEngine
 from app.models import OcrResult
+from app.services.autotune import cpu_isa_features
+from app.services.batching import MicroBatcher
+from app.services.cpu_budget import CpuBudget
+from app.services.executors import DECODE, OCR, stage_executor
+from app.services.images import decode_image
 
-_NUM_LAYERS = 6
 _VOCAB_SIZE = 51289
 _EMBED_DIM = 768
 _EMBED_EXTRACT_CHUNK = 1024
+_TASK = "<OCR_WITH_REGION>"
+_MAX_NEW_TOKENS = 1024
+
+_SESSION_LOAD_SECONDS = Gauge(
+    "cover_detection_onnx_session_load_seconds",
+    "Time to create each ONNX Runtime session at start-up",
+    ["graph", "cache"],
+)
+
+
+def _suffix(quantization: str) -> str:
+    return f"_{quantization}" if quantization else ""
+
+
+def _graph_quantization(override: str | None, setting: str | None, default: str) -> str:
+    """Per-graph quantization: the argument, else the setting, else the engine-wide variant."""
+    if override is not None:
+        return override
+    return setting if setting is not None else default
+
+
+def _optimized_model_path(
+    cache_dir: Path, model_path: Path, opts: ort.SessionOptions, bundled: bool = False
+) -> Path:
+    """Optimized graph file keyed by source file, ORT version, optimization level and CPU.
+
+    Fully optimized graphs can contain layout transforms specific to the CPU
+    they were built on, so the key includes its architecture and ISA features.
+    A ``bundled`` source is keyed on its name, size and the pinned revision
+    only: the bundle manifest already checks its contents, and copying a
+    bundle often doesn't preserve mtimes.
+    """
+    stat = model_path.stat()
+    key = "|".join([
+        model_path.name,
+        str(stat.st_size),
+        "bundled" if bundled else str(stat.st_mtime_ns),
+        constants.FLORENCE2_ONNX_REVISION,
+        ort.__version__,
+        str(opts.graph_optimization_level),
+        platform.machine(),
+        " ".join(sorted(cpu_isa_features())),
+    ])
+    digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+    return cache_dir / f"{model_path.stem}.{digest}.onnx"
+
+
+def _create_session(
+    model_path: Path, opts: ort.SessionOptions, cache_dir: Path | None, bundled: bool = False
+) -> tuple[ort.InferenceSession, str]:
+    """Create a session, loading or writing its optimized graph in ``cache_dir``.
+
+    Returns the session and the cache outcome: ``hit`` (loaded the optimized
+    graph with optimizations off), ``miss`` (optimized the source graph and
+    saved the result) or ``off``.
+    """
+    if cache_dir is None:
+        return ort.InferenceSession(str(model_path), opts), "off"
+    try:
+        cached = _optimized_model_path(cache_dir, model_path, opts, bundled=bundled)
+    except OSError:
+        return ort.InferenceSession(str(model_path), opts), "off"
+
+    if cached.exists():
+        level = opts.graph_optimization_level
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        try:
+            return ort.InferenceSession(str(cached), opts), "hit"
+        except Exception as e:  # truncated or incompatible file: rebuild it below
+            logger.warning("Ignoring unloadable optimized graph", extra={"path": str(cached), "error": str(e)})
+        finally:
+            opts.graph_optimization_level = level
+
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        if not os.access(cache_dir, os.W_OK):
+            raise PermissionError("directory is not writable")
+    except OSError as e:
+        logger.warning(
+            "Could not create optimized graph cache; loading without it",
+            extra={"path": str(cache_dir), "error": str(e)},
+        )
+        return ort.InferenceSession(str(model_path), opts), "off"
+    # ORT writes the optimized graph while creating the session. Write to a
+    # per-process temp file and rename, so concurrently starting workers
+    # never load a half-written graph.
+    tmp_path = cached.with_name(f"{cached.stem}.{os.getpid()}.tmp.onnx")
+    opts.optimized_model_filepath = str(tmp_path)
+    try:
+        session = ort.InferenceSession(str(model_path), opts)
+    except Exception as e:
+        # ORT raises InvalidArgument when it can't write the optimized graph
+        # (read-only mount or root filesystem); don't fail the engine for it.
+        opts.optimized_model_filepath = ""
+        tmp_path.unlink(missing_ok=True)
+        logger.warning(
+            "Could not write optimized graph; loading without the cache",
+            extra={"path": str(cached), "error": str(e)},
+        )
+        return ort.InferenceSession(str(model_path), opts), "off"
+    finally:
+        opts.optimized_model_filepath = ""
+    try:
+        os.replace(tmp_path, cached)
+    except OSError as e:
+        tmp_path.unlink(missing_ok=True)
+        logger.warning("Could not persist optimized graph", extra={"path": str(cached), "error": str(e)})
+    return session, "miss"
+
+
+def _embedding_cache_path(onnx_dir: Path, suffix: str, dtype: np.dtype) -> Path:
+    """Embedding table file keyed by model revision, quantization and dtype."""
+    revision = constants.FLORENCE2_ONNX_REVISION[:12]
+    return onnx_dir / f"embed_tokens{suffix}.{revision}.{dtype.name}.npy"
 
 
 class Florence2OnnxEngine(OcrEngine):
     """Florence-2 OCR engine using ONNX Runtime for inference.
 
     Loads pre-exported ONNX models from onnx-community/Florence-2-base-ft
-    and runs inference without requiring trust_remote_code for the model
-    forward pass. The AutoProcessor still requires trust_remote_code for
-    Florence-2's custom post-processing logic.
+    and runs inference without PyTorch or transformers: image preprocessing,
+    tokenisation and ``<loc_N>`` parsing are done by ``Florence2Processor``.
 
     Uses the merged decoder model which combines prefill and decode-with-past
     into a single ONNX graph controlled by a ``use_cache_branch`` boolean.
+
+    Concurrent ``extract_text`` calls are coalesced by a ``MicroBatcher`` so
+    the vision encoder and text encoder run once per batch of images; each
+    encode batch is then decoded as one cohort by a ``ContinuousBatchDecoder``.
+
+    With ``in_graph_generation`` the decode loop is replaced by the ONNX Loop
+    graph from ``scripts/export_greedy_generate.py``: each request's whole
+    generation is one ``session.run`` on the OCR stage executor.
+
+    ``quantization`` selects the export variant (file suffix) of every graph;
+    ``vision_quantization``, ``encoder_quantization`` and
+    ``decoder_quantization`` override it per session, e.g. a higher-precision
+    vision encoder with a q4 decoder. ``embed_tokens`` always follows
+    ``quantization``.
+
+    With ``optimized_cache`` each session's graph is saved after ONNX
+    Runtime's optimization passes and loaded directly on later starts.
+    ``bundled`` marks ``model_path`` as part of a model bundle, whose
+    optimized graphs stay valid when the bundle is copied.
     """
 
     def __init__(
         self,
         model_path: str = "/opt/hf_cache/florence2-onnx",
-        quantization: str = "q4",
+        quantization: str | None = None,
+        vision_quantization: str | None = None,
+        encoder_quantization: str | None = None,
+        decoder_quantization: str | None = None,
         processor_name: str = "microsoft/Florence-2-base-ft",
         intra_op_num_threads: int | None = None,
+        max_batch_size: int | None = None,
+        batch_window_ms: float | None = None,
+        max_decode_batch: int | None = None,
+        decode_io_binding: bool | None = None,
+        in_graph_generation: bool | None = None,
+        embedding_cache: bool | None = None,
+        embedding_dtype: str | None = None,
+        optimized_cache: bool | None = None,
+        optimized_cache_dir: str | None = None,
+        cpu_budget: CpuBudget | None = None,
+        bundled: bool = False,
     ) -> None:
         t_init = time.perf_counter()
+        self._bundled = bundled
         onnx_dir = Path(model_path) / "onnx"
-        suffix = f"_{quantization}" if quantization else ""
-        threads = intra_op_num_threads if intra_op_num_threads is not None else settings.onnx_num_threads
-
+        quantization = quantization if quantization is not None else settings.onnx_quantization
+        suffix = _suffix(quantization)
+        vision_quantization = _graph_quantization(
+            vision_quantization, settings.onnx_vision_quantization, quantization
+        )
+        encoder_quantization = _graph_quantization(
+            encoder_quantization, settings.onnx_encoder_quantization, quantization
+        )
+        decoder_quantization = _graph_quantization(
+            decoder_quantization, settings.onnx_decoder_quantization, quantization
+        )
         opts = ort.SessionOptions()
         opts.log_severity_level = 3
-        opts.intra_op_num_threads = threads
-        opts.inter_op_num_threads = 1
-
-        t = time.perf_counter()
-        self._vision_encoder = ort.InferenceSession(
-            str(onnx_dir / f"vision_encoder{suffix}.onnx"), opts
+        if cpu_budget is not None:
+            # Keeps the global pool / affinity settings with an autotuned count.
+            cpu_budget.configure_session_options(opts, threads=intra_op_num_threads)
+        else:
+            opts.intra_op_num_threads = (
+                intra_op_num_threads if intra_op_num_threads is not None else settings.onnx_num_threads
+            )
+            opts.inter_op_num_threads = 1
+
+        cache_dir = None
+        if optimized_cache if optimized_cache is not None else settings.onnx_optimized_cache:
+            cache_dir = Path(optimized_cache_dir or settings.onnx_optimized_cache_dir or onnx_dir / "optimized")
+        self.session_load_ms: dict[str, float] = {}
+        self._vision_encoder = self._load_session(
+            onnx_dir / f"vision_encoder{_suffix(vision_quantization)}.onnx", "vision_encoder", opts, cache_dir
         )
-        logger.debug("Loaded vision_encoder", extra={"elapsed_ms": round((time.perf_counter() - t) * 1000, 1)})
-
-        t = time.perf_counter()
-        self._embed_tokens = ort.InferenceSession(
-            str(onnx_dir / f"embed_tokens{suffix}.onnx"), opts
+        self._embed_tokens = self._load_session(
+            onnx_dir / f"embed_tokens{suffix}.onnx", "embed_tokens", opts, cache_dir
         )
-        logger.debug("Loaded embed_tokens", extra={"elapsed_ms": round((time.perf_counter() - t) * 1000, 1)})
-
-        t = time.perf_counter()
-        self._encoder = ort.InferenceSession(
-            str(onnx_dir / f"encoder_model{suffix}.onnx"), opts
+        self._encoder = self._load_session(
+            onnx_dir / f"encoder_model{_suffix(encoder_quantization)}.onnx", "encoder_model", opts, cache_dir
         )
-        logger.debug("Loaded encoder_model", extra={"elapsed_ms": round((time.perf_counter() - t) * 1000, 1)})
-
-        t = time.perf_counter()
-        self._decoder = ort.InferenceSession(
-            str(onnx_dir / f"decoder_model_merged{suffix}.onnx"), opts
+        self._decoder = self._load_session(
+            onnx_dir / f"decoder_model_merged{_suffix(decoder_quantization)}.onnx",
+            "decoder_model_merged",
+            opts,
+            cache_dir,
         )
-        logger.debug("Loaded decoder_model_merged", extra={"elapsed_ms": round((time.perf_counter() - t) * 1000, 1)})
 
-        self._processor = AutoProcessor.from_pretrained(
-            processor_name, trust_remote_code=True, local_files_only=True
-        )
-        self._eos_token_id = self._processor.tokenizer.eos_token_id
+        max_decode = max_decode_batch if max_decode_batch is not None else settings.onnx_max_decode_batch
+        self._generator: ort.InferenceSession | None = None
+        use_generator = in_graph_generation if in_graph_generation is not None else settings.onnx_in_graph_generation
+        if use_generator:
+            self._generator = self._load_session(
+                onnx_dir / f"greedy_generate{_suffix(decoder_quantization)}.onnx", "greedy_generate", opts, cache_dir
+            )
 
-        # Extract embedding weight matrix once at init for fast numpy indexing.
+        self._processor = Florence2Processor(model_path, processor_name, task=_TASK)
+        self._eos_token_id = self._processor.eos_token_id
+
+        # Extract embedding weight matrix once for fast numpy indexing.
         # embed_tokens is a simple lookup table; extracting it avoids ~100-200
-        # session.run() calls per image (one per generated token).
-        self._embedding_weights = self._extract_embedding_weights()
-
-        # Pre-compute decode loop constants to avoid per-token allocations.
-        self._use_cache_false = np.array([False])
-        self._use_cache_true = np.array([True])
-
-        # Decoder KV output names (excluding logits at index 0).
-        kv_out_names = [o.name for o in self._decoder.get_outputs()[1:]]
-        self._kv_out_names = kv_out_names
-        # Map output KV names -> input names (present.* -> past_key_values.*).
-        self._kv_out_to_in = {n: n.replace("present", "past_key_values") for n in kv_out_names}
-        # Partition output indices into encoder vs decoder KV slots.
-        self._enc_kv_indices = [i for i, n in enumerate(kv_out_names) if ".encoder." in n]
-        self._dec_kv_indices = [i for i, n in enumerate(kv_out_names) if ".encoder." not in n]
+        # session.run() calls per image (one per generated token). The table is
+        # persisted next to the model and memory-mapped, so later starts skip
+        # extraction and workers on the host share its pages.
+        use_cache = embedding_cache if embedding_cache is not None else settings.onnx_embedding_cache
+        dtype = np.dtype(embedding_dtype or settings.onnx_embedding_dtype)
+        if use_cache:
+            self._embedding_weights = self._load_embedding_weights(
+                _embedding_cache_path(onnx_dir, suffix, dtype), dtype
+            )
+        else:
+            self._embedding_weights = self._extract_embedding_weights().astype(dtype, copy=False)
+
+        self._decode_executor = stage_executor(DECODE)
+        self._ocr_executor = stage_executor(OCR)
+        self._batch_decoder = ContinuousBatchDecoder(
+            self._decoder,
+            embed=self._embed,
+            eos_token_id=self._eos_token_id,
+            max_active=max_decode,
+            io_binding=decode_io_binding if decode_io_binding is not None else settings.onnx_decode_io_binding,
+            executor=self._ocr_executor,
+        )
+        self._encode_batcher = MicroBatcher(
+            self._encode_and_submit,
+            max_batch_size=max_batch_size if max_batch_size is not None else settings.onnx_max_batch_size,
+            window_ms=batch_window_ms if batch_window_ms is not None else settings.onnx_batch_window_ms,
+            stage="ocr_encode",
+            executor=self._ocr_executor,
+        )
 
         logger.info(
             "Florence2 ONNX engine initialized",
-            extra={"model_path": model_path, "quantization": quantization, "duration_ms": round((time.perf_counter() - t_init) * 1000, 1)},
+            extra={
+                "model_path": model_path,
+                "quantization": quantization,
+                "vision_quantization": vision_quantization,
+                "encoder_quantization": encoder_quantization,
+                "decoder_quantization": decoder_quantization,
+                "session_load_ms": self.session_load_ms,
+                "duration_ms": round((time.perf_counter() - t_init) * 1000, 1),
+            },
+        )
+
+    def _load_session(
+        self, model_path: Path, graph: str, opts: ort.SessionOptions, cache_dir: Path | None
+    ) -> ort.InferenceSession:
+        t = time.perf_counter()
+        session, cache = _create_session(model_path, opts, cache_dir, bundled=self._bundled)
+        elapsed = time.perf_counter() - t
+        _SESSION_LOAD_SECONDS.labels(graph=graph, cache=cache).set(elapsed)
+        self.session_load_ms[graph] = round(elapsed * 1000, 1)
+        logger.debug(
+            "Loaded ONNX session",
+            extra={"graph": graph, "path": str(model_path), "cache": cache, "elapsed_ms": self.session_load_ms[graph]},
         )
+        return session
 
     def _extract_embedding_weights(self) -> np.ndarray:
         """Run embed_tokens in chunks to build a (vocab_size, embed_dim) weight matrix."""
@@ -113,126 +321,140 @@ class Florence2OnnxEngine(OcrEngine):
             weights[start:end] = chunk_embeds[0]
         return weights
 
+    def _load_embedding_weights(self, cache_path: Path, dtype: np.dtype) -> np.ndarray:
+        """Memory-map the persisted embedding table, extracting and writing it on a miss."""
+        t = time.perf_counter()
+        if cache_path.exists():
+            weights = np.load(cache_path, mmap_mode="r")
+            if weights.shape == (_VOCAB_SIZE, _EMBED_DIM) and weights.dtype == dtype:
+                logger.debug(
+                    "Loaded cached embedding table",
+                    extra={"path": str(cache_path), "elapsed_ms": round((time.perf_counter() - t) * 1000, 1)},
+                )
+                return weights
+            logger.warning(
+                "Ignoring embedding table with unexpected layout",
+                extra={"path": str(cache_path), "shape": list(weights.shape), "dtype": str(weights.dtype)},
+            )
+
+        weights = self._extract_embedding_weights().astype(dtype, copy=False)
+        # Write to a per-process temp file and rename, so concurrently starting
+        # workers never map a half-written table.
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                np.save(f, weights)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            tmp_path.unlink(missing_ok=True)
+            logger.warning(
+                "Could not persist embedding table; using in-memory copy",
+                extra={"path": str(cache_path), "error": str(e)},
+            )
+            return weights
+        logger.info(
+            "Persisted embedding table",
+            extra={"path": str(cache_path), "elapsed_ms": round((time.perf_counter() - t) * 1000, 1)},
+        )
+        return np.load(cache_path, mmap_mode="r")
+
+    def _embed(self, ids: np.ndarray) -> np.ndarray:
+        """Look up token embeddings for an int64 id array of any shape.
+
+        Only the requested rows are read from the (possibly fp16) table and
+        upcast to float32.
+        """
+        return self._embedding_weights[ids].astype(np.float32, copy=False)
+
     async def extract_text(self, image_bytes: bytes) -> OcrResult:
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
         loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, lambda: self._run_ocr(image))
+        image, image_size = await loop.run_in_executor(self._decode_executor, decode_image, image_bytes)
+        # Vision + text encoding is coalesced across concurrent requests, and
+        # each encode batch is decoded as one cohort.
+        tokens_future = await self._encode_batcher.submit(image)
+        t_decode = time.perf_counter()
+        tokens = await asyncio.wrap_future(tokens_future)
+        decode_ms = (time.perf_counter() - t_decode) * 1000
+        return await loop.run_in_executor(
+            self._ocr_executor, self._postprocess, image_size, tokens, decode_ms
+        )
+
+    def _encode_and_submit(self, images: list[Image.Image]) -> list[Future]:
+        """Encode a batch and hand it to the decoder as one cohort."""
+        encoder_hidden = self._encode_batch(images)
+        if self._generator is not None:
+            return [
+                self._ocr_executor.submit(self._generate, row[np.newaxis])
+                for row in encoder_hidden
+            ]
+        return self._batch_decoder.submit(encoder_hidden)
+
+    def _generate(self, encoder_hidden: np.ndarray) -> list[int]:
+        """Run one request's whole greedy generation in a single session.run."""
+        sequences = self._generator.run(None, {
+            "encoder_hidden_states": encoder_hidden,
+            "encoder_attention_mask": np.ones(encoder_hidden.shape[:2], dtype=np.int64),
+            "max_new_tokens": np.array(_MAX_NEW_TOKENS, dtype=np.int64),
+        })[0]
+        return sequences[0].tolist()
+
+    def _encode_batch(self, images: list[Image.Image]) -> list[np.ndarray]:
+        """Run the vision encoder and text encoder over a batch of images.
 
-    def _run_ocr(self, image: Image.Image) -> OcrResult:
+        Every image uses the same task prompt, so the combined image+prompt
+        sequences have identical lengths and stack without padding. Returns the
+        (batch, seq, dim) encoder hidden states.
+        """
         t0 = time.perf_counter()
-        task = "<OCR_WITH_REGION>"
+        batch_size = len(images)
 
-        inputs = self._processor(text=task, images=image, return_tensors="np")
+        pixel_values = self._processor.preprocess(images)
         t_processor = time.perf_counter()
 
         # Stage 1: Vision encoding
-        pixel_values = inputs["pixel_values"].astype(np.float32)
         image_features = self._vision_encoder.run(
             None, {"pixel_values": pixel_values}
         )[0]
         t_vision = time.perf_counter()
 
         # Stage 2: Text embedding (numpy indexing) + encoder
-        input_ids = inputs["input_ids"].astype(np.int64)
-        prompt_embeds = self._embedding_weights[input_ids[0]][np.newaxis]  # (1, seq, dim)
+        input_ids = np.repeat(self._processor.prompt_ids, batch_size, axis=0)
+        prompt_embeds = self._embed(input_ids)  # (batch, seq, dim)
         combined_embeds = np.concatenate(
             [image_features, prompt_embeds], axis=1
         )
-        combined_mask = np.ones(
-            (1, combined_embeds.shape[1]), dtype=np.int64
-        )
+        combined_mask = np.ones(combined_embeds.shape[:2], dtype=np.int64)
         encoder_hidden = self._encoder.run(None, {
             "inputs_embeds": combined_embeds,
             "attention_mask": combined_mask,
         })[0]
         t_encoder = time.perf_counter()
 
-        # Stage 3: Greedy autoregressive decode
-        generated_ids = self._greedy_decode(encoder_hidden, combined_mask)
-        t_decode = time.perf_counter()
-
-        # Stage 4: Post-process
-        text = self._processor.batch_decode(
-            generated_ids, skip_special_tokens=False
-        )[0]
-        parsed = self._processor.post_process_generation(
-            text, task=task, image_size=(image.width, image.height)
-        )
-        result = _build_ocr_result(parsed[task])
-
-        t_end = time.perf_counter()
-        num_tokens = len(generated_ids[0]) if generated_ids else 0
         logger.debug(
-            "ONNX timing",
+            "ONNX encode timing",
             extra={
+                "batch_size": batch_size,
                 "processor_ms": round((t_processor - t0) * 1000, 1),
                 "vision_enc_ms": round((t_vision - t_processor) * 1000, 1),
                 "text_enc_ms": round((t_encoder - t_vision) * 1000, 1),
-                "decode_ms": round((t_decode - t_encoder) * 1000, 1),
-                "num_tokens": num_tokens,
-                "postprocess_ms": round((t_end - t_decode) * 1000, 1),
-                "total_ms": round((t_end - t0) * 1000, 1),
             },
         )
+        return encoder_hidden
 
-        return result
+    def _postprocess(self, image_size: tuple[int, int], token_ids: list[int], decode_ms: float) -> OcrResult:
+        t0 = time.perf_counter()
+        text = self._processor.decode(token_ids)
+        parsed = self._processor.parse_ocr(text, image_size=image_size)
+        result = _build_ocr_result(parsed)
 
-    def _greedy_decode(self, encoder_hidden, attention_mask, max_tokens=1024):
-        # Seed decoder with EOS token (BART convention: decoder_start = EOS)
-        seed_embeds = self._embedding_weights[[self._eos_token_id]][np.newaxis]  # (1,1,dim)
+        t_end = time.perf_counter()
+        logger.debug(
+            "ONNX decode timing",
+            extra={
+                "decode_ms": round(decode_ms, 1),
+                "num_tokens": len(token_ids),
+                "postprocess_ms": round((t_end - t0) * 1000, 1),
+            },
+        )
 
-        # Prefill: use_cache_branch=False, pass empty KV cache tensors
-        empty_kv = np.zeros((1, 12, 0, 64), dtype=np.float32)
-        feed = {
-            "inputs_embeds": seed_embeds,
-            "encoder_hidden_states": encoder_hidden,
-            "encoder_attention_mask": attention_mask,
-            "use_cache_branch": self._use_cache_false,
-        }
-        for layer in range(_NUM_LAYERS):
-            feed[f"past_key_values.{layer}.decoder.key"] = empty_kv
-            feed[f"past_key_values.{layer}.decoder.value"] = empty_kv
-            feed[f"past_key_values.{layer}.encoder.key"] = empty_kv
-            feed[f"past_key_values.{layer}.encoder.value"] = empty_kv
-
-        outs = self._decoder.run(None, feed)
-        logits = outs[0]
-        # Store KV cache as flat list parallel to self._kv_out_names
-        kv_cache = list(outs[1:])
-
-        # Encoder KV is computed once during prefill and reused for all
-        # decode steps. The merged decoder's If node corrupts the encoder
-        # KV pass-through on the use_cache_branch=True path, so we pin it.
-        encoder_kv_snap = [kv_cache[i] for i in self._enc_kv_indices]
-
-        tokens = [self._eos_token_id]
-        # Reuse feed dict across iterations — mutate values in-place
-        decode_feed = {
-            "inputs_embeds": None,
-            "encoder_hidden_states": encoder_hidden,
-            "encoder_attention_mask": attention_mask,
-            "use_cache_branch": self._use_cache_true,
-        }
-
-        for _ in range(max_tokens):
-            next_token = int(np.argmax(logits[:, -1, :], axis=-1)[0])
-            tokens.append(next_token)
-            if next_token == self._eos_token_id:
-                break
-
-            # Embed next token via numpy indexing (no session.run overhead)
-            decode_feed["inputs_embeds"] = self._embedding_weights[[next_token]][np.newaxis]  # (1,1,dim)
-
-            # Build KV cache inputs from flat list
-            for i, out_name in enumerate(self._kv_out_names):
-                in_name = self._kv_out_to_in[out_name]
-                if i in self._enc_kv_indices:
-                    decode_feed[in_name] = encoder_kv_snap[self._enc_kv_indices.index(i)]
-                else:
-                    decode_feed[in_name] = kv_cache[i]
-
-            outs = self._decoder.run(None, decode_feed)
-            logits = outs[0]
-            kv_cache = list(outs[1:])
-
-        return [tokens]
+        return result
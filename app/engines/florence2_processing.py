@@ -0,0 +1,155 @@
+"""Torch-free Florence-2 pre/post-processing for the ONNX engine.
+
+Replaces ``transformers.AutoProcessor`` (which needs PyTorch and
+``trust_remote_code``) with NumPy image preprocessing, a prompt tokenised
+once with the standalone ``tokenizers`` library, and a native parser for the
+``<loc_N>`` tokens emitted by ``<OCR_WITH_REGION>``. Behaviour mirrors
+Florence-2's ``processing_florence2.py`` for that task.
+"""
+
+import json
+import logging
+import re
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+from tokenizers import Tokenizer
+
+from app.models import OcrBoundingBox, OcrResult
+
+logger = logging.getLogger(__name__)
+
+# Florence-2 rewrites task tokens into natural-language prompts before
+# tokenising; only the OCR task is used by this service.
+_TASK_PROMPTS = {
+    "<OCR_WITH_REGION>": "What is the text in the image, with regions?",
+}
+
+# CLIPImageProcessor settings from Florence-2's preprocessor_config.json,
+# used when the file is not available locally.
+_DEFAULT_IMAGE_SIZE = (768, 768)
+_DEFAULT_IMAGE_MEAN = (0.485, 0.456, 0.406)
+_DEFAULT_IMAGE_STD = (0.229, 0.224, 0.225)
+_DEFAULT_RESCALE = 1 / 255
+
+# Coordinates are quantised into 1000 bins per axis; a bin dequantises to
+# its centre.
+_LOC_BINS = 1000
+_OCR_PATTERN = re.compile(r"(.+?)" + r"<loc_(\d+)>" * 8)
+
+
+def _resolve_file(model_dir: Path, processor_name: str, filename: str) -> Path | None:
+    """Find ``filename`` in the model directory or the local HuggingFace cache."""
+    local = model_dir / filename
+    if local.exists():
+        return local
+    try:
+        from huggingface_hub import hf_hub_download
+
+        return Path(hf_hub_download(processor_name, filename, local_files_only=True))
+    except Exception:
+        return None
+
+
+class Florence2Processor:
+    """NumPy implementation of the Florence-2 processor for ``<OCR_WITH_REGION>``."""
+
+    def __init__(self, model_dir: str | Path, processor_name: str, task: str = "<OCR_WITH_REGION>") -> None:
+        model_dir = Path(model_dir)
+        tokenizer_path = _resolve_file(model_dir, processor_name, "tokenizer.json")
+        if tokenizer_path is None:
+            raise FileNotFoundError(
+                f"tokenizer.json not found in {model_dir} or the local cache for {processor_name}"
+            )
+        self._tokenizer = Tokenizer.from_file(str(tokenizer_path))
+
+        tokenizer_config = self._load_json(_resolve_file(model_dir, processor_name, "tokenizer_config.json"))
+        self._clean_up_spaces = bool(tokenizer_config.get("clean_up_tokenization_spaces", False))
+        self.eos_token_id = self._tokenizer.token_to_id(tokenizer_config.get("eos_token", "</s>"))
+
+        image_config = self._load_json(_resolve_file(model_dir, processor_name, "preprocessor_config.json"))
+        size = image_config.get("size", {})
+        self._image_size = (
+            size.get("width", _DEFAULT_IMAGE_SIZE[0]),
+            size.get("height", _DEFAULT_IMAGE_SIZE[1]),
+        )
+        self._rescale = image_config.get("rescale_factor", _DEFAULT_RESCALE)
+        self._mean = np.array(image_config.get("image_mean", _DEFAULT_IMAGE_MEAN), dtype=np.float32).reshape(3, 1, 1)
+        self._std = np.array(image_config.get("image_std", _DEFAULT_IMAGE_STD), dtype=np.float32).reshape(3, 1, 1)
+
+        # The prompt is identical for every request, so tokenise it once.
+        self.task = task
+        self.prompt_ids = np.array(
+            [self._tokenizer.encode(_TASK_PROMPTS[task]).ids], dtype=np.int64
+        )
+
+    @staticmethod
+    def _load_json(path: Path | None) -> dict:
+        if path is None:
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def preprocess(self, images: list[Image.Image]) -> np.ndarray:
+        """Resize, rescale and normalise RGB images into (batch, 3, H, W) float32."""
+        batch = np.empty((len(images), 3, self._image_size[1], self._image_size[0]), dtype=np.float32)
+        for i, image in enumerate(images):
+            resized = image.resize(self._image_size, Image.Resampling.BICUBIC)
+            pixels = np.asarray(resized, dtype=np.float32).transpose(2, 0, 1)
+            batch[i] = (pixels * self._rescale - self._mean) / self._std
+        return batch
+
+    def decode(self, token_ids: list[int]) -> str:
+        """Detokenise generated ids, keeping special and ``<loc_N>`` tokens."""
+        text = self._tokenizer.decode(token_ids, skip_special_tokens=False)
+        if self._clean_up_spaces:
+            text = _clean_up_tokenization(text)
+        return text
+
+    def parse_ocr(self, text: str, image_size: tuple[int, int]) -> dict:
+        """Parse ``<OCR_WITH_REGION>`` output into labels and pixel-space quad boxes.
+
+        Matches Florence-2's post-processor: only ``<s>`` is stripped, so the
+        first label keeps the leading ``</s>`` the model emits.
+        """
+        width, height = image_size
+        scale = np.array([width / _LOC_BINS, height / _LOC_BINS] * 4)
+        labels, quad_boxes = [], []
+        for match in _OCR_PATTERN.findall(text.replace("<s>", "")):
+            bins = np.array([int(b) for b in match[1:]], dtype=np.float64)
+            quad_boxes.append(((bins + 0.5) * scale).tolist())
+            labels.append(match[0])
+        return {"quad_boxes": quad_boxes, "labels": labels}
+
+
+def _clean_up_tokenization(text: str) -> str:
+    """``transformers``' clean_up_tokenization for tokenizers that enable it."""
+    return (
+        text.replace(" .", ".")
+        .replace(" ?", "?")
+        .replace(" !", "!")
+        .replace(" ,", ",")
+        .replace(" ' ", "'")
+        .replace(" n't", "n't")
+        .replace(" 'm", "'m")
+        .replace(" 's", "'s")
+        .replace(" 've", "'ve")
+        .replace(" 're", "'re")
+    )
+
+
+def _build_ocr_result(ocr_data: dict) -> OcrResult:
+    # quad is flat [x1,y1,x2,y2,x3,y3,x4,y4] in pixel-space
+    regions = [
+        OcrBoundingBox(
+            text=label,
+            confidence=1.0,  # Florence-2 has no per-region confidence
+            coordinates=[[q[i], q[i + 1]] for i in range(0, 8, 2)],
+        )
+        for q, label in zip(
+            ocr_data.get("quad_boxes", []),
+            ocr_data.get("labels", []),
+        )
+    ]
+    return OcrResult(text=" ".join(r.text for r in regions), regions=regions)
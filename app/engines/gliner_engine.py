@@ -1,14 +1,20 @@
 from __future__ import annotations
 
-import asyncio
 import logging
 import time
 
+from app.config import settings
 from app.interfaces.nlp import NlpEngine
 from app.models import NlpAnalysis, OcrResult
+from app.services.batching import MicroBatcher
+from app.services.cpu_budget import CpuBudget, set_torch_threads
+from app.services.region_pruning import RegionPruner
+from app.services.executors import NLP, stage_executor
 
 logger = logging.getLogger(__name__)
 
+LABELS = ["author", "book title"]
+
 
 def _region_height(region) -> float:
     ys = [c[1] for c in region.coordinates]
@@ -52,19 +58,80 @@ def _entity_height(
 
 
 class GlinerNlpEngine(NlpEngine):
+    """GLiNER zero-shot NER over the OCR regions, ranked by region height.
+
+    Concurrent ``analyze`` calls are coalesced by a ``MicroBatcher``: texts
+    arriving within ``batch_window_ms`` of each other (up to
+    ``max_batch_size``) go through one padded GLiNER forward pass. Only the
+    model call is batched; each request keeps its own region spans for the
+    height ranking. Before that, ``RegionPruner`` drops regions too small to
+    be the author or title.
+
+    With ``label_embeddings`` the representations of the fixed label set are
+    computed once at load and every call only encodes the OCR text. That
+    needs a bi-encoder GLiNER (separate label encoder); a uni-encoder such as
+    the default model reads labels and text as one sequence, so its label
+    representations depend on the text and can't be cached.
+    """
+
     DEFAULT_MODEL = "urchade/gliner_large-v2.1"
     DEFAULT_THRESHOLD = 0.4
 
-    def __init__(self, model_name: str = DEFAULT_MODEL, threshold: float = DEFAULT_THRESHOLD, revision: str | None = None):
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL,
+        threshold: float = DEFAULT_THRESHOLD,
+        revision: str | None = None,
+        cpu_budget: CpuBudget | None = None,
+        bundled: bool = False,
+        max_batch_size: int | None = None,
+        batch_window_ms: float | None = None,
+        label_embeddings: bool | None = None,
+    ):
         from gliner import GLiNER  # lazy import — gliner is heavy and optional at import time
         t0 = time.perf_counter()
-        self._model = GLiNER.from_pretrained(model_name, revision=revision)
-        self._threshold = threshold
+        if bundled:
+            # A model bundle directory carries its backbone config and the
+            # pre-converted fast tokenizer, so nothing is fetched or converted.
+            self._model = GLiNER.from_pretrained(model_name, load_tokenizer=True)
+        else:
+            self._model = GLiNER.from_pretrained(model_name, revision=revision)
+        self._setup(threshold, cpu_budget, max_batch_size, batch_window_ms)
+        label_embeddings = label_embeddings if label_embeddings is not None else settings.gliner_label_embeddings
+        if label_embeddings:
+            if getattr(self._model.config, "labels_encoder", None) is None:
+                raise ValueError(
+                    f"{model_name} is a uni-encoder GLiNER; precomputed label embeddings need a bi-encoder model"
+                )
+            self._label_embeddings = self._model.encode_labels(LABELS)
         duration = time.perf_counter() - t0
-        logger.info("GLiNER model loaded", extra={"model": model_name, "duration_ms": round(duration * 1000, 1)})
+        logger.info(
+            "GLiNER model loaded",
+            extra={"model": model_name, "label_embeddings": label_embeddings, "duration_ms": round(duration * 1000, 1)},
+        )
+
+    def _setup(
+        self,
+        threshold: float,
+        cpu_budget: CpuBudget | None,
+        max_batch_size: int | None,
+        batch_window_ms: float | None,
+    ) -> None:
+        self._threshold = threshold
+        self._label_embeddings = None
+        self._pruner = RegionPruner.from_settings()
+        self._executor = stage_executor(NLP)
+        self._cpu_budget = cpu_budget
+        self._batcher = MicroBatcher(
+            self._predict_batch,
+            max_batch_size=max_batch_size if max_batch_size is not None else settings.nlp_max_batch_size,
+            window_ms=batch_window_ms if batch_window_ms is not None else settings.nlp_batch_window_ms,
+            stage=NLP,
+            executor=self._executor,
+        )
 
     async def analyze(self, ocr_result: OcrResult) -> NlpAnalysis:
-        regions = _regions_with_heights(ocr_result)
+        regions = self._pruner.prune(_regions_with_heights(ocr_result))
         if regions:
             raw_text, spans = _build_text_with_spans(regions)
         else:
@@ -76,13 +143,7 @@ class GlinerNlpEngine(NlpEngine):
 
         normalized = raw_text.title() if raw_text == raw_text.upper() else raw_text
 
-        loop = asyncio.get_event_loop()
-        entities = await loop.run_in_executor(
-            None,
-            lambda: self._model.predict_entities(
-                normalized, ["author", "book title"], threshold=self._threshold
-            ),
-        )
+        entities = await self._batcher.submit(normalized)
 
         authors: list[tuple[str, float]] = []
         titles: list[tuple[str, float]] = []
@@ -106,3 +167,18 @@ class GlinerNlpEngine(NlpEngine):
             potential_authors=[a for a, _ in authors],
             potential_titles=[t for t, _ in titles],
         )
+
+    def _predict_batch(self, texts: list[str]) -> list[list[dict]]:
+        if self._cpu_budget is not None:
+            # Set per call, on the worker thread: torch's thread count is
+            # per-thread under OpenMP, and the budget widens while OCR is idle.
+            set_torch_threads(self._cpu_budget.nlp_thread_count())
+        if self._label_embeddings is not None:
+            return self._model.batch_predict_with_embeds(
+                texts, self._label_embeddings, LABELS, threshold=self._threshold, batch_size=len(texts)
+            )
+        if len(texts) == 1:
+            return [self._model.predict_entities(texts[0], LABELS, threshold=self._threshold)]
+        # inference() is what batch_predict_entities forwards to in the pinned
+        # gliner; batch_size keeps the whole batch in one forward pass.
+        return self._model.inference(texts, LABELS, threshold=self._threshold, batch_size=len(texts))
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import logging
+import time
+
+import onnxruntime as ort
+
+from app.config import settings
+from app.engines.gliner_engine import GlinerNlpEngine
+from app.services.cpu_budget import CpuBudget
+from app.services.executors import NLP
+
+logger = logging.getLogger(__name__)
+
+
+class GlinerOnnxEngine(GlinerNlpEngine):
+    """GLiNER with its forward pass exported to ONNX and run on ONNX Runtime.
+
+    Loads a directory written by ``scripts/export_gliner_onnx.py`` (the
+    exported graph, its dynamically int8-quantized copy, ``gliner_config.json``
+    and the tokenizer). Tokenization and span decoding are still GLiNER's, and
+    ``analyze`` is inherited, so results have the same shape and height
+    ranking as ``GlinerNlpEngine``; only the DeBERTa forward pass moves from
+    torch to ORT.
+
+    ORT fixes its thread count when the session is created, so the session
+    gets the NLP share of the CPU budget and doesn't widen while OCR is idle.
+    """
+
+    def __init__(
+        self,
+        model_path: str | None = None,
+        model_file: str | None = None,
+        threshold: float = GlinerNlpEngine.DEFAULT_THRESHOLD,
+        cpu_budget: CpuBudget | None = None,
+        max_batch_size: int | None = None,
+        batch_window_ms: float | None = None,
+    ):
+        from gliner import GLiNER  # lazy import — gliner is heavy and optional at import time
+        t0 = time.perf_counter()
+        model_path = model_path or settings.gliner_onnx_model_path
+        model_file = model_file or settings.gliner_onnx_model_file
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opts.log_severity_level = 3
+        if cpu_budget is not None:
+            cpu_budget.configure_session_options(opts, stage=NLP)
+        else:
+            opts.intra_op_num_threads = settings.onnx_num_threads
+            opts.inter_op_num_threads = 1
+        self._model = GLiNER.from_pretrained(
+            model_path,
+            load_onnx_model=True,
+            onnx_model_file=model_file,
+            load_tokenizer=True,
+            session_options=opts,
+        )
+        self._setup(threshold, cpu_budget, max_batch_size, batch_window_ms)
+        duration = time.perf_counter() - t0
+        logger.info(
+            "GLiNER ONNX model loaded",
+            extra={"model": model_path, "file": model_file, "duration_ms": round(duration * 1000, 1)},
+        )
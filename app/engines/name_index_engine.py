@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import bisect
+import logging
+import mmap
+import re
+import struct
+import time
+from collections.abc import Iterable
+from pathlib import Path
+
+import numpy as np
+
+from app.config import settings
+from app.engines.gliner_engine import _regions_with_heights
+from app.interfaces.nlp import NlpEngine
+from app.models import NlpAnalysis, OcrResult
+from app.services.region_pruning import RegionPruner
+
+logger = logging.getLogger(__name__)
+
+# File layout, little-endian:
+#   magic (8 bytes) | first-name count, surname count (uint32 x 2)
+#   first-name offsets (uint32 x count+1) | surname offsets (uint32 x count+1)
+#   names: upper-cased UTF-8, sorted bytewise, concatenated per section
+_MAGIC = b"NAMEIDX1"
+_HEADER = struct.Struct("<8sII")
+
+# Florence-2 leaves its end-of-sequence token on the first region.
+_SPECIAL_TOKENS = re.compile(r"</?s>")
+# An all-caps name word: letters, optionally joined by an apostrophe or hyphen
+# (O'BRIEN, LE-GUIN). A leading dash marks a reviewer attribution, so it fails.
+_NAME_WORD = re.compile(r"[A-Z]+(?:['-][A-Z]+)*")
+
+
+def write_name_index(path: str | Path, first_names: Iterable[str], surnames: Iterable[str]) -> None:
+    """Write first names and surnames to ``path`` in the ``NameIndex`` format."""
+    sections = [sorted({n.strip().upper().encode() for n in names if n.strip()}) for names in (first_names, surnames)]
+    offsets = []
+    pos = 0
+    for names in sections:
+        section = [pos]
+        for name in names:
+            pos += len(name)
+            section.append(pos)
+        offsets.append(np.asarray(section, dtype="<u4"))
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, len(sections[0]), len(sections[1])))
+        for section in offsets:
+            f.write(section.tobytes())
+        for names in sections:
+            f.write(b"".join(names))
+
+
+class _Section:
+    """Sorted names in the mapped file, indexable for ``bisect``."""
+
+    def __init__(self, buf: mmap.mmap, offsets: np.ndarray, base: int) -> None:
+        self._buf = buf
+        self._offsets = offsets
+        self._base = base
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        return self._buf[self._base + int(self._offsets[i]):self._base + int(self._offsets[i + 1])]
+
+    def __contains__(self, name: bytes) -> bool:
+        i = bisect.bisect_left(self, name)
+        return i < len(self) and self[i] == name
+
+
+class NameIndex:
+    """Read-only, memory-mapped sets of known first names and surnames.
+
+    Nothing is parsed at load: lookups binary-search the mapped file, so
+    opening a census-sized index is instant and its pages are shared by every
+    process that maps it. Build one with ``scripts/build_name_index.py``.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        with open(path, "rb") as f:
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n_first, n_last = _HEADER.unpack_from(self._buf)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a name index")
+        first_offsets = np.frombuffer(self._buf, dtype="<u4", count=n_first + 1, offset=_HEADER.size)
+        last_offsets = np.frombuffer(
+            self._buf, dtype="<u4", count=n_last + 1, offset=_HEADER.size + first_offsets.nbytes
+        )
+        base = _HEADER.size + first_offsets.nbytes + last_offsets.nbytes
+        self._first = _Section(self._buf, first_offsets, base)
+        self._last = _Section(self._buf, last_offsets, base)
+
+    @property
+    def sizes(self) -> tuple[int, int]:
+        return len(self._first), len(self._last)
+
+    def is_first_name(self, word: str) -> bool:
+        return word.upper().encode() in self._first
+
+    def is_surname(self, word: str) -> bool:
+        return word.upper().encode() in self._last
+
+
+def _caps_words(text: str) -> list[str] | None:
+    """The region's words if it is all-caps name-shaped text, else None."""
+    words = _SPECIAL_TOKENS.sub("", text).split()
+    if words and all(_NAME_WORD.fullmatch(w) for w in words):
+        return words
+    return None
+
+
+def _display(text: str) -> str:
+    text = _SPECIAL_TOKENS.sub("", text).strip()
+    return text.title() if text == text.upper() else text
+
+
+class NameIndexNlpEngine(NlpEngine):
+    """Author lookup against a name index, for covers where it is unambiguous.
+
+    An author candidate is all-caps text whose first word is a known first
+    name and whose last word is a known surname, either in one region
+    (``FONDA LEE``, ``URSULA K LE-GUIN``) or as two consecutive one-word
+    regions (``BRANDON`` / ``SANDERSON``). Title-like names are the known
+    risk of a name lookup (``JADE`` / ``CITY``), so the engine is only
+    confident when the cover has exactly one candidate; ``match`` returns
+    None otherwise and the caller falls back to a model.
+
+    The title is the remaining regions at least half the height of the
+    tallest of them, in reading order. Regions go through the same
+    ``RegionPruner`` as GLiNER first, which removes reviewer attributions.
+    """
+
+    # Regions shorter than this fraction of the tallest non-author region
+    # are taglines, not part of the title.
+    TITLE_HEIGHT_RATIO = 0.5
+
+    def __init__(self, index_path: str | None = None):
+        t0 = time.perf_counter()
+        index_path = index_path or settings.name_index_path
+        self._index = NameIndex(index_path)
+        self._pruner = RegionPruner.from_settings()
+        first, last = self._index.sizes
+        logger.info(
+            "Name index loaded",
+            extra={
+                "path": index_path,
+                "first_names": first,
+                "surnames": last,
+                "duration_ms": round((time.perf_counter() - t0) * 1000, 1),
+            },
+        )
+
+    def _is_name(self, words: list[str]) -> bool:
+        return (
+            2 <= len(words) <= 3
+            and self._index.is_first_name(words[0])
+            and self._index.is_surname(words[-1])
+        )
+
+    def _candidates(self, words: list[list[str] | None]) -> list[tuple[int, ...]]:
+        """Region index groups that spell a first name + surname."""
+        found = []
+        for i, w in enumerate(words):
+            if w is None:
+                continue
+            if self._is_name(w):
+                found.append((i,))
+            elif len(w) == 1 and i + 1 < len(words) and words[i + 1] is not None and len(words[i + 1]) == 1:
+                if self._is_name(w + words[i + 1]):
+                    found.append((i, i + 1))
+        return found
+
+    def match(self, ocr_result: OcrResult) -> NlpAnalysis | None:
+        """The analysis if exactly one author candidate is on the cover, else None."""
+        regions = self._pruner.prune(_regions_with_heights(ocr_result))
+        candidates = self._candidates([_caps_words(text) for text, _ in regions])
+        if len(candidates) != 1:
+            return None
+        author_regions = set(candidates[0])
+        author = " ".join(_display(regions[i][0]) for i in candidates[0])
+        rest = [(text, height) for i, (text, height) in enumerate(regions) if i not in author_regions]
+        tallest = max((height for _, height in rest), default=0.0)
+        title = " ".join(
+            _display(text) for text, height in rest if height >= tallest * self.TITLE_HEIGHT_RATIO
+        ).strip()
+        return NlpAnalysis(potential_authors=[author], potential_titles=[title] if title else [])
+
+    async def analyze(self, ocr_result: OcrResult) -> NlpAnalysis:
+        # A few binary searches over mapped pages: cheaper inline than a
+        # hop to the NLP executor.
+        return self.match(ocr_result) or NlpAnalysis(potential_authors=[], potential_titles=[])
@@ -1,15 +1,26 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
+from pathlib import Path
 
-from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi import FastAPI, File, HTTPException, Response, UploadFile
 from fastapi.staticfiles import StaticFiles
 from prometheus_fastapi_instrumentator import Instrumentator
 
 from app.config import settings
 from app.engines.gliner_engine import GlinerNlpEngine
+from app.interfaces.nlp import NlpEngine
 from app.logging_config import setup_logging
-from app.models import CoverAnalysisResponse, HealthResponse
+from app.models import CoverAnalysisResponse, HealthResponse, ReadinessResponse
+from app.services.admission import AdmissionController, OverloadedError
 from app.services.analyzer import CoverAnalyzer
+from app.services.autotune import default_max_threads, load_or_autotune
+from app.services.cpu_budget import CpuBudget
+from app.services.executors import shutdown_executors
+from app.services.model_bundle import ModelBundle, load_bundle
+from app.services.near_duplicate import NearDuplicateIndex
+from app.services.result_cache import ResultCache, cache_fingerprint
+from app.services.startup import Readiness, startup_phase, warm_up
 
 setup_logging()
 
@@ -17,8 +28,61 @@ logger = logging.getLogger(__name__)
 
 ALLOWED_CONTENT_TYPES = {"image/jpeg", "image/png", "image/webp"}
 MAX_FILE_SIZE = 4 * 1024 * 1024  # 4 MB
+WARMUP_IMAGE = Path(__file__).parent / "assets" / "warmup.jpg"
 
 analyzer: CoverAnalyzer | None = None
+readiness = Readiness()
+
+
+def _load_ocr_engine(
+    onnx_model_path: str, cpu_budget: CpuBudget | None, engine_overrides: dict, bundled: bool = False
+):
+    with startup_phase("ocr_load"):
+        if settings.ocr_engine == "onnx":
+            from app.engines.florence2_onnx_engine import Florence2OnnxEngine
+            return Florence2OnnxEngine(
+                model_path=onnx_model_path,
+                processor_name=settings.onnx_processor_name,
+                cpu_budget=cpu_budget,
+                bundled=bundled,
+                **engine_overrides,
+            )
+        from app.engines.florence2_engine import Florence2OcrEngine
+        return Florence2OcrEngine(
+            model_name=settings.pytorch_model_name,
+            revision=settings.pytorch_florence2_revision,
+            cpu_budget=cpu_budget,
+            kv_cache=settings.pytorch_kv_cache,
+            num_threads=settings.pytorch_num_threads,
+            int8=settings.pytorch_int8,
+            bf16=settings.pytorch_bf16,
+        )
+
+
+def _load_gliner_engine(bundle: ModelBundle | None, cpu_budget: CpuBudget | None) -> NlpEngine:
+    if settings.nlp_engine == "gliner_onnx":
+        from app.engines.gliner_onnx_engine import GlinerOnnxEngine
+        return GlinerOnnxEngine(
+            model_path=bundle.gliner_onnx_model_path if bundle is not None else settings.gliner_onnx_model_path,
+            cpu_budget=cpu_budget,
+        )
+    if bundle is not None:
+        return GlinerNlpEngine(model_name=bundle.gliner_model_path, cpu_budget=cpu_budget, bundled=True)
+    return GlinerNlpEngine(
+        model_name=settings.gliner_model_name,
+        revision=settings.gliner_model_revision,
+        cpu_budget=cpu_budget,
+    )
+
+
+def _load_nlp_engine(bundle: ModelBundle | None, cpu_budget: CpuBudget | None) -> NlpEngine:
+    with startup_phase("nlp_load"):
+        engine = _load_gliner_engine(bundle, cpu_budget)
+        if settings.name_index_path:
+            from app.engines.cascade_engine import CascadingNlpEngine
+            from app.engines.name_index_engine import NameIndexNlpEngine
+            engine = CascadingNlpEngine(NameIndexNlpEngine(settings.name_index_path), engine)
+        return engine
 
 
 @asynccontextmanager
@@ -28,27 +92,103 @@ async def lifespan(app: FastAPI):
     setup_logging()
     global analyzer
     logger.info("Starting cover detection service", extra={"ocr_engine": settings.ocr_engine})
-    if settings.ocr_engine == "onnx":
-        from app.engines.florence2_onnx_engine import Florence2OnnxEngine
-        ocr_engine = Florence2OnnxEngine(
-            model_path=settings.onnx_model_path,
-            processor_name=settings.onnx_processor_name,
+    readiness.set("starting")
+    with startup_phase("startup"):
+        cpu_budget = None
+        if settings.cpu_budget:
+            cpu_budget = CpuBudget.from_settings()
+            cpu_budget.install()
+        bundle = None
+        onnx_model_path = settings.onnx_model_path
+        if settings.model_bundle_path:
+            with startup_phase("bundle"):
+                bundle = load_bundle(settings.model_bundle_path, verify=settings.model_bundle_verify)
+            onnx_model_path = bundle.onnx_model_path
+        engine_overrides = {}
+        fingerprint_overrides = {}
+        if settings.ocr_engine == "onnx" and settings.onnx_autotune:
+            with startup_phase("autotune"):
+                tuning = await load_or_autotune(
+                    onnx_model_path,
+                    images_dir=settings.onnx_autotune_images_dir,
+                    tuning_path=settings.onnx_autotune_path or str(Path(onnx_model_path) / "autotune.json"),
+                    max_threads=default_max_threads(),
+                    processor_name=settings.onnx_processor_name,
+                )
+            if tuning is not None:
+                # A tuned variant applies to every graph, replacing per-graph settings.
+                engine_overrides = {
+                    "quantization": tuning.quantization,
+                    "vision_quantization": tuning.quantization,
+                    "encoder_quantization": tuning.quantization,
+                    "decoder_quantization": tuning.quantization,
+                    "intra_op_num_threads": tuning.intra_op_num_threads,
+                }
+                fingerprint_overrides = {
+                    f"onnx_{name}": value for name, value in engine_overrides.items() if name.endswith("quantization")
+                }
+        if bundle is not None:
+            # A bundle replaces ONNX_MODEL_PATH; results depend on its contents.
+            fingerprint_overrides["model_bundle_version"] = bundle.version
+        # The engine constructors block on file I/O, ORT graph optimization
+        # and torch weight loading, so build both at once.
+        with startup_phase("model_load"):
+            ocr_engine, nlp_engine = await asyncio.gather(
+                asyncio.to_thread(_load_ocr_engine, onnx_model_path, cpu_budget, engine_overrides, bundle is not None),
+                asyncio.to_thread(_load_nlp_engine, bundle, cpu_budget),
+            )
+        result_cache = None
+        if settings.result_cache_size > 0:
+            result_cache = ResultCache(
+                max_entries=settings.result_cache_size,
+                disk_dir=settings.result_cache_dir,
+                disk_max_entries=settings.result_cache_disk_max_entries,
+                fingerprint=cache_fingerprint(**fingerprint_overrides),
+            )
+        near_duplicates = None
+        if settings.near_duplicate_cache_size > 0:
+            near_duplicates = NearDuplicateIndex(
+                max_entries=settings.near_duplicate_cache_size,
+                max_distance=settings.near_duplicate_max_distance,
+            )
+        admission = None
+        if settings.admission_max_concurrency > 0:
+            admission = AdmissionController(
+                max_concurrency=settings.admission_max_concurrency,
+                max_queue=settings.admission_max_queue,
+            )
+        analyzer = CoverAnalyzer(
+            ocr_engine,
+            nlp_engine,
+            result_cache=result_cache,
+            near_duplicates=near_duplicates,
+            admission=admission,
+            cpu_budget=cpu_budget,
         )
+    logger.info("Models loaded, service live", extra={"ocr_engine": settings.ocr_engine})
+    warmup_task = None
+    if settings.warmup:
+        # Runs after start-up so /health answers meanwhile; /ready gates traffic.
+        warmup_task = asyncio.create_task(warm_up(
+            ocr_engine,
+            nlp_engine,
+            Path(settings.warmup_image_path or WARMUP_IMAGE).read_bytes(),
+            readiness,
+            budget_ms=settings.warmup_latency_budget_ms,
+            max_runs=settings.warmup_max_runs,
+        ))
     else:
-        from app.engines.florence2_engine import Florence2OcrEngine
-        ocr_engine = Florence2OcrEngine(
-            model_name=settings.pytorch_model_name,
-            revision=settings.pytorch_florence2_revision,
-        )
-    nlp_engine = GlinerNlpEngine(revision=settings.gliner_model_revision)
-    analyzer = CoverAnalyzer(ocr_engine, nlp_engine)
-    logger.info("Models loaded, service ready", extra={"ocr_engine": settings.ocr_engine})
+        readiness.set("ready")
     yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+    readiness.set("starting")
     analyzer = None
+    shutdown_executors()
 
 
 app = FastAPI(title="Book Cover Detection", version="0.1.0", lifespan=lifespan)
-Instrumentator(excluded_handlers=["/health"]).instrument(app).expose(app, endpoint="/metrics")
+Instrumentator(excluded_handlers=["/health", "/ready"]).instrument(app).expose(app, endpoint="/metrics")
 
 
 @app.get("/health", response_model=HealthResponse)
@@ -57,8 +197,15 @@ async def health():
     return HealthResponse(status=status, version="0.1.0")
 
 
+@app.get("/ready", response_model=ReadinessResponse)
+async def ready(response: Response):
+    if not readiness.ready:
+        response.status_code = 503
+    return ReadinessResponse(status=readiness.status, warmup_ms=readiness.warmup_ms)
+
+
 @app.post("/analyze", response_model=CoverAnalysisResponse)
-async def analyze_cover(file: UploadFile = File(...)):
+async def analyze_cover(response: Response, file: UploadFile = File(...)):
     if file.content_type not in ALLOWED_CONTENT_TYPES:
         logger.warning(
             "Invalid content type rejected",
@@ -82,7 +229,17 @@ async def analyze_cover(file: UploadFile = File(...)):
         )
 
     assert analyzer is not None
-    return await analyzer.analyze(image_bytes)
+    try:
+        result, cache_status = await analyzer.analyze_with_cache_status(image_bytes)
+    except OverloadedError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Service overloaded, retry later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    if cache_status is not None:
+        response.headers["X-Cache-Status"] = cache_status.value
+    return result
 
 
 if settings.enable_test_app:
@@ -45,3 +45,7 @@ class CoverAnalysisResponse(CamelModel):
 class HealthResponse(CamelModel):
     status: str
     version: str
+
+class ReadinessResponse(CamelModel):
+    status: str
+    warmup_ms: float | None = None
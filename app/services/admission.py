@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+_QUEUE_DEPTH = Gauge(
+    "cover_detection_admission_queue_depth",
+    "Analyses admitted and waiting for an inference slot",
+)
+_IN_FLIGHT = Gauge(
+    "cover_detection_admission_in_flight",
+    "Analyses currently holding an inference slot",
+)
+_QUEUE_WAIT = Histogram(
+    "cover_detection_admission_queue_wait_seconds",
+    "Time admitted analyses waited for an inference slot",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+_REJECTED = Counter(
+    "cover_detection_admission_rejected_total",
+    "Analyses rejected because the inference queue was full",
+)
+
+# Weight of the newest sample in the moving average of slot hold times.
+_LATENCY_SMOOTHING = 0.2
+
+
+class OverloadedError(Exception):
+    """Raised when the inference queue is full; ``retry_after`` is in seconds."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(f"Inference queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded admission in front of the OCR + NLP pipeline.
+
+    At most ``max_concurrency`` analyses run at once and at most ``max_queue``
+    more wait for a slot. Anything beyond that is rejected immediately with
+    :class:`OverloadedError` rather than queueing until the client gives up.
+    The rejection carries a retry estimate: the time to drain everything
+    currently admitted, from a moving average of recent slot hold times.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, initial_latency_s: float = 1.0) -> None:
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be >= 1, got {max_concurrency}")
+        if max_queue < 0:
+            raise ValueError(f"max_queue must be >= 0, got {max_queue}")
+        self._max_concurrency = max_concurrency
+        self._max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._in_flight = 0
+        self._avg_latency_s = initial_latency_s
+
+    def retry_after(self) -> int:
+        """Whole seconds until the work admitted now should have drained."""
+        admitted = self._in_flight + self._waiting
+        return max(1, math.ceil(admitted * self._avg_latency_s / self._max_concurrency))
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self._in_flight + self._waiting >= self._max_concurrency + self._max_queue:
+            retry_after = self.retry_after()
+            _REJECTED.inc()
+            logger.warning(
+                "Analysis rejected, inference queue full",
+                extra={"in_flight": self._in_flight, "queued": self._waiting, "retry_after_s": retry_after},
+            )
+            raise OverloadedError(retry_after)
+
+        self._waiting += 1
+        _QUEUE_DEPTH.set(self._waiting)
+        t_queued = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+            _QUEUE_DEPTH.set(self._waiting)
+        t_start = time.perf_counter()
+        _QUEUE_WAIT.observe(t_start - t_queued)
+
+        self._in_flight += 1
+        _IN_FLIGHT.set(self._in_flight)
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            _IN_FLIGHT.set(self._in_flight)
+            self._semaphore.release()
+            latency = time.perf_counter() - t_start
+            self._avg_latency_s += _LATENCY_SMOOTHING * (latency - self._avg_latency_s)
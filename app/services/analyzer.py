@@ -1,11 +1,19 @@
+import asyncio
+import hashlib
 import logging
 import time
+from contextlib import nullcontext
 
-from prometheus_client import Histogram
+from prometheus_client import Counter, Histogram
 
 from app.interfaces.nlp import NlpEngine
 from app.interfaces.ocr import OcrEngine
 from app.models import AnalysisStatus, CoverAnalysisResponse
+from app.services.admission import AdmissionController
+from app.services.cpu_budget import CpuBudget
+from app.services.executors import DECODE, stage_executor
+from app.services.near_duplicate import NearDuplicateIndex, perceptual_hash
+from app.services.result_cache import CacheStatus, ResultCache
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +29,10 @@ _TOTAL_DURATION = Histogram(
     "cover_detection_total_duration_seconds",
     "Total analysis time (OCR + NLP)",
 )
+_COALESCED = Counter(
+    "cover_detection_coalesced_requests_total",
+    "Requests that awaited an identical in-flight analysis instead of running their own",
+)
 
 
 class CoverAnalyzer:
@@ -28,16 +40,114 @@ class CoverAnalyzer:
         self,
         ocr_engine: OcrEngine,
         nlp_engine: NlpEngine,
+        result_cache: ResultCache | None = None,
+        near_duplicates: NearDuplicateIndex | None = None,
+        admission: AdmissionController | None = None,
+        cpu_budget: CpuBudget | None = None,
     ) -> None:
         self._ocr = ocr_engine
         self._nlp = nlp_engine
+        self._cache = result_cache
+        self._near_duplicates = near_duplicates
+        self._admission = admission
+        self._cpu_budget = cpu_budget
+        self._in_flight: dict[str, asyncio.Future] = {}
 
     async def analyze(self, image_bytes: bytes) -> CoverAnalysisResponse:
+        response, _ = await self.analyze_with_cache_status(image_bytes)
+        return response
+
+    async def analyze_with_cache_status(
+        self, image_bytes: bytes
+    ) -> tuple[CoverAnalysisResponse, CacheStatus | None]:
+        """Analyze an image, serving repeat uploads from the result caches.
+
+        Exact byte matches are served from the result cache; otherwise the
+        near-duplicate index is checked for an earlier photo of the same cover.
+        Returns the response and how it was served, or ``None`` for the status
+        when both caches are disabled. Only successful responses are cached.
+
+        Concurrent requests for identical bytes (client retries, two users
+        scanning the same book) share one analysis: later arrivals await the
+        first request's result and report its status.
+
+        Raises :class:`~app.services.admission.OverloadedError` when the
+        analysis would need the pipeline and the admission queue is full;
+        cache hits are served regardless of load.
+        """
+        # hashlib releases the GIL for large inputs; hash multi-MB uploads off the loop.
+        key = await asyncio.to_thread(self._key, image_bytes)
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            _COALESCED.inc()
+            logger.info("Coalesced with in-flight analysis")
+            return await asyncio.shield(in_flight)
+
+        # Run as a task so a disconnecting first caller doesn't cancel the
+        # analysis the others are waiting on.
+        task = asyncio.ensure_future(self._analyze_uncoalesced(key, image_bytes))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def _key(self, image_bytes: bytes) -> str:
+        if self._cache is not None:
+            return self._cache.key(image_bytes)
+        return hashlib.sha256(image_bytes).hexdigest()
+
+    async def _analyze_uncoalesced(
+        self, key: str, image_bytes: bytes
+    ) -> tuple[CoverAnalysisResponse, CacheStatus | None]:
+        if self._cache is None and self._near_duplicates is None:
+            return await self._run_admitted(image_bytes), None
+
+        t_start = time.perf_counter()
+        if self._cache is not None:
+            cached = await self._cache.get(key)
+            if cached is not None:
+                logger.info(
+                    "Result cache hit",
+                    extra={"duration_ms": round((time.perf_counter() - t_start) * 1000, 1)},
+                )
+                return cached, CacheStatus.HIT
+
+        fingerprint = None
+        if self._near_duplicates is not None:
+            fingerprint = await asyncio.get_running_loop().run_in_executor(
+                stage_executor(DECODE), perceptual_hash, image_bytes
+            )
+            match = self._near_duplicates.find(*fingerprint) if fingerprint is not None else None
+            if match is not None:
+                if self._cache is not None:
+                    await self._cache.put(key, match)
+                logger.info(
+                    "Near-duplicate cache hit",
+                    extra={"duration_ms": round((time.perf_counter() - t_start) * 1000, 1)},
+                )
+                return match, CacheStatus.NEAR_HIT
+
+        response = await self._run_admitted(image_bytes)
+        if response.analysisStatus.is_success:
+            if self._cache is not None:
+                await self._cache.put(key, response)
+            if fingerprint is not None:
+                self._near_duplicates.add(fingerprint[0], fingerprint[1], response)
+        return response, CacheStatus.MISS
+
+    async def _run_admitted(self, image_bytes: bytes) -> CoverAnalysisResponse:
+        if self._admission is None:
+            return await self._run_pipeline(image_bytes)
+        async with self._admission.slot():
+            return await self._run_pipeline(image_bytes)
+
+    async def _run_pipeline(self, image_bytes: bytes) -> CoverAnalysisResponse:
         t_start = time.perf_counter()
 
         try:
             t_ocr_start = time.perf_counter()
-            ocr_result = await self._ocr.extract_text(image_bytes)
+            with self._cpu_budget.ocr_running() if self._cpu_budget is not None else nullcontext():
+                ocr_result = await self._ocr.extract_text(image_bytes)
             ocr_duration = time.perf_counter() - t_ocr_start
             _OCR_DURATION.observe(ocr_duration)
             logger.info("OCR completed", extra={"duration_ms": round(ocr_duration * 1000, 1)})
@@ -0,0 +1,300 @@
+import json
+import logging
+import os
+import platform
+import statistics
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from app import constants
+from app.config import settings
+from app.services.cpu_budget import CpuBudget, container_cpu_count
+
+logger = logging.getLogger(__name__)
+
+# Quantization suffixes of the onnx-community export, fastest-first on
+# typical x86 hosts. "" is the fp32 graph set.
+QUANTIZATION_VARIANTS = ("q4", "int8", "fp16", "")
+
+_GRAPHS = ("vision_encoder", "embed_tokens", "encoder_model", "decoder_model_merged")
+
+# CPU features that decide which ORT kernels are fast. x86 names come from
+# /proc/cpuinfo "flags", ARM names from "Features".
+_ISA_FLAGS = frozenset({
+    "avx2", "fma", "f16c", "avx512f", "avx512_vnni", "avx_vnni", "avx512_bf16", "avx512_fp16",
+    "amx_int8", "amx_bf16", "asimd", "asimddp", "asimdhp", "i8mm", "bf16", "sve",
+})
+# fp16 graphs only beat fp32 on CPUs with native fp16 arithmetic; elsewhere
+# ORT inserts casts around every op.
+_NATIVE_FP16 = frozenset({"avx512_fp16", "asimdhp"})
+
+# Words each fixture cover's OCR text must contain — the same checks as
+# tests/integration/test_pipeline.py.
+FIXTURE_KEYWORDS = {
+    "a-restless-truth": ("freya", "marske", "truth"),
+    "gardens-of-the-moon": ("steven", "erikson", "gardens", "moon"),
+    "jade-city": ("fonda", "lee", "jade", "city"),
+    "mistborn": ("brandon", "sanderson", "mistborn"),
+    "snow-crash": ("neal", "stephenson", "snow", "crash"),
+    "to-kill-a-mockingbird": ("harper", "lee", "kill", "mockingbird"),
+    "under-the-whispering-door": ("klune", "tj", "under", "whispering", "door"),
+}
+
+
+def variant_label(quantization: str) -> str:
+    return quantization or "fp32"
+
+
+def cpu_isa_features(cpuinfo: Path = Path("/proc/cpuinfo")) -> set[str]:
+    """Performance-relevant instruction set extensions of this CPU."""
+    try:
+        text = cpuinfo.read_text()
+    except OSError:
+        return set()
+    for line in text.splitlines():
+        key, _, value = line.partition(":")
+        if key.strip() in ("flags", "Features"):
+            return set(value.split()) & _ISA_FLAGS
+    return set()
+
+
+def _cpu_model(cpuinfo: Path = Path("/proc/cpuinfo")) -> str:
+    try:
+        for line in cpuinfo.read_text().splitlines():
+            key, _, value = line.partition(":")
+            if key.strip() in ("model name", "CPU part"):
+                return value.strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def available_variants(model_path: str | Path) -> list[str]:
+    """Quantization variants whose four graphs are all present."""
+    onnx_dir = Path(model_path) / "onnx"
+    return [
+        q for q in QUANTIZATION_VARIANTS
+        if all((onnx_dir / f"{graph}{'_' + q if q else ''}.onnx").exists() for graph in _GRAPHS)
+    ]
+
+
+def candidate_variants(model_path: str | Path, isa: set[str]) -> list[str]:
+    variants = available_variants(model_path)
+    if not isa & _NATIVE_FP16:
+        variants = [q for q in variants if q != "fp16"]
+    return variants
+
+
+def default_max_threads() -> int:
+    """The OCR thread budget the service would use on this host."""
+    if settings.cpu_budget:
+        return CpuBudget.from_settings().ocr_threads
+    return container_cpu_count()
+
+
+def candidate_threads(max_threads: int) -> list[int]:
+    """Powers of two up to ``max_threads``, plus ``max_threads`` itself."""
+    counts = {max_threads}
+    n = 1
+    while n < max_threads:
+        counts.add(n)
+        n *= 2
+    return sorted(counts)
+
+
+def host_fingerprint(isa: set[str], max_threads: int) -> dict:
+    """What a persisted tuning depends on; any change triggers a new search."""
+    import onnxruntime as ort
+
+    return {
+        "cpu_model": _cpu_model(),
+        "isa": sorted(isa),
+        "max_threads": max_threads,
+        "onnxruntime": ort.__version__,
+        "model_revision": constants.FLORENCE2_ONNX_REVISION,
+    }
+
+
+def fixture_failures(name: str, text: str) -> list[str]:
+    """Keywords missing from a fixture cover's OCR text."""
+    lowered = text.lower()
+    return [word for word in FIXTURE_KEYWORDS.get(name, ()) if word not in lowered]
+
+
+def load_fixture_images(images_dir: str | Path) -> dict[str, bytes]:
+    """Fixture covers in ``images_dir`` that have keyword checks."""
+    images_dir = Path(images_dir)
+    return {
+        name: (images_dir / f"{name}.jpg").read_bytes()
+        for name in FIXTURE_KEYWORDS
+        if (images_dir / f"{name}.jpg").exists()
+    }
+
+
+@dataclass
+class TuningResult:
+    quantization: str
+    intra_op_num_threads: int
+    mean_latency_ms: float
+    host: dict
+    candidates: list[dict] = field(default_factory=list)
+
+
+def load_tuning(path: str | Path, host: dict) -> TuningResult | None:
+    """A persisted tuning for this host, or ``None`` if missing or stale."""
+    try:
+        data = json.loads(Path(path).read_text())
+        result = TuningResult(**data)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, TypeError) as e:
+        logger.warning("Ignoring unreadable autotune result", extra={"path": str(path), "error": str(e)})
+        return None
+    if result.host != host:
+        logger.info("Autotune result is for a different host or model; re-tuning", extra={"path": str(path)})
+        return None
+    return result
+
+
+def save_tuning(path: str | Path, result: TuningResult) -> None:
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        tmp_path.write_text(json.dumps(asdict(result), indent=2))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        tmp_path.unlink(missing_ok=True)
+        logger.warning("Could not persist autotune result", extra={"path": str(path), "error": str(e)})
+
+
+async def _measure(engine, images: dict[str, bytes], repeats: int) -> tuple[float, dict[str, list[str]]]:
+    """Mean per-image latency in ms, and missing keywords per failing fixture."""
+    first = next(iter(images.values()))
+    await engine.extract_text(first)  # warm-up: arena allocation, first-run kernel selection
+
+    latencies = []
+    failures: dict[str, list[str]] = {}
+    for _ in range(repeats):
+        for name, image_bytes in images.items():
+            t0 = time.perf_counter()
+            result = await engine.extract_text(image_bytes)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            missing = fixture_failures(name, result.text)
+            if missing:
+                failures[name] = missing
+    return statistics.mean(latencies), failures
+
+
+async def autotune(
+    model_path: str,
+    images: dict[str, bytes],
+    max_threads: int,
+    processor_name: str = constants.FLORENCE2_PROCESSOR_MODEL,
+    variants: list[str] | None = None,
+    thread_counts: list[int] | None = None,
+    repeats: int = 1,
+) -> TuningResult:
+    """Time every (quantization, thread count) candidate over the fixture covers.
+
+    Each candidate loads a fresh ``Florence2OnnxEngine`` with micro-batching
+    off and runs the covers sequentially. A variant that misses any fixture
+    keyword is dropped without trying its other thread counts. Returns the
+    fastest passing candidate; raises ``RuntimeError`` if none pass.
+    """
+    from app.engines.florence2_onnx_engine import Florence2OnnxEngine
+
+    isa = cpu_isa_features()
+    variants = variants if variants is not None else candidate_variants(model_path, isa)
+    if not variants:
+        raise RuntimeError(f"No complete ONNX model variants found in {model_path}/onnx")
+    thread_counts = thread_counts or candidate_threads(max_threads)
+    logger.info(
+        "Autotuning ONNX engine",
+        extra={
+            "isa": sorted(isa),
+            "variants": [variant_label(q) for q in variants],
+            "threads": thread_counts,
+            "images": len(images),
+        },
+    )
+
+    candidates = []
+    for quantization in variants:
+        for threads in thread_counts:
+            engine = Florence2OnnxEngine(
+                model_path=model_path,
+                processor_name=processor_name,
+                quantization=quantization,
+                vision_quantization=quantization,
+                encoder_quantization=quantization,
+                decoder_quantization=quantization,
+                intra_op_num_threads=threads,
+                max_batch_size=1,
+            )
+            latency_ms, failures = await _measure(engine, images, repeats)
+            del engine
+            candidate = {
+                "quantization": quantization,
+                "intra_op_num_threads": threads,
+                "mean_latency_ms": round(latency_ms, 1),
+                "passed": not failures,
+                "failures": failures,
+            }
+            candidates.append(candidate)
+            logger.info("Autotune candidate", extra=candidate)
+            if failures:
+                break
+
+    passing = [c for c in candidates if c["passed"]]
+    if not passing:
+        raise RuntimeError("No ONNX configuration passed the fixture accuracy checks")
+    best = min(passing, key=lambda c: c["mean_latency_ms"])
+    return TuningResult(
+        quantization=best["quantization"],
+        intra_op_num_threads=best["intra_op_num_threads"],
+        mean_latency_ms=best["mean_latency_ms"],
+        host=host_fingerprint(isa, max_threads),
+        candidates=candidates,
+    )
+
+
+async def load_or_autotune(
+    model_path: str,
+    images_dir: str | Path,
+    tuning_path: str | Path,
+    max_threads: int,
+    processor_name: str = constants.FLORENCE2_PROCESSOR_MODEL,
+) -> TuningResult | None:
+    """Reuse the persisted tuning for this host, or search and persist a new one.
+
+    Returns ``None`` (keep the configured settings) when there is no
+    persisted result and the fixture images aren't available.
+    """
+    host = host_fingerprint(cpu_isa_features(), max_threads)
+    result = load_tuning(tuning_path, host)
+    if result is not None:
+        logger.info(
+            "Using persisted autotune result",
+            extra={"quantization": variant_label(result.quantization), "threads": result.intra_op_num_threads},
+        )
+        return result
+
+    images = load_fixture_images(images_dir)
+    if not images:
+        logger.warning("Autotune skipped: no fixture images found", extra={"images_dir": str(images_dir)})
+        return None
+
+    t0 = time.perf_counter()
+    result = await autotune(model_path, images, max_threads, processor_name=processor_name)
+    save_tuning(tuning_path, result)
+    logger.info(
+        "Autotune complete",
+        extra={
+            "quantization": variant_label(result.quantization),
+            "threads": result.intra_op_num_threads,
+            "mean_latency_ms": result.mean_latency_ms,
+            "duration_ms": round((time.perf_counter() - t0) * 1000, 1),
+        },
+    )
+    return result
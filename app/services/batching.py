@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Callable, Generic, TypeVar
+
+from prometheus_client import Histogram
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_BATCH_SIZE = Histogram(
+    "cover_detection_batch_size",
+    "Number of requests coalesced into a single batched model call",
+    ["stage"],
+    buckets=(1, 2, 4, 8, 16, 32),
+)
+
+
+@dataclass
+class _PendingBatch:
+    loop: asyncio.AbstractEventLoop
+    items: list = field(default_factory=list)
+    futures: list = field(default_factory=list)
+    full: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class MicroBatcher(Generic[T, R]):
+    """Coalesces concurrent ``submit`` calls into batched calls of ``batch_fn``.
+
+    The first submission opens a batch and waits up to ``window_ms`` for more
+    items to arrive (or until ``max_batch_size`` is reached), then runs
+    ``batch_fn`` once in ``executor`` and fans the results back out. ``batch_fn``
+    must return one result per input, in order.
+
+    There is no long-lived worker task — each batch is flushed by a task
+    scheduled on the loop that opened it, so the batcher works across event
+    loops (e.g. session-scoped engines in pytest).
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[list[T]], list[R]],
+        max_batch_size: int,
+        window_ms: float,
+        stage: str,
+        executor: Executor | None = None,
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be >= 1, got {max_batch_size}")
+        self._batch_fn = batch_fn
+        self._max_batch_size = max_batch_size
+        self._window_s = max(window_ms, 0.0) / 1000
+        self._stage = stage
+        self._executor = executor
+        self._pending: _PendingBatch | None = None
+        # Strong refs so flush tasks aren't garbage collected mid-flight.
+        self._flush_tasks: set[asyncio.Task] = set()
+
+    async def submit(self, item: T) -> R:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+
+        batch = self._pending
+        if batch is None or batch.loop is not loop:
+            batch = _PendingBatch(loop)
+            self._pending = batch
+            task = loop.create_task(self._flush(batch))
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+        batch.items.append(item)
+        batch.futures.append(fut)
+
+        if len(batch.items) >= self._max_batch_size:
+            # Detach so later submissions open a fresh batch.
+            self._pending = None
+            batch.full.set()
+
+        return await fut
+
+    async def _flush(self, batch: _PendingBatch) -> None:
+        if self._window_s > 0:
+            try:
+                await asyncio.wait_for(batch.full.wait(), timeout=self._window_s)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await asyncio.sleep(0)
+        if self._pending is batch:
+            self._pending = None
+
+        _BATCH_SIZE.labels(stage=self._stage).observe(len(batch.items))
+        try:
+            results = await batch.loop.run_in_executor(
+                self._executor, self._batch_fn, list(batch.items)
+            )
+            if len(results) != len(batch.items):
+                raise RuntimeError(
+                    f"{self._stage} batch returned {len(results)} results for {len(batch.items)} inputs"
+                )
+        except Exception as e:
+            logger.error("Batched call failed", extra={"stage": self._stage, "batch_size": len(batch.items), "error": str(e)})
+            for fut in batch.futures:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        for fut, result in zip(batch.futures, results):
+            if not fut.done():
+                fut.set_result(result)
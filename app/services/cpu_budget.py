@@ -0,0 +1,174 @@
+import logging
+import math
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+from app.config import settings
+from app.services import executors
+
+logger = logging.getLogger(__name__)
+
+_CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+
+def _cgroup_cpu_quota(root: Path = _CGROUP_ROOT) -> float | None:
+    """CPU quota in cores from cgroup v2 ``cpu.max`` or v1 CFS files, or ``None`` if unlimited."""
+    try:
+        quota, period = (root / "cpu.max").read_text().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    for v1_dir in (root / "cpu", root / "cpu,cpuacct"):
+        try:
+            quota = int((v1_dir / "cpu.cfs_quota_us").read_text())
+            period = int((v1_dir / "cpu.cfs_period_us").read_text())
+        except (OSError, ValueError):
+            continue
+        return None if quota <= 0 else quota / period
+    return None
+
+
+def _allowed_cores() -> list[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def container_cpu_count(root: Path = _CGROUP_ROOT) -> int:
+    """Cores this process can actually use: the affinity mask, capped by the cgroup quota.
+
+    ``os.cpu_count()`` reports the host's cores, so inside a container limited
+    to two CPUs on a 32-core host it would size thread pools sixteen times too
+    large. A fractional quota is rounded down so the pools never exceed it.
+    """
+    cores = len(_allowed_cores())
+    quota = _cgroup_cpu_quota(root)
+    if quota is not None:
+        cores = min(cores, max(1, math.floor(quota)))
+    return cores
+
+
+def set_torch_threads(count: int) -> None:
+    """Set torch's intra-op thread count for the calling thread if it differs."""
+    import torch  # lazy import — the ONNX OCR path doesn't otherwise need torch
+
+    if torch.get_num_threads() != count:
+        torch.set_num_threads(count)
+
+
+class CpuBudget:
+    """Splits the container's cores between the OCR and NLP stages.
+
+    OCR (ONNX Runtime or torch Florence-2) gets ``ocr_threads`` intra-op
+    threads and NLP (GLiNER under torch) gets the rest, so the two stages
+    running at once never ask for more threads than there are cores. Options:
+
+    - ``global_thread_pool``: all ONNX sessions share one ORT thread pool
+      instead of each session owning ``ocr_threads`` threads, so concurrently
+      decoding cohorts don't multiply the thread count.
+    - ``affinity``: OCR and NLP workers are pinned to disjoint cores. ORT
+      intra-op threads are pinned through the session's thread affinities,
+      which requires per-session pools, so it is ignored with the global pool.
+    - ``rebalance``: while no OCR is running, NLP may use every core.
+
+    On a single core both stages get one thread and simply time-share.
+    """
+
+    def __init__(
+        self,
+        total_cores: int,
+        ocr_share: float = 0.5,
+        cores: list[int] | None = None,
+        global_thread_pool: bool = False,
+        affinity: bool = False,
+        rebalance: bool = True,
+    ) -> None:
+        if total_cores < 1:
+            raise ValueError(f"total_cores must be >= 1, got {total_cores}")
+        if not 0 < ocr_share < 1:
+            raise ValueError(f"ocr_share must be between 0 and 1, got {ocr_share}")
+        self.total_cores = total_cores
+        if total_cores == 1:
+            self.ocr_threads = self.nlp_threads = 1
+        else:
+            self.ocr_threads = min(total_cores - 1, max(1, round(total_cores * ocr_share)))
+            self.nlp_threads = total_cores - self.ocr_threads
+        cores = (cores if cores is not None else _allowed_cores())[:total_cores]
+        self.ocr_cores = tuple(cores[:self.ocr_threads])
+        self.nlp_cores = tuple(cores[self.ocr_threads:]) or self.ocr_cores
+        self.global_thread_pool = global_thread_pool
+        self.affinity = affinity and total_cores > 1
+        self.rebalance = rebalance
+        self._ocr_running = 0
+
+    @classmethod
+    def from_settings(cls) -> "CpuBudget":
+        total = settings.cpu_budget_cores or container_cpu_count()
+        return cls(
+            total,
+            ocr_share=settings.cpu_budget_ocr_share,
+            global_thread_pool=settings.onnx_global_thread_pool,
+            affinity=settings.cpu_affinity,
+            rebalance=settings.cpu_budget_rebalance,
+        )
+
+    def install(self) -> None:
+        """Apply process-wide settings. Call before any ONNX session or stage executor exists."""
+        if self.global_thread_pool:
+            from onnxruntime.capi import _pybind_state
+
+            _pybind_state.set_global_thread_pool_sizes(self.ocr_threads, 1)
+        if self.affinity:
+            executors.set_stage_affinity(executors.OCR, self.ocr_cores)
+            executors.set_stage_affinity(executors.NLP, self.nlp_cores)
+        logger.info(
+            "CPU budget installed",
+            extra={
+                "total_cores": self.total_cores,
+                "ocr_threads": self.ocr_threads,
+                "nlp_threads": self.nlp_threads,
+                "global_thread_pool": self.global_thread_pool,
+                "affinity": self.affinity,
+            },
+        )
+
+    def configure_session_options(self, opts, stage: str = executors.OCR, threads: int | None = None) -> None:
+        """Size an ``ort.SessionOptions`` for the OCR (or NLP) share of the budget.
+
+        ``threads`` (e.g. an autotuned count) replaces the share's thread
+        count, capped at the share. With the global pool it has no effect:
+        that pool was sized by ``install``.
+        """
+        share, cores = (
+            (self.nlp_threads, self.nlp_cores) if stage == executors.NLP else (self.ocr_threads, self.ocr_cores)
+        )
+        threads = min(threads, share) if threads is not None else share
+        cores = cores[:threads]
+        opts.intra_op_num_threads = threads
+        opts.inter_op_num_threads = 1
+        if self.global_thread_pool:
+            opts.use_per_session_threads = False
+        elif self.affinity and threads > 1:
+            # One entry per intra-op thread after the calling thread (which the
+            # stage executor pins); ORT numbers logical processors from 1.
+            opts.add_session_config_entry(
+                "session.intra_op_thread_affinities",
+                ";".join(str(core + 1) for core in cores[1:]),
+            )
+
+    @contextmanager
+    def ocr_running(self) -> Iterator[None]:
+        """Mark an OCR call in flight so NLP doesn't grow into its cores."""
+        self._ocr_running += 1
+        try:
+            yield
+        finally:
+            self._ocr_running -= 1
+
+    def nlp_thread_count(self) -> int:
+        """Threads for the next NLP call: its share, or every core while OCR is idle."""
+        if self.rebalance and not self.affinity and self._ocr_running == 0:
+            return self.total_cores
+        return self.nlp_threads
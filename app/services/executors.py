@@ -0,0 +1,138 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from prometheus_client import Counter, Gauge
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_WORKERS = Gauge(
+    "cover_detection_executor_workers",
+    "Worker threads in each pipeline stage's executor",
+    ["stage"],
+)
+_ACTIVE = Gauge(
+    "cover_detection_executor_active",
+    "Tasks currently running in each pipeline stage's executor",
+    ["stage"],
+)
+_QUEUED = Gauge(
+    "cover_detection_executor_queued",
+    "Tasks waiting for a worker in each pipeline stage's executor",
+    ["stage"],
+)
+_BUSY_SECONDS = Counter(
+    "cover_detection_executor_busy_seconds_total",
+    "Worker time spent running tasks; divide its rate by the worker count for utilisation",
+    ["stage"],
+)
+
+DECODE = "decode"
+OCR = "ocr"
+NLP = "nlp"
+
+_STAGE_SIZES = {
+    DECODE: lambda: settings.decode_workers,
+    OCR: lambda: settings.ocr_workers,
+    NLP: lambda: settings.nlp_workers,
+}
+
+
+def _pin_current_thread(cores: tuple[int, ...]) -> None:
+    # On Linux this pins only the calling thread; threads it starts later
+    # (ORT or OpenMP workers) inherit the mask.
+    os.sched_setaffinity(0, cores)
+
+
+class StageExecutor(ThreadPoolExecutor):
+    """Thread pool for one pipeline stage that exports utilisation metrics.
+
+    With ``cores`` every worker thread is pinned to those CPUs.
+    """
+
+    def __init__(self, stage: str, max_workers: int, cores: tuple[int, ...] | None = None) -> None:
+        if max_workers < 1:
+            raise ValueError(f"{stage} executor needs at least one worker, got {max_workers}")
+        super().__init__(
+            max_workers=max_workers,
+            thread_name_prefix=f"{stage}-worker",
+            initializer=_pin_current_thread if cores else None,
+            initargs=(cores,) if cores else (),
+        )
+        self.stage = stage
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        _WORKERS.labels(stage=stage).set(max_workers)
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        def run():
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+                _QUEUED.labels(stage=self.stage).set(self._queued)
+                _ACTIVE.labels(stage=self.stage).set(self._active)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _BUSY_SECONDS.labels(stage=self.stage).inc(time.perf_counter() - t0)
+                with self._lock:
+                    self._active -= 1
+                    _ACTIVE.labels(stage=self.stage).set(self._active)
+
+        with self._lock:
+            self._queued += 1
+            _QUEUED.labels(stage=self.stage).set(self._queued)
+        future = super().submit(run)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future: Future) -> None:
+        # A task cancelled before it started never ran ``run``.
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+                _QUEUED.labels(stage=self.stage).set(self._queued)
+
+
+_executors: dict[str, StageExecutor] = {}
+_executors_lock = threading.Lock()
+_stage_cores: dict[str, tuple[int, ...]] = {}
+
+
+def set_stage_affinity(stage: str, cores: tuple[int, ...]) -> None:
+    """Pin ``stage``'s executor threads to ``cores``. Must precede the executor's creation."""
+    with _executors_lock:
+        if stage in _executors:
+            raise RuntimeError(f"{stage} executor already created; set affinity before loading engines")
+        _stage_cores[stage] = tuple(cores)
+
+
+def stage_executor(stage: str) -> StageExecutor:
+    """Shared executor for ``stage`` (``DECODE``, ``OCR`` or ``NLP``), sized from settings.
+
+    Each stage gets its own pool so, for example, OCR of one request can
+    overlap NLP of another without both queueing in asyncio's default
+    executor. Created on first use.
+    """
+    with _executors_lock:
+        executor = _executors.get(stage)
+        if executor is None:
+            if stage not in _STAGE_SIZES:
+                raise ValueError(f"Unknown pipeline stage: {stage!r}")
+            executor = StageExecutor(stage, _STAGE_SIZES[stage](), cores=_stage_cores.get(stage))
+            _executors[stage] = executor
+            logger.info("Created stage executor", extra={"stage": stage, "workers": executor._max_workers})
+        return executor
+
+
+def shutdown_executors() -> None:
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()
@@ -0,0 +1,73 @@
+import io
+import logging
+import time
+
+from PIL import ExifTags, Image, ImageOps
+from prometheus_client import Histogram
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_DECODE_DURATION = Histogram(
+    "cover_detection_image_decode_seconds",
+    "Time spent decoding uploaded images",
+)
+
+# EXIF orientations that rotate the image by 90/270 degrees.
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when an image's header dimensions exceed the pixel limit."""
+
+
+def decode_image(
+    image_bytes: bytes,
+    target_size: int | None = None,
+    max_pixels: int | None = None,
+) -> tuple[Image.Image, tuple[int, int]]:
+    """Decode an upload into an upright RGB image sized for the OCR model.
+
+    Blocking — call from a worker thread, not the event loop. Dimensions are
+    checked from the header before any pixels are decoded. JPEGs are decoded
+    with ``draft()`` straight to the smallest DCT scale that is still at
+    least ``target_size`` on both sides, since Florence-2 resizes to 768x768
+    anyway. EXIF orientation is applied.
+
+    Returns the image and the full-resolution (width, height) after
+    orientation, which callers use to map model coordinates to pixels.
+    """
+    target = target_size if target_size is not None else settings.image_decode_size
+    limit = max_pixels if max_pixels is not None else settings.image_max_pixels
+    t0 = time.perf_counter()
+
+    image = Image.open(io.BytesIO(image_bytes))
+    image_format = image.format
+    width, height = image.size
+    if width * height > limit:
+        raise ImageTooLargeError(
+            f"Image is {width}x{height} ({width * height} pixels), over the {limit} pixel limit"
+        )
+
+    orientation = image.getexif().get(ExifTags.Base.Orientation, 1)
+    if orientation in _TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+
+    if target:
+        image.draft("RGB", (target, target))
+    decoded_size = image.size
+    image = ImageOps.exif_transpose(image).convert("RGB")
+
+    duration = time.perf_counter() - t0
+    _DECODE_DURATION.observe(duration)
+    logger.debug(
+        "Image decoded",
+        extra={
+            "format": image_format,
+            "original_size": [width, height],
+            "decoded_size": list(decoded_size),
+            "duration_ms": round(duration * 1000, 1),
+        },
+    )
+    return image, (width, height)
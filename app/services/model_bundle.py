@@ -0,0 +1,121 @@
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+FLORENCE2_DIR = "florence2-onnx"
+GLINER_DIR = "gliner"
+GLINER_ONNX_DIR = "gliner-onnx"
+_HASH_CHUNK = 1 << 20
+
+
+class BundleError(ValueError):
+    """The model bundle is missing, incomplete or doesn't match its manifest."""
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(_HASH_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _bundle_files(root: Path) -> list[Path]:
+    return sorted(
+        p for p in root.rglob("*")
+        if p.is_file() and p.name != MANIFEST and not p.name.endswith(".tmp")
+    )
+
+
+def write_manifest(root: str | Path, metadata: dict) -> dict:
+    """Checksum every file under ``root`` and write ``manifest.json`` next to them."""
+    root = Path(root)
+    manifest = {
+        **metadata,
+        "files": {
+            p.relative_to(root).as_posix(): {"size": p.stat().st_size, "sha256": _sha256(p)}
+            for p in _bundle_files(root)
+        },
+    }
+    (root / MANIFEST).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    return manifest
+
+
+@dataclass
+class ModelBundle:
+    root: Path
+    manifest: dict
+
+    @property
+    def version(self) -> str:
+        return self.manifest.get("version", self.root.name)
+
+    @property
+    def onnx_model_path(self) -> str:
+        return str(self.root / FLORENCE2_DIR)
+
+    @property
+    def gliner_model_path(self) -> str:
+        return str(self.root / GLINER_DIR)
+
+    @property
+    def gliner_onnx_model_path(self) -> str:
+        return str(self.root / GLINER_ONNX_DIR)
+
+
+def load_bundle(path: str | Path, verify: bool = False) -> ModelBundle:
+    """Open a bundle written by ``scripts/sync_onnx_model.py --bundle``.
+
+    Every manifest entry must exist with its recorded size. With ``verify``
+    the files are also hashed, which reads the whole bundle; without it
+    start-up only stats the files. Raises ``BundleError`` on any mismatch.
+    """
+    t0 = time.perf_counter()
+    root = Path(path)
+    try:
+        manifest = json.loads((root / MANIFEST).read_text())
+    except (OSError, ValueError) as e:
+        raise BundleError(f"Unreadable bundle manifest in {root}: {e}") from e
+
+    problems = []
+    for name, entry in manifest.get("files", {}).items():
+        file = root / name
+        try:
+            size = file.stat().st_size
+        except OSError:
+            problems.append(f"{name}: missing")
+            continue
+        if size != entry["size"]:
+            problems.append(f"{name}: size {size} != {entry['size']}")
+        elif verify and _sha256(file) != entry["sha256"]:
+            problems.append(f"{name}: checksum mismatch")
+    if problems:
+        raise BundleError(f"Model bundle {root} doesn't match its manifest: {'; '.join(problems[:5])}")
+
+    bundle = ModelBundle(root=root, manifest=manifest)
+    logger.info(
+        "Model bundle loaded",
+        extra={
+            "path": str(root),
+            "version": bundle.version,
+            "files": len(manifest.get("files", {})),
+            "verified": verify,
+            "duration_ms": round((time.perf_counter() - t0) * 1000, 1),
+        },
+    )
+    return bundle
+
+
+def bundle_version(
+    onnx_revision: str, gliner_revision: str, quantization: str, ort_version: str, gliner_onnx: bool = False
+) -> str:
+    """Directory name identifying what a bundle was built from."""
+    gliner = "gliner-onnx" if gliner_onnx else "gliner"
+    return f"florence2-{onnx_revision[:8]}_{gliner}-{gliner_revision[:8]}_{quantization or 'fp32'}_ort-{ort_version}"
+
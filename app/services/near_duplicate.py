@@ -0,0 +1,177 @@
+import itertools
+import logging
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.models import CoverAnalysisResponse, OcrBoundingBox
+from app.services.images import decode_image
+
+logger = logging.getLogger(__name__)
+
+_REQUESTS = Counter(
+    "cover_detection_near_duplicate_requests_total",
+    "Near-duplicate index lookups by outcome",
+    ["result"],
+)
+_MATCH_DISTANCE = Histogram(
+    "cover_detection_near_duplicate_distance",
+    "Hamming distance of near-duplicate matches",
+    buckets=(0, 1, 2, 4, 6, 8, 10, 12, 16),
+)
+_ENTRIES = Gauge(
+    "cover_detection_near_duplicate_entries",
+    "Entries held in the near-duplicate index",
+)
+
+_HASH_BITS = 64
+_DCT_SIZE = 32
+_LOW_FREQ = 8
+# Decode just enough pixels for a 32x32 hash input; JPEG draft mode turns
+# this into a 1/8-scale decode.
+_HASH_DECODE_SIZE = 64
+# Multi-index hashing: four 16-bit chunks, one lookup table per chunk.
+_CHUNKS = 4
+_CHUNK_BITS = _HASH_BITS // _CHUNKS
+_CHUNK_MASK = (1 << _CHUNK_BITS) - 1
+
+_DCT = np.cos(
+    np.pi * (2 * np.arange(_DCT_SIZE)[None, :] + 1) * np.arange(_DCT_SIZE)[:, None] / (2 * _DCT_SIZE)
+)
+
+
+def phash(image: Image.Image) -> int:
+    """64-bit DCT perceptual hash.
+
+    The image is reduced to 32x32 greyscale and transformed with a 2-D DCT.
+    Each of the 8x8 lowest-frequency coefficients contributes a bit: set
+    when it is above the median (DC excluded from the median).
+    """
+    pixels = np.asarray(
+        image.convert("L").resize((_DCT_SIZE, _DCT_SIZE), Image.Resampling.BOX), dtype=np.float64
+    )
+    coeffs = (_DCT @ pixels @ _DCT.T)[:_LOW_FREQ, :_LOW_FREQ].flatten()
+    bits = np.packbits(coeffs > np.median(coeffs[1:]))
+    return int.from_bytes(bits.tobytes(), "big")
+
+
+def perceptual_hash(image_bytes: bytes) -> tuple[int, tuple[int, int]] | None:
+    """Hash an upload from a cheap low-resolution decode.
+
+    Returns the hash and the full-resolution upright size, or ``None`` when
+    the bytes can't be decoded (the pipeline then reports the error).
+    Blocking — call from a worker thread.
+    """
+    try:
+        image, size = decode_image(image_bytes, target_size=_HASH_DECODE_SIZE)
+    except Exception:
+        return None
+    return phash(image), size
+
+
+def _chunks(value: int) -> list[int]:
+    return [(value >> (i * _CHUNK_BITS)) & _CHUNK_MASK for i in range(_CHUNKS)]
+
+
+def _flip_masks(radius: int) -> list[int]:
+    """Every 16-bit mask with at most ``radius`` bits set."""
+    masks = [0]
+    for r in range(1, radius + 1):
+        for bits in itertools.combinations(range(_CHUNK_BITS), r):
+            masks.append(sum(1 << b for b in bits))
+    return masks
+
+
+class NearDuplicateIndex:
+    """LRU-bounded index of analysis results keyed by perceptual hash.
+
+    Lookups find the closest stored hash within ``max_distance`` bits using
+    multi-index hashing. The 64-bit hash is split into four 16-bit chunks.
+    By pigeonhole, any match within ``max_distance`` has at least one chunk
+    within ``max_distance // 4`` bits, so a lookup only probes those chunk
+    neighbourhoods instead of scanning every entry. Unlike a BK-tree, an
+    entry is removed by deleting it from four buckets, which keeps LRU
+    eviction cheap.
+    """
+
+    def __init__(self, max_entries: int, max_distance: int) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be >= 1")
+        if not 0 <= max_distance < _HASH_BITS:
+            raise ValueError(f"max_distance must be in [0, {_HASH_BITS})")
+        self._max_entries = max_entries
+        self._max_distance = max_distance
+        self._masks = _flip_masks(max_distance // _CHUNKS)
+        self._entries: OrderedDict[int, tuple[CoverAnalysisResponse, tuple[int, int]]] = OrderedDict()
+        self._tables: list[dict[int, set[int]]] = [{} for _ in range(_CHUNKS)]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def find(self, value: int, image_size: tuple[int, int]) -> CoverAnalysisResponse | None:
+        """Return the nearest stored result, with regions rescaled to ``image_size``."""
+        best, best_distance = None, self._max_distance + 1
+        seen: set[int] = set()
+        for table, chunk in zip(self._tables, _chunks(value)):
+            for mask in self._masks:
+                for candidate in table.get(chunk ^ mask, ()):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    distance = (candidate ^ value).bit_count()
+                    if distance < best_distance:
+                        best, best_distance = candidate, distance
+
+        if best is None:
+            _REQUESTS.labels(result="miss").inc()
+            return None
+        _REQUESTS.labels(result="hit").inc()
+        _MATCH_DISTANCE.observe(best_distance)
+        self._entries.move_to_end(best)
+        response, stored_size = self._entries[best]
+        logger.debug(
+            "Near-duplicate match",
+            extra={"distance": best_distance, "candidates": len(seen)},
+        )
+        return _rescale(response, stored_size, image_size)
+
+    def add(self, value: int, image_size: tuple[int, int], response: CoverAnalysisResponse) -> None:
+        if value in self._entries:
+            self._entries.move_to_end(value)
+        else:
+            for table, chunk in zip(self._tables, _chunks(value)):
+                table.setdefault(chunk, set()).add(value)
+        self._entries[value] = (response, image_size)
+        while len(self._entries) > self._max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            for table, chunk in zip(self._tables, _chunks(evicted)):
+                bucket = table[chunk]
+                bucket.discard(evicted)
+                if not bucket:
+                    del table[chunk]
+        _ENTRIES.set(len(self._entries))
+
+
+def _rescale(
+    response: CoverAnalysisResponse, from_size: tuple[int, int], to_size: tuple[int, int]
+) -> CoverAnalysisResponse:
+    """Map a stored result's region coordinates onto a new photo's size.
+
+    Near-duplicate photos frame the cover almost identically, so a
+    proportional rescale keeps regions approximately in place.
+    """
+    if response.ocr_result is None or from_size == to_size:
+        return response
+    sx, sy = to_size[0] / from_size[0], to_size[1] / from_size[1]
+    regions = [
+        OcrBoundingBox(
+            text=r.text,
+            confidence=r.confidence,
+            coordinates=[[x * sx, y * sy] for x, y in r.coordinates],
+        )
+        for r in response.ocr_result.regions
+    ]
+    ocr_result = response.ocr_result.model_copy(update={"regions": regions})
+    return response.model_copy(update={"ocr_result": ocr_result})
@@ -0,0 +1,93 @@
+import logging
+import re
+
+from prometheus_client import Counter
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# GLiNER's default word splitter; the model's input length is counted in these.
+_WORD = re.compile(r"\w+(?:[-_]\w+)*|\S")
+
+_PRUNED_REGIONS = Counter(
+    "cover_detection_nlp_pruned_regions_total",
+    "OCR regions dropped before NLP by geometry-based pruning",
+    ["reason"],
+)
+_PRUNED_TOKENS = Counter(
+    "cover_detection_nlp_pruned_tokens_total",
+    "GLiNER input words saved by geometry-based pruning",
+)
+
+
+def count_tokens(text: str) -> int:
+    """Words as GLiNER splits them before subword tokenization."""
+    return len(_WORD.findall(text))
+
+
+class RegionPruner:
+    """Drops OCR regions that can't be the author or title before NLP.
+
+    Titles and author names are the most prominent type on a cover. Blurbs,
+    publisher lines and reviewer quotes are set much smaller. Heights are
+    compared with the tallest region on the cover, so the photo's scale
+    doesn't matter:
+
+    - ``min_height_ratio``: regions shorter than this fraction of the tallest
+      are dropped.
+    - ``fine_print_height_ratio`` / ``fine_print_max_words``: regions shorter
+      than this fraction and longer than this many words are dropped as
+      fine print (taglines, series lines, quotes). Short regions are kept,
+      since a small author name is usually one or two words.
+
+    A ratio of 0 disables its rule.
+    """
+
+    def __init__(
+        self,
+        min_height_ratio: float = 0.0,
+        fine_print_height_ratio: float = 0.0,
+        fine_print_max_words: int = 3,
+    ) -> None:
+        self.min_height_ratio = min_height_ratio
+        self.fine_print_height_ratio = fine_print_height_ratio
+        self.fine_print_max_words = fine_print_max_words
+
+    @classmethod
+    def from_settings(cls) -> "RegionPruner":
+        return cls(
+            min_height_ratio=settings.nlp_prune_min_height_ratio,
+            fine_print_height_ratio=settings.nlp_prune_fine_print_height_ratio,
+            fine_print_max_words=settings.nlp_prune_fine_print_max_words,
+        )
+
+    def _reason(self, text: str, height: float, tallest: float) -> str | None:
+        ratio = height / tallest
+        if ratio < self.min_height_ratio:
+            return "height"
+        if ratio < self.fine_print_height_ratio and count_tokens(text) > self.fine_print_max_words:
+            return "fine_print"
+        return None
+
+    def prune(self, regions: list[tuple[str, float]]) -> list[tuple[str, float]]:
+        """Return the (text, height) regions worth sending to NLP, in order."""
+        tallest = max((height for _, height in regions), default=0.0)
+        if tallest <= 0 or not (self.min_height_ratio or self.fine_print_height_ratio):
+            return regions
+        kept = []
+        saved = 0
+        for text, height in regions:
+            reason = self._reason(text, height, tallest)
+            if reason is None:
+                kept.append((text, height))
+                continue
+            _PRUNED_REGIONS.labels(reason=reason).inc()
+            saved += count_tokens(text)
+        if saved:
+            _PRUNED_TOKENS.inc(saved)
+            logger.debug(
+                "Pruned OCR regions before NLP",
+                extra={"regions": len(regions), "kept": len(kept), "tokens_saved": saved},
+            )
+        return kept
@@ -0,0 +1,206 @@
+import asyncio
+import enum
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from prometheus_client import Counter, Gauge
+
+from app import constants
+from app.config import settings
+from app.models import CoverAnalysisResponse
+
+logger = logging.getLogger(__name__)
+
+_REQUESTS = Counter(
+    "cover_detection_result_cache_requests_total",
+    "Result cache lookups by outcome",
+    ["result"],
+)
+_ENTRIES = Gauge(
+    "cover_detection_result_cache_entries",
+    "Entries held in the in-memory result cache",
+)
+
+# Bump when the cached response format changes so stale disk entries miss.
+_SCHEMA_VERSION = 1
+
+# Settings that change what /analyze returns for the same image bytes.
+# Throughput-only knobs (threads, batch sizes, windows) are deliberately
+# excluded so tuning them doesn't invalidate the cache.
+_FINGERPRINT_SETTINGS = (
+    "ocr_engine",
+    "onnx_model_path",
+    "model_bundle_path",
+    "onnx_quantization",
+    "onnx_vision_quantization",
+    "onnx_encoder_quantization",
+    "onnx_decoder_quantization",
+    "onnx_embedding_dtype",
+    "pytorch_model_name",
+    "pytorch_florence2_revision",
+    "pytorch_int8",
+    "pytorch_bf16",
+    "gliner_model_revision",
+    "gliner_model_name",
+    "nlp_engine",
+    "gliner_onnx_model_path",
+    "gliner_onnx_model_file",
+    "image_decode_size",
+    "nlp_prune_min_height_ratio",
+    "nlp_prune_fine_print_height_ratio",
+    "nlp_prune_fine_print_max_words",
+    "name_index_path",
+)
+
+
+class CacheStatus(str, enum.Enum):
+    HIT = "HIT"
+    NEAR_HIT = "NEAR-HIT"
+    MISS = "MISS"
+
+
+def cache_fingerprint(**overrides) -> str:
+    """Hash of everything other than the image bytes that determines a response.
+
+    ``overrides`` replace settings values chosen at startup, e.g. an
+    autotuned ``onnx_quantization``.
+    """
+    parts = {
+        "schema": _SCHEMA_VERSION,
+        "florence2_onnx_revision": constants.FLORENCE2_ONNX_REVISION,
+        "gliner_model": constants.GLINER_MODEL,
+        **{name: getattr(settings, name) for name in _FINGERPRINT_SETTINGS},
+        **overrides,
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    """Content-addressed cache of successful analysis responses.
+
+    Keys are a SHA-256 of the configuration fingerprint plus the image bytes,
+    so identical uploads hit regardless of filename and any model or engine
+    change misses. Entries live in a bounded in-memory LRU; with ``disk_dir``
+    they are also written as JSON files that survive restarts and are
+    promoted back into memory on a hit. The disk tier is pruned, oldest
+    access first, once it holds more than ``disk_max_entries`` files.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        disk_dir: str | Path | None = None,
+        disk_max_entries: int = 100_000,
+        fingerprint: str | None = None,
+    ) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be >= 1")
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, CoverAnalysisResponse] = OrderedDict()
+        self._fingerprint = (fingerprint if fingerprint is not None else cache_fingerprint()).encode()
+        self._disk_dir = Path(disk_dir) if disk_dir else None
+        self._disk_max_entries = disk_max_entries
+        self._disk_count = 0
+        # Disk writes run on to_thread workers; the count and pruning are shared.
+        self._disk_lock = threading.Lock()
+        if self._disk_dir is not None:
+            self._disk_dir.mkdir(parents=True, exist_ok=True)
+            self._disk_count = sum(1 for _ in self._disk_dir.glob("*/*.json"))
+
+    def key(self, image_bytes: bytes) -> str:
+        return hashlib.sha256(self._fingerprint + image_bytes).hexdigest()
+
+    async def get(self, key: str) -> CoverAnalysisResponse | None:
+        response = self._entries.get(key)
+        if response is not None:
+            self._entries.move_to_end(key)
+            _REQUESTS.labels(result="hit_memory").inc()
+            return response
+
+        if self._disk_dir is not None:
+            response = await asyncio.to_thread(self._read_disk, key)
+            if response is not None:
+                self._remember(key, response)
+                _REQUESTS.labels(result="hit_disk").inc()
+                return response
+
+        _REQUESTS.labels(result="miss").inc()
+        return None
+
+    async def put(self, key: str, response: CoverAnalysisResponse) -> None:
+        self._remember(key, response)
+        if self._disk_dir is not None:
+            try:
+                await asyncio.to_thread(self._write_disk, key, response)
+            except Exception as e:
+                # The response is already computed; a cache failure mustn't fail the request.
+                logger.warning("Result cache write failed", extra={"key": key, "error": str(e)})
+
+    def _remember(self, key: str, response: CoverAnalysisResponse) -> None:
+        self._entries[key] = response
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+        _ENTRIES.set(len(self._entries))
+
+    def _disk_path(self, key: str) -> Path:
+        return self._disk_dir / key[:2] / f"{key}.json"
+
+    def _read_disk(self, key: str) -> CoverAnalysisResponse | None:
+        path = self._disk_path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)  # refresh access order for pruning
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning("Result cache read failed", extra={"path": str(path), "error": str(e)})
+            return None
+        try:
+            return CoverAnalysisResponse.model_validate_json(data)
+        except ValueError as e:
+            logger.warning("Discarding unreadable result cache entry", extra={"path": str(path), "error": str(e)})
+            path.unlink(missing_ok=True)
+            return None
+
+    def _write_disk(self, key: str, response: CoverAnalysisResponse) -> None:
+        path = self._disk_path(key)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(exist_ok=True)
+            existed = path.exists()
+            tmp_path.write_text(response.model_dump_json())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            tmp_path.unlink(missing_ok=True)
+            logger.warning("Result cache write failed", extra={"path": str(path), "error": str(e)})
+            return
+        if not existed:
+            with self._disk_lock:
+                self._disk_count += 1
+                if self._disk_count > self._disk_max_entries:
+                    self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        """Drop the least recently used files down to 90% of the disk budget.
+
+        Called with ``_disk_lock`` held. Another worker sharing the directory
+        may delete files concurrently, so files that vanish are skipped.
+        """
+        files = []
+        for path in self._disk_dir.glob("*/*.json"):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        files = [path for _, path in sorted(files)]
+        excess = len(files) - int(self._disk_max_entries * 0.9)
+        for path in files[:max(excess, 0)]:
+            path.unlink(missing_ok=True)
+        self._disk_count = len(files) - max(excess, 0)
+        logger.info("Pruned result cache disk tier", extra={"removed": max(excess, 0), "remaining": self._disk_count})
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Pick the fastest ONNX quantization variant and thread count for this host.
+
+Runs the integration fixture covers through Florence2OnnxEngine for every
+available quantization variant (q4, int8, fp16, fp32) and a range of
+intra-op thread counts. fp16 is only tried on CPUs with native fp16
+arithmetic. The fastest configuration whose OCR text still contains every
+fixture keyword is written to the autotune file. The service loads that
+file at startup when ONNX_AUTOTUNE=true, and skips the search while the
+CPU, ONNX Runtime version and model revision match.
+
+Usage:
+    python scripts/autotune_onnx.py --model-dir florence2-onnx
+    python scripts/autotune_onnx.py --model-dir florence2-onnx --variants q4 int8 --threads 2 4
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.autotune import (  # noqa: E402
+    autotune,
+    candidate_variants,
+    cpu_isa_features,
+    default_max_threads,
+    load_fixture_images,
+    save_tuning,
+    variant_label,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Autotune ONNX quantization and thread count")
+    parser.add_argument("--model-dir", type=Path, default=Path("florence2-onnx"), help="ONNX model directory")
+    parser.add_argument(
+        "--images",
+        type=Path,
+        default=Path(__file__).parent.parent / "tests" / "integration" / "images",
+        help="Fixture covers (default: tests/integration/images)",
+    )
+    parser.add_argument("--output", type=Path, default=None, help="Result file (default: <model-dir>/autotune.json)")
+    parser.add_argument(
+        "--max-threads",
+        type=int,
+        default=None,
+        help="Largest thread count to try (default: the service's OCR thread budget; "
+        "a different value makes the service re-tune at startup)",
+    )
+    parser.add_argument("--variants", nargs="+", default=None, help='Variants to try; "fp32" for the unquantized graphs')
+    parser.add_argument("--threads", nargs="+", type=int, default=None, help="Explicit thread counts to try")
+    parser.add_argument("--repeats", type=int, default=1, help="Passes over the fixture covers per candidate")
+    args = parser.parse_args()
+
+    images = load_fixture_images(args.images)
+    if not images:
+        print(f"✗ No fixture covers found in {args.images}", file=sys.stderr)
+        return 1
+
+    isa = cpu_isa_features()
+    variants = (
+        ["" if v == "fp32" else v for v in args.variants]
+        if args.variants
+        else candidate_variants(args.model_dir, isa)
+    )
+    max_threads = args.max_threads or default_max_threads()
+    print(f"CPU features: {' '.join(sorted(isa)) or 'unknown'}")
+    print(f"Variants: {', '.join(variant_label(v) for v in variants)}; up to {max_threads} threads")
+    print(f"{len(images)} fixture covers\n")
+
+    try:
+        result = asyncio.run(autotune(
+            str(args.model_dir),
+            images,
+            max_threads,
+            variants=variants,
+            thread_counts=args.threads,
+            repeats=args.repeats,
+        ))
+    except RuntimeError as e:
+        print(f"✗ {e}", file=sys.stderr)
+        return 1
+
+    print(f"{'variant':<10}{'threads':>8}{'mean ms':>10}  result")
+    for c in result.candidates:
+        status = "pass" if c["passed"] else "FAIL " + ", ".join(
+            f"{name}: {' '.join(words)}" for name, words in c["failures"].items()
+        )
+        print(f"{variant_label(c['quantization']):<10}{c['intra_op_num_threads']:>8}{c['mean_latency_ms']:>10.1f}  {status}")
+
+    output = args.output or args.model_dir / "autotune.json"
+    save_tuning(output, result)
+    print(
+        f"\n✓ Best: {variant_label(result.quantization)} with {result.intra_op_num_threads} threads "
+        f"({result.mean_latency_ms:.1f} ms/cover), written to {output}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Measure precomputed GLiNER label embeddings against the current engine.
+
+The labels are always ["author", "book title"]. The default uni-encoder
+GLiNER reads them together with the text on every call, so they can't be
+cached. A bi-encoder GLiNER encodes labels separately, so
+GLINER_LABEL_EMBEDDINGS=true can encode them once at load. This script
+runs the integration fixture OCR JSONs (tests/integration/fixtures)
+through, each in its own process:
+
+- current: the pinned uni-encoder (GLINER_MODEL at GLINER_REVISION)
+- bi-encoder: --model with its labels re-encoded on every call
+- bi-encoder + cached labels: --model with label embeddings precomputed
+
+It reports, per run:
+
+- mean NLP latency per cover and the speed-up over the current engine
+- peak RSS
+- how many covers have the same top author and title as the current engine
+
+The bi-encoder rows isolate two effects: the model swap, and caching the
+labels. A cover where cached labels disagree with the current engine is a
+mismatch, and the script then exits non-zero.
+
+Usage:
+    python scripts/benchmark_label_embeddings.py
+    python scripts/benchmark_label_embeddings.py --model knowledgator/gliner-bi-base-v1.0 --revision main
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import resource
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import constants  # noqa: E402
+from app.services.autotune import default_max_threads  # noqa: E402
+
+REPO_ROOT = Path(__file__).parent.parent
+
+
+def _evaluate(model: str, revision: str, label_embeddings: bool, fixtures: list[str], threads: int) -> dict:
+    """Analyze every fixture with one engine configuration. Executed in a fresh process."""
+    from app.engines.gliner_engine import GlinerNlpEngine
+    from app.models import OcrResult
+    from app.services.cpu_budget import set_torch_threads
+
+    set_torch_threads(threads)
+    t0 = time.perf_counter()
+    engine = GlinerNlpEngine(
+        model_name=model, revision=revision, label_embeddings=label_embeddings, max_batch_size=1
+    )
+    load_ms = (time.perf_counter() - t0) * 1000
+    ocr_results = {Path(f).stem: OcrResult.model_validate_json(Path(f).read_text()) for f in fixtures}
+
+    async def run() -> tuple[dict, list[float]]:
+        await engine.analyze(next(iter(ocr_results.values())))  # warm-up
+        top, latencies = {}, []
+        for name, ocr in ocr_results.items():
+            t0 = time.perf_counter()
+            analysis = await engine.analyze(ocr)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            top[name] = (
+                analysis.potential_authors[0].lower() if analysis.potential_authors else None,
+                analysis.potential_titles[0].lower() if analysis.potential_titles else None,
+            )
+        return top, latencies
+
+    top, latencies = asyncio.run(run())
+    return {
+        "mean_ms": statistics.mean(latencies),
+        "load_ms": load_ms,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "top": top,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark precomputed GLiNER label embeddings")
+    parser.add_argument(
+        "--model", default="knowledgator/gliner-bi-large-v1.0", help="Bi-encoder GLiNER model name or local path"
+    )
+    parser.add_argument("--revision", default="main", help="Bi-encoder model revision")
+    parser.add_argument("--fixtures", type=Path, default=REPO_ROOT / "tests" / "integration" / "fixtures")
+    parser.add_argument("--threads", type=int, default=None, help="Torch threads (default: OCR thread budget)")
+    args = parser.parse_args()
+
+    fixtures = sorted(str(p) for p in args.fixtures.glob("*.json"))
+    if not fixtures:
+        print(f"✗ No fixture OCR JSONs in {args.fixtures}", file=sys.stderr)
+        return 1
+    threads = args.threads or default_max_threads()
+    runs = [
+        ("current", constants.GLINER_MODEL, constants.GLINER_REVISION, False),
+        ("bi-encoder", args.model, args.revision, False),
+        ("bi + cached labels", args.model, args.revision, True),
+    ]
+    rows = {}
+    spawn = multiprocessing.get_context("spawn")
+    for label, model, revision, cached in runs:
+        print(f"  {label} ...", end=" ", flush=True)
+        with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+            rows[label] = pool.submit(_evaluate, model, revision, cached, fixtures, threads).result()
+        print(f"{rows[label]['mean_ms']:.0f} ms")
+
+    reference = rows["current"]
+    print(f"\n{threads} threads, {len(fixtures)} fixture covers")
+    print(f"{'':<20}{'ms/cover':>9}{'speed-up':>10}{'load s':>8}{'RSS MB':>8}{'top-1 match':>13}")
+    for label, row in rows.items():
+        same = sum(row["top"][name] == top for name, top in reference["top"].items())
+        print(
+            f"{label:<20}{row['mean_ms']:>9.0f}{reference['mean_ms'] / row['mean_ms']:>9.2f}x"
+            f"{row['load_ms'] / 1000:>8.1f}{row['peak_rss_mb']:>8.0f}{same:>9}/{len(fixtures)}"
+        )
+
+    cached = rows["bi + cached labels"]["top"]
+    mismatches = {name: top for name, top in cached.items() if top != reference["top"][name]}
+    for name, (author, title) in mismatches.items():
+        print(f"  {name}: cached labels give author={author!r} title={title!r}, current {reference['top'][name]!r}")
+    if mismatches:
+        print(f"\n✗ {len(mismatches)} cover(s) differ from the current engine")
+        return 1
+    print(
+        f"\n✓ Parity on every cover. Use GLINER_MODEL_NAME={args.model} "
+        f"GLINER_MODEL_REVISION=<pinned revision> GLINER_LABEL_EMBEDDINGS=true"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Tune the near-duplicate threshold against the integration fixture covers.
+
+Each fixture cover is perturbed the way a second photo of the same book
+differs from the first: re-compression, rescaling, lighting, blur, small
+rotations and crops. The script then reports Hamming distances between
+perceptual hashes (``app.services.near_duplicate.phash``, computed through
+the same decode path as the service):
+
+- same cover: distance from the original to each variant
+- different covers: distance between every pair of originals
+
+For each candidate threshold it prints recall per perturbation and the
+number of different-cover pairs that would falsely match. It finishes by
+timing index lookups at a few hundred thousand entries.
+
+Usage:
+    python scripts/benchmark_near_duplicate.py
+    python scripts/benchmark_near_duplicate.py --images tests/integration/images --entries 300000
+"""
+
+import argparse
+import io
+import itertools
+import random
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image, ImageEnhance, ImageFilter
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models import AnalysisStatus, CoverAnalysisResponse  # noqa: E402
+from app.services.near_duplicate import NearDuplicateIndex, perceptual_hash  # noqa: E402
+
+_BACKGROUND = (90, 80, 70)
+
+
+def _jpeg_bytes(image: Image.Image, quality: int = 90) -> bytes:
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def _crop(image: Image.Image, margin: float, dx: float = 0.0, dy: float = 0.0) -> Image.Image:
+    w, h = image.size
+    return image.crop((
+        int(w * (margin + dx)), int(h * (margin + dy)),
+        w - int(w * (margin - dx)), h - int(h * (margin - dy)),
+    ))
+
+
+def _rotate(degrees: float):
+    return lambda im: im.rotate(degrees, resample=Image.Resampling.BICUBIC, fillcolor=_BACKGROUND)
+
+
+PERTURBATIONS = {
+    "jpeg_q40": lambda im: Image.open(io.BytesIO(_jpeg_bytes(im, 40))),
+    "scale_30pct": lambda im: im.resize((im.width * 3 // 10, im.height * 3 // 10)),
+    "brighter_20pct": lambda im: ImageEnhance.Brightness(im).enhance(1.2),
+    "darker_25pct": lambda im: ImageEnhance.Brightness(im).enhance(0.75),
+    "low_contrast": lambda im: ImageEnhance.Contrast(im).enhance(0.7),
+    "blur": lambda im: im.filter(ImageFilter.GaussianBlur(4)),
+    "rotate_1deg": _rotate(1),
+    "rotate_2deg": _rotate(-2),
+    "rotate_5deg": _rotate(5),
+    "crop_1pct": lambda im: _crop(im, 0.01),
+    "crop_3pct": lambda im: _crop(im, 0.03),
+    "crop_shifted": lambda im: _crop(im, 0.05, 0.03, -0.02),
+}
+
+
+def _hash(image: Image.Image) -> int:
+    result = perceptual_hash(_jpeg_bytes(image.convert("RGB")))
+    assert result is not None
+    return result[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the near-duplicate Hamming threshold")
+    parser.add_argument(
+        "--images",
+        type=Path,
+        default=Path(__file__).parent.parent / "tests" / "integration" / "images",
+        help="Directory of cover photos (default: tests/integration/images)",
+    )
+    parser.add_argument("--entries", type=int, default=300_000, help="Index size for the lookup timing")
+    parser.add_argument("--max-distance", type=int, default=8, help="Threshold used for the lookup timing")
+    args = parser.parse_args()
+
+    covers = {p.stem: Image.open(p).convert("RGB") for p in sorted(args.images.glob("*.jpg"))}
+    if len(covers) < 2:
+        print(f"✗ Need at least two .jpg covers in {args.images}", file=sys.stderr)
+        return 1
+    originals = {name: _hash(image) for name, image in covers.items()}
+
+    same = {
+        label: [(originals[name] ^ _hash(fn(image))).bit_count() for name, image in covers.items()]
+        for label, fn in PERTURBATIONS.items()
+    }
+    different = [(originals[a] ^ originals[b]).bit_count() for a, b in itertools.combinations(originals, 2)]
+
+    print(f"{len(covers)} covers, {len(different)} different-cover pairs")
+    print(f"Different covers: min {min(different)}, median {sorted(different)[len(different) // 2]}\n")
+    print(f"{'perturbation':<16}{'distances':<32}")
+    for label, distances in same.items():
+        print(f"{label:<16}{str(distances):<32}")
+
+    thresholds = [2, 4, 6, 8, 10, 12]
+    print(f"\n{'threshold':<16}" + "".join(f"{t:>6}" for t in thresholds))
+    for label, distances in same.items():
+        recall = [sum(d <= t for d in distances) / len(distances) for t in thresholds]
+        print(f"{label:<16}" + "".join(f"{r:>6.0%}" for r in recall))
+    false_matches = [sum(d <= t for d in different) for t in thresholds]
+    print(f"{'false matches':<16}" + "".join(f"{f:>6}" for f in false_matches))
+
+    # Lookup cost at scale: random hashes plus the fixture covers.
+    index = NearDuplicateIndex(max_entries=args.entries + len(originals), max_distance=args.max_distance)
+    placeholder = CoverAnalysisResponse(analysisStatus=AnalysisStatus(is_success=True))
+    rng = random.Random(0)
+    for _ in range(args.entries):
+        index.add(rng.getrandbits(64), (1, 1), placeholder)
+    for value in originals.values():
+        index.add(value, (1, 1), placeholder)
+    probes = [_hash(PERTURBATIONS["jpeg_q40"](image)) for image in covers.values()]
+    probes += [rng.getrandbits(64) for _ in range(200)]
+    t0 = time.perf_counter()
+    hits = sum(index.find(value, (1, 1)) is not None for value in probes)
+    per_lookup_ms = (time.perf_counter() - t0) * 1000 / len(probes)
+    print(
+        f"\nIndex of {len(index)} entries, max_distance={args.max_distance}: "
+        f"{per_lookup_ms:.3f} ms per lookup, {hits} of {len(probes)} probes matched"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
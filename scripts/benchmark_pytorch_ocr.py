@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Benchmark the PyTorch Florence-2 engine's inference modes.
+
+Runs the integration fixture covers through Florence2OcrEngine in each mode:
+
+- baseline: generate() with use_cache=False, the engine's original path
+- kv: greedy decoding on the decoder's KV cache (PYTORCH_KV_CACHE)
+- kv+int8: kv with dynamically quantized linear layers (PYTORCH_INT8)
+- kv+bf16: kv under bf16 autocast (PYTORCH_BF16); only on CPUs with native
+  bf16, since elsewhere the engine falls back to float32
+
+and reports, per mode:
+
+- mean latency per cover and generated tokens per second
+- peak RSS of the process that ran it
+- covers whose transcript is identical to the baseline's
+- covers passing the fixture keyword checks
+
+Each mode runs in a fresh process so peak RSS is its own. kv should match
+the baseline on every cover; int8 and bf16 trade some agreement for speed.
+
+Usage:
+    python scripts/benchmark_pytorch_ocr.py
+    python scripts/benchmark_pytorch_ocr.py --modes baseline kv --threads 4 --json results.json
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings  # noqa: E402
+from app.services.autotune import (  # noqa: E402
+    cpu_isa_features,
+    default_max_threads,
+    fixture_failures,
+    load_fixture_images,
+)
+
+REPO_ROOT = Path(__file__).parent.parent
+_MODES = {
+    "baseline": {"kv_cache": False, "int8": False, "bf16": False},
+    "kv": {"kv_cache": True, "int8": False, "bf16": False},
+    "kv+int8": {"kv_cache": True, "int8": True, "bf16": False},
+    "kv+bf16": {"kv_cache": True, "int8": False, "bf16": True},
+}
+_NATIVE_BF16 = {"avx512_bf16", "amx_bf16", "bf16"}
+
+
+def _benchmark(mode: str, model_name: str, revision: str, threads: int, images: dict[str, bytes], repeats: int) -> dict:
+    """Run one mode. Executed in a fresh process."""
+    from app.engines.florence2_engine import Florence2OcrEngine
+
+    engine = Florence2OcrEngine(model_name=model_name, revision=revision, num_threads=threads, **_MODES[mode])
+    tokens = 0
+    decode = engine._processor.batch_decode
+
+    def counting_decode(generated_ids, **kwargs):
+        nonlocal tokens
+        tokens += len(generated_ids[0])
+        return decode(generated_ids, **kwargs)
+
+    engine._processor.batch_decode = counting_decode
+
+    async def run() -> tuple[dict[str, str], float]:
+        nonlocal tokens
+        await engine.extract_text(next(iter(images.values())))  # warm-up
+        tokens = 0
+        texts = {}
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            for name, image_bytes in images.items():
+                texts[name] = (await engine.extract_text(image_bytes)).text
+        return texts, time.perf_counter() - t0
+
+    texts, wall_s = asyncio.run(run())
+    return {
+        "mode": mode,
+        "threads": threads,
+        "total_ms": wall_s * 1000 / (len(images) * repeats),
+        "tokens_per_s": tokens / wall_s if wall_s else 0.0,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "keyword_passes": sum(not fixture_failures(name, text) for name, text in texts.items()),
+        "covers": len(texts),
+        "texts": texts,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PyTorch Florence-2 inference modes")
+    parser.add_argument("--model-name", default=settings.pytorch_model_name, help="Model name or local path")
+    parser.add_argument("--revision", default=settings.pytorch_florence2_revision, help="Model revision")
+    parser.add_argument("--images", type=Path, default=REPO_ROOT / "tests" / "integration" / "images")
+    parser.add_argument("--modes", nargs="+", choices=list(_MODES), default=list(_MODES), help="Modes to run")
+    parser.add_argument("--threads", type=int, default=None, help="Torch threads (default: OCR thread budget)")
+    parser.add_argument("--repeats", type=int, default=1, help="Passes over the covers per mode")
+    parser.add_argument("--json", type=Path, default=None, help="Also write the rows to this JSON file")
+    args = parser.parse_args()
+
+    images = load_fixture_images(args.images)
+    if not images:
+        print(f"✗ No fixture covers in {args.images}", file=sys.stderr)
+        return 1
+    modes = args.modes
+    if "kv+bf16" in modes and not cpu_isa_features() & _NATIVE_BF16:
+        print("⚠ No native bf16 on this CPU; skipping kv+bf16")
+        modes = [m for m in modes if m != "kv+bf16"]
+    threads = args.threads or default_max_threads()
+    print(f"{len(modes)} modes x {len(images)} covers, {threads} threads\n")
+
+    rows = []
+    spawn = multiprocessing.get_context("spawn")
+    for mode in modes:
+        print(f"  {mode} ...", end=" ", flush=True)
+        with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+            try:
+                row = pool.submit(
+                    _benchmark, mode, args.model_name, args.revision, threads, images, args.repeats
+                ).result()
+            except Exception as e:  # one failing mode shouldn't end the run
+                print(f"failed: {e}")
+                continue
+        rows.append(row)
+        print(f"{row['total_ms']:.0f} ms")
+
+    if not rows:
+        print("✗ Every mode failed", file=sys.stderr)
+        return 1
+    baseline = next((r for r in rows if r["mode"] == "baseline"), None)
+    baseline_ms = baseline["total_ms"] if baseline else None
+
+    print(f"\n{'mode':<10}{'ms/cover':>9}{'speed-up':>10}{'tok/s':>8}{'RSS MB':>8}{'= baseline':>12}{'keywords':>10}")
+    for r in rows:
+        speed_up = f"{baseline_ms / r['total_ms']:.2f}x" if baseline_ms else "-"
+        if baseline:
+            same = sum(r["texts"][name] == text for name, text in baseline["texts"].items())
+            r["matches_baseline"] = same
+            agreement = f"{same}/{r['covers']}"
+        else:
+            agreement = "-"
+        print(
+            f"{r['mode']:<10}{r['total_ms']:>9.0f}{speed_up:>10}{r['tokens_per_s']:>8.1f}{r['peak_rss_mb']:>8.0f}"
+            f"{agreement:>12}{r['keyword_passes']:>6}/{r['covers']}"
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps(rows, indent=2))
+        print(f"Rows written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
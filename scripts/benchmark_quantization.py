@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""Compare mixes of ONNX quantization variants per Florence-2 session.
+
+The onnx-community export ships each graph in several quantizations. This
+script runs every combination of vision_encoder, encoder_model and
+decoder_model_merged variants (embed_tokens follows --embed) over the
+integration fixture covers and reports, per combination:
+
+- per-stage latency (ms per cover) for the three sessions
+- decoder throughput in generated tokens per second
+- peak RSS of the process that ran it
+- OCR accuracy against tests/integration/fixtures/*.json: mean character
+  error rate and the number of covers passing the fixture keyword checks
+
+Each combination runs in a fresh process so peak RSS is its own. The table
+is sorted by latency and marks the Pareto front (no other combination is
+both faster and more accurate). Apply a chosen mix with
+ONNX_VISION_QUANTIZATION / ONNX_ENCODER_QUANTIZATION /
+ONNX_DECODER_QUANTIZATION.
+
+Usage:
+    python scripts/benchmark_quantization.py --model-dir florence2-onnx
+    python scripts/benchmark_quantization.py --model-dir florence2-onnx \\
+        --vision fp32 fp16 q4 --encoder q4 --decoder q4 int8 --json results.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import resource
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings  # noqa: E402
+from app.models import OcrResult  # noqa: E402
+from app.services.autotune import default_max_threads, fixture_failures, variant_label  # noqa: E402
+
+REPO_ROOT = Path(__file__).parent.parent
+_STAGES = ("vision_encoder", "encoder_model", "decoder_model_merged")
+_GRAPHS = ("vision_encoder", "embed_tokens", "encoder_model", "decoder_model_merged", "greedy_generate")
+
+
+def _variants(onnx_dir: Path, graph: str) -> list[str]:
+    """Quantization suffixes available for ``graph`` ("" is fp32)."""
+    variants = set()
+    for path in onnx_dir.glob(f"{graph}*.onnx"):
+        rest = path.stem[len(graph):]
+        if rest == "" or rest.startswith("_"):
+            variants.add(rest.lstrip("_"))
+    return sorted(variants, key=lambda v: (v != "", v))
+
+
+def _parse_variant(value: str) -> str:
+    return "" if value == "fp32" else value
+
+
+def _char_error_rate(hypothesis: str, reference: str) -> float:
+    """Levenshtein distance over characters, normalised by the reference length."""
+    hyp, ref = hypothesis.lower(), reference.lower()
+    previous = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        current = [i]
+        for j, h in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h)))
+        previous = current
+    return previous[-1] / max(len(ref), 1)
+
+
+def _benchmark(
+    model_dir: str,
+    embed: str,
+    vision: str,
+    encoder: str,
+    decoder: str,
+    threads: int,
+    images: dict[str, bytes],
+    references: dict[str, str],
+    repeats: int,
+) -> dict:
+    """Run one combination. Executed in a fresh process."""
+    import onnxruntime as ort
+
+    from app.engines import florence2_onnx_engine
+
+    stage_s: dict[str, float] = defaultdict(float)
+
+    class TimedSession(ort.InferenceSession):
+        def __init__(self, path, *args, **kwargs):
+            super().__init__(path, *args, **kwargs)
+            stem = Path(path).stem
+            self._graph = next((g for g in _GRAPHS if stem.startswith(g)), stem)
+
+        def run(self, *args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return super().run(*args, **kwargs)
+            finally:
+                stage_s[self._graph] += time.perf_counter() - t0
+
+        def run_with_iobinding(self, *args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return super().run_with_iobinding(*args, **kwargs)
+            finally:
+                stage_s[self._graph] += time.perf_counter() - t0
+
+    florence2_onnx_engine.ort.InferenceSession = TimedSession
+    engine = florence2_onnx_engine.Florence2OnnxEngine(
+        model_path=model_dir,
+        quantization=embed,
+        vision_quantization=vision,
+        encoder_quantization=encoder,
+        decoder_quantization=decoder,
+        intra_op_num_threads=threads,
+        max_batch_size=1,
+        in_graph_generation=False,
+    )
+    tokens = 0
+    postprocess = engine._postprocess
+
+    def counting_postprocess(image_size, token_ids, decode_ms):
+        nonlocal tokens
+        tokens += len(token_ids)
+        return postprocess(image_size, token_ids, decode_ms)
+
+    engine._postprocess = counting_postprocess
+
+    async def run() -> tuple[dict[str, OcrResult], float]:
+        nonlocal tokens
+        await engine.extract_text(next(iter(images.values())))  # warm-up
+        stage_s.clear()
+        tokens = 0
+        t0 = time.perf_counter()
+        results = {}
+        for _ in range(repeats):
+            for name, image_bytes in images.items():
+                results[name] = await engine.extract_text(image_bytes)
+        return results, time.perf_counter() - t0
+
+    results, wall_s = asyncio.run(run())
+    runs = len(images) * repeats
+
+    cer = [_char_error_rate(results[name].text, references[name]) for name in references if name in results]
+    keyword_passes = sum(not fixture_failures(name, result.text) for name, result in results.items())
+    return {
+        "vision": vision,
+        "encoder": encoder,
+        "decoder": decoder,
+        "embed": embed,
+        "threads": threads,
+        "total_ms": wall_s * 1000 / runs,
+        **{f"{stage}_ms": stage_s[stage] * 1000 / runs for stage in _STAGES},
+        "tokens_per_s": tokens / stage_s["decoder_model_merged"] if stage_s["decoder_model_merged"] else 0.0,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "cer": sum(cer) / len(cer) if cer else float("nan"),
+        "keyword_passes": keyword_passes,
+        "covers": len(results),
+    }
+
+
+def _pareto(rows: list[dict]) -> set[int]:
+    """Indices of rows no other row beats on both latency and CER."""
+    front = set()
+    for i, a in enumerate(rows):
+        dominated = any(
+            b["total_ms"] <= a["total_ms"] and b["cer"] <= a["cer"]
+            and (b["total_ms"] < a["total_ms"] or b["cer"] < a["cer"])
+            for b in rows
+        )
+        if not dominated:
+            front.add(i)
+    return front
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-session ONNX quantization mixes")
+    parser.add_argument("--model-dir", type=Path, default=REPO_ROOT / "florence2-onnx", help="ONNX model directory")
+    parser.add_argument("--images", type=Path, default=REPO_ROOT / "tests" / "integration" / "images")
+    parser.add_argument("--fixtures", type=Path, default=REPO_ROOT / "tests" / "integration" / "fixtures")
+    parser.add_argument("--vision", nargs="+", default=None, help="vision_encoder variants (default: all)")
+    parser.add_argument("--encoder", nargs="+", default=None, help="encoder_model variants (default: all)")
+    parser.add_argument("--decoder", nargs="+", default=None, help="decoder_model_merged variants (default: all)")
+    parser.add_argument(
+        "--embed", default=settings.onnx_quantization, help="embed_tokens variant (default: ONNX_QUANTIZATION)"
+    )
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads (default: OCR thread budget)")
+    parser.add_argument("--repeats", type=int, default=1, help="Passes over the covers per combination")
+    parser.add_argument("--json", type=Path, default=None, help="Also write the rows to this JSON file")
+    args = parser.parse_args()
+
+    onnx_dir = args.model_dir / "onnx"
+    choices = {
+        stage: [_parse_variant(v) for v in chosen] if chosen else _variants(onnx_dir, stage)
+        for stage, chosen in zip(_STAGES, (args.vision, args.encoder, args.decoder))
+    }
+    if not all(choices.values()):
+        print(f"✗ No ONNX graphs found in {onnx_dir}", file=sys.stderr)
+        return 1
+    images = {p.stem: p.read_bytes() for p in sorted(args.images.glob("*.jpg"))}
+    references = {
+        p.stem: OcrResult.model_validate_json(p.read_text()).text for p in sorted(args.fixtures.glob("*.json"))
+    }
+    threads = args.threads or default_max_threads()
+    combos = list(itertools.product(*(choices[stage] for stage in _STAGES)))
+    print(f"{len(combos)} combinations x {len(images)} covers, {threads} threads, embed_tokens={variant_label(args.embed)}\n")
+
+    rows = []
+    spawn = multiprocessing.get_context("spawn")
+    for vision, encoder, decoder in combos:
+        label = "/".join(variant_label(v) for v in (vision, encoder, decoder))
+        print(f"  {label} ...", end=" ", flush=True)
+        with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+            try:
+                row = pool.submit(
+                    _benchmark, str(args.model_dir), args.embed, vision, encoder, decoder,
+                    threads, images, references, args.repeats,
+                ).result()
+            except Exception as e:  # a variant that fails to load shouldn't end the sweep
+                print(f"failed: {e}")
+                continue
+        rows.append(row)
+        print(f"{row['total_ms']:.0f} ms, CER {row['cer']:.3f}")
+
+    if not rows:
+        print("✗ Every combination failed", file=sys.stderr)
+        return 1
+    rows.sort(key=lambda r: r["total_ms"])
+    front = _pareto(rows)
+
+    print(
+        f"\n{'':2}{'vision':<8}{'encoder':<8}{'decoder':<8}{'total ms':>9}{'vision':>8}{'encoder':>8}"
+        f"{'decoder':>8}{'tok/s':>7}{'RSS MB':>8}{'CER':>7}{'keywords':>10}"
+    )
+    for i, r in enumerate(rows):
+        print(
+            f"{'*' if i in front else '':2}{variant_label(r['vision']):<8}{variant_label(r['encoder']):<8}"
+            f"{variant_label(r['decoder']):<8}{r['total_ms']:>9.0f}{r['vision_encoder_ms']:>8.0f}"
+            f"{r['encoder_model_ms']:>8.0f}{r['decoder_model_merged_ms']:>8.0f}{r['tokens_per_s']:>7.1f}"
+            f"{r['peak_rss_mb']:>8.0f}{r['cer']:>7.3f}{r['keyword_passes']:>6}/{r['covers']}"
+        )
+    print("\n* Pareto front on latency vs CER. Stage columns are ms per cover.")
+
+    if args.json:
+        args.json.write_text(json.dumps(rows, indent=2))
+        print(f"Rows written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
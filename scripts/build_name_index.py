@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Build the memory-mapped name index used by NAME_INDEX_PATH.
+
+ADR 003 left a name-database lookup as the option to use if sub-millisecond
+NLP became a requirement. This script writes the index NameIndexNlpEngine
+maps: known first names and surnames, upper-cased and sorted, with no
+parsing needed at load.
+
+Inputs are text or CSV files with the name in the first column. That covers
+the SSA baby-name files (yobYYYY.txt: name,sex,count) and the Census
+surname list (Names_2010Census.csv: name,rank,count,...). Both have the
+count in the third column, so --min-count drops rare names, which are the
+ones most likely to collide with title words. A header row starting with
+"name" is skipped.
+
+Afterwards every integration fixture OCR JSON (tests/integration/fixtures)
+goes through the engine. For each cover the script reports whether the
+index is confident and, if so, the author it gives and the lookup time. A
+confident answer with the wrong author exits non-zero; covers that fall
+back to GLiNER are fine.
+
+Usage:
+    python scripts/build_name_index.py --first-names names/yob*.txt --surnames Names_2010Census.csv
+    python scripts/build_name_index.py --first-names first.txt --surnames last.txt --min-count 100 --output names.idx
+"""
+
+import argparse
+import csv
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.engines.name_index_engine import NameIndexNlpEngine, write_name_index  # noqa: E402
+from app.models import OcrResult  # noqa: E402
+
+REPO_ROOT = Path(__file__).parent.parent
+
+# Primary author of each fixture cover — the same checks as
+# tests/integration/test_gliner_engine.py.
+FIXTURE_AUTHORS = {
+    "a-restless-truth": "freya marske",
+    "gardens-of-the-moon": "steven erikson",
+    "jade-city": "fonda lee",
+    "mistborn": "brandon sanderson",
+    "snow-crash": "neal stephenson",
+    "to-kill-a-mockingbird": "harper lee",
+    "under-the-whispering-door": "tj klune",
+}
+
+
+def read_names(paths: list[Path], min_count: int) -> set[str]:
+    """Names from the first column of each file, keeping those seen at least ``min_count`` times."""
+    counts: dict[str, int] = {}
+    for path in paths:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.reader(f):
+                if not row or not row[0].strip() or row[0].strip().lower() == "name":
+                    continue
+                name = row[0].strip().upper()
+                count = int(row[2]) if len(row) > 2 and row[2].strip().isdigit() else min_count
+                counts[name] = counts.get(name, 0) + count
+    return {name for name, count in counts.items() if count >= min_count}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the name index for the NLP cascade")
+    parser.add_argument("--first-names", type=Path, nargs="+", required=True, help="First-name files (e.g. SSA yob*.txt)")
+    parser.add_argument("--surnames", type=Path, nargs="+", required=True, help="Surname files (e.g. Census CSV)")
+    parser.add_argument("--min-count", type=int, default=0, help="Drop names with a lower third-column count")
+    parser.add_argument("--output", type=Path, default=REPO_ROOT / "names.idx", help="Index file to write")
+    parser.add_argument("--fixtures", type=Path, default=REPO_ROOT / "tests" / "integration" / "fixtures")
+    args = parser.parse_args()
+
+    first_names = read_names(args.first_names, args.min_count)
+    surnames = read_names(args.surnames, args.min_count)
+    if not first_names or not surnames:
+        print("✗ No names read; check the input files", file=sys.stderr)
+        return 1
+    write_name_index(args.output, first_names, surnames)
+    print(
+        f"✓ Wrote {args.output} ({len(first_names)} first names, {len(surnames)} surnames, "
+        f"{args.output.stat().st_size / 1e6:.1f} MB)"
+    )
+
+    fixtures = sorted(args.fixtures.glob("*.json"))
+    if not fixtures:
+        print(f"⚠ No fixture OCR JSONs in {args.fixtures}; skipping evaluation")
+        return 0
+    engine = NameIndexNlpEngine(str(args.output))
+    wrong, confident, latencies = [], 0, []
+    print(f"\n{'cover':<28}{'index':<22}{'µs':>8}")
+    for path in fixtures:
+        ocr = OcrResult.model_validate_json(path.read_text())
+        t0 = time.perf_counter()
+        analysis = engine.match(ocr)
+        latencies.append((time.perf_counter() - t0) * 1e6)
+        author = analysis.potential_authors[0] if analysis is not None else "→ GLiNER"
+        print(f"{path.stem:<28}{author:<22}{latencies[-1]:>8.0f}")
+        if analysis is None:
+            continue
+        confident += 1
+        expected = FIXTURE_AUTHORS.get(path.stem)
+        if expected is not None and author.lower() != expected:
+            wrong.append((path.stem, author, expected))
+
+    print(f"\nIndex answers {confident}/{len(fixtures)} covers, median lookup {statistics.median(latencies):.0f} µs")
+    for name, author, expected in wrong:
+        print(f"  {name}: index gives {author!r}, expected {expected!r}")
+    if wrong:
+        print(f"\n✗ {len(wrong)} confident answer(s) are wrong; raise --min-count or leave NAME_INDEX_PATH unset")
+        return 1
+    print(f"\n✓ No wrong confident answers. Use NAME_INDEX_PATH={args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Export GLiNER to ONNX and quantize it to int8 for GlinerOnnxEngine.
+
+GlinerNlpEngine runs urchade/gliner_large-v2.1 (a DeBERTa-v3-large
+backbone) through PyTorch. This script exports its forward pass with
+GLiNER's own ONNX exporter at the pinned revision, then applies ONNX
+Runtime dynamic quantization (int8 weights, activations quantized at run
+time) to the MatMul/Gemm weights. The output directory holds:
+
+- model.onnx: the float export
+- model_int8.onnx: the quantized graph (GLINER_ONNX_MODEL_FILE default)
+- gliner_config.json and the tokenizer files
+
+Afterwards each engine runs in its own process over the integration
+fixture OCR JSONs (tests/integration/fixtures): PyTorch, ONNX fp32 and
+ONNX int8. The script reports mean NLP latency per cover and peak RSS. A
+cover whose top author or title differs from the PyTorch engine's is a
+mismatch, and the script then exits non-zero.
+
+Use it with NLP_ENGINE=gliner_onnx and GLINER_ONNX_MODEL_PATH=<output>.
+
+Usage:
+    python scripts/export_gliner_onnx.py --output gliner-onnx
+    python scripts/export_gliner_onnx.py --output gliner-onnx --per-tensor --skip-eval
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import resource
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import constants  # noqa: E402
+from app.services.autotune import default_max_threads  # noqa: E402
+
+REPO_ROOT = Path(__file__).parent.parent
+FLOAT_FILE = "model.onnx"
+INT8_FILE = "model_int8.onnx"
+
+
+def export(output: Path, model_name: str, revision: str, per_channel: bool, opset: int) -> None:
+    """Write the float and int8 ONNX exports of GLiNER to ``output``."""
+    from gliner import GLiNER
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    model = GLiNER.from_pretrained(model_name, revision=revision)
+    model.export_to_onnx(output, onnx_filename=FLOAT_FILE, quantize=False, opset=opset)
+    quantize_dynamic(
+        str(output / FLOAT_FILE),
+        str(output / INT8_FILE),
+        op_types_to_quantize=["MatMul", "Gemm"],
+        per_channel=per_channel,
+        # s8 weights with the u8 activations dynamic quantization produces
+        # map onto the VNNI/AMX integer kernels.
+        weight_type=QuantType.QInt8,
+    )
+
+
+def _evaluate(engine_name: str, model_dir: str, model_file: str, fixtures: list[str], threads: int) -> dict:
+    """Analyze every fixture with one engine. Executed in a fresh process."""
+    from app.models import OcrResult
+    from app.services.cpu_budget import set_torch_threads
+
+    set_torch_threads(threads)
+    if engine_name == "pytorch":
+        from app.engines.gliner_engine import GlinerNlpEngine
+
+        engine = GlinerNlpEngine(revision=constants.GLINER_REVISION, max_batch_size=1)
+    else:
+        from app.config import settings
+        from app.engines.gliner_onnx_engine import GlinerOnnxEngine
+
+        settings.onnx_num_threads = threads
+        engine = GlinerOnnxEngine(model_path=model_dir, model_file=model_file, max_batch_size=1)
+
+    ocr_results = {Path(f).stem: OcrResult.model_validate_json(Path(f).read_text()) for f in fixtures}
+
+    async def run() -> tuple[dict, list[float]]:
+        await engine.analyze(next(iter(ocr_results.values())))  # warm-up
+        top, latencies = {}, []
+        for name, ocr in ocr_results.items():
+            t0 = time.perf_counter()
+            analysis = await engine.analyze(ocr)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            top[name] = (
+                analysis.potential_authors[0].lower() if analysis.potential_authors else None,
+                analysis.potential_titles[0].lower() if analysis.potential_titles else None,
+            )
+        return top, latencies
+
+    top, latencies = asyncio.run(run())
+    return {
+        "engine": engine_name,
+        "mean_ms": statistics.mean(latencies),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "top": top,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export GLiNER to ONNX with int8 dynamic quantization")
+    parser.add_argument("--output", type=Path, default=REPO_ROOT / "gliner-onnx", help="Output directory")
+    parser.add_argument("--model", default=constants.GLINER_MODEL, help="GLiNER model name or local path")
+    parser.add_argument("--revision", default=constants.GLINER_REVISION, help="Model revision")
+    parser.add_argument("--opset", type=int, default=19, help="ONNX opset")
+    parser.add_argument("--per-tensor", action="store_true", help="Per-tensor instead of per-channel weights")
+    parser.add_argument("--fixtures", type=Path, default=REPO_ROOT / "tests" / "integration" / "fixtures")
+    parser.add_argument("--threads", type=int, default=None, help="Threads per engine (default: OCR thread budget)")
+    parser.add_argument("--skip-export", action="store_true", help="Only evaluate an existing export")
+    parser.add_argument("--skip-eval", action="store_true", help="Only export; skip the latency/accuracy report")
+    args = parser.parse_args()
+
+    if not args.skip_export:
+        print(f"Exporting {args.model}@{args.revision[:12]} to {args.output}...")
+        t0 = time.perf_counter()
+        try:
+            export(args.output, args.model, args.revision, per_channel=not args.per_tensor, opset=args.opset)
+        except Exception as e:
+            print(f"✗ Export failed: {e}", file=sys.stderr)
+            return 1
+        sizes = {f: (args.output / f).stat().st_size / 1e6 for f in (FLOAT_FILE, INT8_FILE)}
+        print(f"✓ Wrote {FLOAT_FILE} ({sizes[FLOAT_FILE]:.0f} MB) and {INT8_FILE} "
+              f"({sizes[INT8_FILE]:.0f} MB) in {time.perf_counter() - t0:.0f}s")
+    if args.skip_eval:
+        return 0
+
+    fixtures = sorted(str(p) for p in args.fixtures.glob("*.json"))
+    if not fixtures:
+        print(f"✗ No fixture OCR JSONs in {args.fixtures}", file=sys.stderr)
+        return 1
+    threads = args.threads or default_max_threads()
+    runs = [("pytorch", ""), ("onnx fp32", FLOAT_FILE), ("onnx int8", INT8_FILE)]
+    rows = []
+    spawn = multiprocessing.get_context("spawn")
+    for engine_name, model_file in runs:
+        print(f"  {engine_name} ...", end=" ", flush=True)
+        with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+            row = pool.submit(_evaluate, engine_name, str(args.output), model_file, fixtures, threads).result()
+        rows.append(row)
+        print(f"{row['mean_ms']:.0f} ms")
+
+    reference = rows[0]["top"]
+    print(f"\n{threads} threads, {len(fixtures)} fixture covers")
+    print(f"{'engine':<12}{'ms/cover':>9}{'speed-up':>10}{'RSS MB':>8}{'top-1 match':>13}")
+    mismatches = {}
+    for row in rows:
+        different = {name: top for name, top in row["top"].items() if top != reference[name]}
+        mismatches[row["engine"]] = different
+        print(
+            f"{row['engine']:<12}{row['mean_ms']:>9.0f}{rows[0]['mean_ms'] / row['mean_ms']:>9.2f}x"
+            f"{row['peak_rss_mb']:>8.0f}{len(fixtures) - len(different):>9}/{len(fixtures)}"
+        )
+    for name, (author, title) in mismatches["onnx int8"].items():
+        print(f"  {name}: int8 gives author={author!r} title={title!r}, pytorch {reference[name]!r}")
+    if mismatches["onnx int8"]:
+        print(
+            f"\n✗ {len(mismatches['onnx int8'])} cover(s) differ from PyTorch; "
+            f"don't adopt {INT8_FILE} (GLINER_ONNX_MODEL_FILE={FLOAT_FILE} keeps float weights)"
+        )
+        return 1
+    print(f"\n✓ int8 matches PyTorch on every cover. Use NLP_ENGINE=gliner_onnx GLINER_ONNX_MODEL_PATH={args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""Build a single-graph greedy generator for the Florence-2 ONNX decoder.
+
+Wraps ``embed_tokens`` and ``decoder_model_merged`` from the onnx-community
+export into one ONNX model: a prefill call followed by an ONNX ``Loop`` whose
+body embeds the previous token, runs the decoder with the cached KV, picks the
+next token with ``ArgMax`` and stops on EOS. ``Florence2OnnxEngine`` loads the
+result when ``ONNX_IN_GRAPH_GENERATION=true``, so a whole generation is one
+``session.run`` instead of one call per token.
+
+ORT's GreedySearch/BeamSearch contrib ops are not used: they expect a
+token-id encoder input (T5/BART style), while Florence-2's encoder consumes
+image features concatenated with prompt embeddings.
+
+The generated graph:
+    inputs:  encoder_hidden_states (1, seq, 768), encoder_attention_mask (1, seq),
+             max_new_tokens (int64 scalar)
+    outputs: sequences (1, num_tokens) — starts with the EOS seed, like the
+             Python decode loop
+
+Requires the ``onnx`` package (``pip install onnx``); it is not needed at runtime.
+
+Usage:
+    python scripts/export_greedy_generate.py --model-dir florence2-onnx
+    python scripts/export_greedy_generate.py --model-dir florence2-onnx --quantization ""
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import onnx
+from onnx import TensorProto, helper, numpy_helper
+
+GENERATOR_NAME = "greedy_generate"
+
+_NUM_HEADS = 12
+_HEAD_DIM = 64
+
+
+def _local_names(graph: onnx.GraphProto) -> set[str]:
+    """Every value name defined in ``graph`` or any of its subgraphs."""
+    names = {i.name for i in graph.input} | {i.name for i in graph.initializer}
+    for node in graph.node:
+        names.update(o for o in node.output if o)
+        for attr in node.attribute:
+            if attr.type == onnx.AttributeProto.GRAPH:
+                names |= _local_names(attr.g)
+            elif attr.type == onnx.AttributeProto.GRAPHS:
+                for g in attr.graphs:
+                    names |= _local_names(g)
+    return names
+
+
+def _rename_graph(graph: onnx.GraphProto, mapping: dict[str, str]) -> None:
+    """Rename values in place, recursing into If/Loop subgraphs."""
+    for value in list(graph.input) + list(graph.output) + list(graph.value_info):
+        value.name = mapping.get(value.name, value.name)
+    for init in graph.initializer:
+        init.name = mapping.get(init.name, init.name)
+    for node in graph.node:
+        node.name = mapping.get(node.name, node.name)
+        node.input[:] = [mapping.get(n, n) for n in node.input]
+        node.output[:] = [mapping.get(n, n) for n in node.output]
+        for attr in node.attribute:
+            if attr.type == onnx.AttributeProto.GRAPH:
+                _rename_graph(attr.g, mapping)
+            elif attr.type == onnx.AttributeProto.GRAPHS:
+                for g in attr.graphs:
+                    _rename_graph(g, mapping)
+
+
+def _inline(
+    graph: onnx.GraphProto,
+    prefix: str,
+    inputs: dict[str, str],
+    shared: set[str],
+) -> tuple[list[onnx.NodeProto], dict[str, str]]:
+    """Copy ``graph``'s nodes with every local name prefixed.
+
+    ``inputs`` maps the graph's input names to values in the target scope.
+    Names in ``shared`` (top-level initializers hoisted to the outer model)
+    are left untouched. Returns the nodes and a map from the graph's output
+    names to their new names.
+    """
+    copy = onnx.GraphProto()
+    copy.CopyFrom(graph)
+    mapping = {n: f"{prefix}{n}" for n in _local_names(copy) if n and n not in shared}
+    mapping.update(inputs)
+    node_names = {node.name for node in copy.node if node.name}
+    mapping.update({n: f"{prefix}{n}" for n in node_names if n not in mapping})
+    _rename_graph(copy, mapping)
+    return list(copy.node), {o.name: mapping.get(o.name, o.name) for o in graph.output}
+
+
+def _elem_type(graph: onnx.GraphProto, name: str) -> int:
+    return next(i.type.tensor_type.elem_type for i in graph.input if i.name == name)
+
+
+def _kv_head_shape(graph: onnx.GraphProto, name: str) -> tuple[int, int]:
+    """(num_heads, head_dim) from a past_key_values input, defaulting to Florence-2-base."""
+    dims = next(i.type.tensor_type.shape.dim for i in graph.input if i.name == name)
+    heads = dims[1].dim_value if len(dims) == 4 and dims[1].dim_value else _NUM_HEADS
+    head_dim = dims[3].dim_value if len(dims) == 4 and dims[3].dim_value else _HEAD_DIM
+    return heads, head_dim
+
+
+def build_generator(embed_model: onnx.ModelProto, decoder_model: onnx.ModelProto, eos_token_id: int) -> onnx.ModelProto:
+    dec = decoder_model.graph
+    emb = embed_model.graph
+
+    kv_inputs = [i.name for i in dec.input if i.name.startswith("past_key_values.")]
+    dec_kv = [n for n in kv_inputs if ".decoder." in n]
+    enc_kv = [n for n in kv_inputs if ".encoder." in n]
+    present = {n: n.replace("past_key_values", "present") for n in kv_inputs}
+    kv_type = _elem_type(dec, dec_kv[0])
+    num_heads, head_dim = _kv_head_shape(dec, dec_kv[0])
+
+    # Decoder initializers are shared by the prefill copy and the loop body
+    # (subgraphs can read outer-scope initializers); embed_tokens weights get a
+    # prefix in case their names collide with the decoder's.
+    dec_shared = {i.name for i in dec.initializer}
+    emb_inits = []
+    for init in emb.initializer:
+        renamed = onnx.TensorProto()
+        renamed.CopyFrom(init)
+        renamed.name = f"embed/{init.name}"
+        emb_inits.append(renamed)
+    emb_shared = {i.name for i in emb_inits}
+    emb_graph = onnx.GraphProto()
+    emb_graph.CopyFrom(emb)
+    _rename_graph(emb_graph, {i.name: f"embed/{i.name}" for i in emb.initializer})
+    del emb_graph.initializer[:]
+    emb_in, emb_out = emb_graph.input[0].name, emb_graph.output[0].name
+
+    consts = [
+        numpy_helper.from_array(np.array([[eos_token_id]], dtype=np.int64), "gen/eos"),
+        numpy_helper.from_array(np.array([False]), "gen/use_cache_false"),
+        numpy_helper.from_array(np.array([True]), "gen/use_cache_true"),
+        numpy_helper.from_array(
+            np.zeros((1, num_heads, 0, head_dim), dtype=helper.tensor_dtype_to_np_dtype(kv_type)),
+            "gen/empty_kv",
+        ),
+        numpy_helper.from_array(np.array(1, dtype=np.int64), "gen/one"),
+        numpy_helper.from_array(np.array([], dtype=np.int64), "gen/scalar_shape"),
+        numpy_helper.from_array(np.array([1, -1], dtype=np.int64), "gen/row_shape"),
+    ]
+
+    # --- Prefill: decoder seeded with EOS and an empty KV cache ---
+    nodes, seed = _inline(emb_graph, "prefill_embed/", {emb_in: "gen/eos"}, emb_shared)
+    prefill_inputs = {
+        "inputs_embeds": seed[emb_out],
+        "encoder_hidden_states": "encoder_hidden_states",
+        "encoder_attention_mask": "encoder_attention_mask",
+        "use_cache_branch": "gen/use_cache_false",
+    }
+    prefill_inputs.update({n: "gen/empty_kv" for n in kv_inputs})
+    prefill_nodes, prefill_out = _inline(dec, "prefill/", prefill_inputs, dec_shared)
+    nodes += prefill_nodes
+    nodes += [
+        helper.make_node("ArgMax", [prefill_out["logits"]], ["gen/first_token"], axis=2, keepdims=0),
+        helper.make_node("Equal", ["gen/first_token", "gen/eos"], ["gen/first_is_eos"]),
+        helper.make_node("Not", ["gen/first_is_eos"], ["gen/first_not_eos"]),
+        helper.make_node("Reshape", ["gen/first_not_eos", "gen/scalar_shape"], ["gen/cond0"]),
+        helper.make_node("Sub", ["max_new_tokens", "gen/one"], ["gen/remaining"]),
+    ]
+
+    # --- Loop body: embed last token, one cached decoder step, ArgMax ---
+    body_nodes, step = _inline(emb_graph, "step_embed/", {emb_in: "body/last_token"}, emb_shared)
+    step_inputs = {
+        "inputs_embeds": step[emb_out],
+        "encoder_hidden_states": "encoder_hidden_states",
+        "encoder_attention_mask": "encoder_attention_mask",
+        "use_cache_branch": "gen/use_cache_true",
+    }
+    step_inputs.update({n: f"body/{n}" for n in dec_kv})
+    # Encoder KV is pinned to the prefill output: the merged decoder's If node
+    # corrupts the encoder KV pass-through on the use_cache_branch=True path.
+    step_inputs.update({n: prefill_out[present[n]] for n in enc_kv})
+    step_nodes, step_out = _inline(dec, "step/", step_inputs, dec_shared)
+    body_nodes += step_nodes
+    body_nodes += [
+        helper.make_node("ArgMax", [step_out["logits"]], ["body/next_token"], axis=2, keepdims=0),
+        helper.make_node("Equal", ["body/next_token", "gen/eos"], ["body/is_eos"]),
+        helper.make_node("Not", ["body/is_eos"], ["body/not_eos"]),
+        helper.make_node("Reshape", ["body/not_eos", "gen/scalar_shape"], ["body/cond_out"]),
+        helper.make_node("Identity", ["body/next_token"], ["body/next_token_out"]),
+        helper.make_node("Identity", ["body/next_token"], ["body/scan_token"]),
+    ]
+    body_nodes += [
+        helper.make_node("Identity", [step_out[present[n]]], [f"body/{n}_out"]) for n in dec_kv
+    ]
+    kv_value = lambda name: helper.make_tensor_value_info(name, kv_type, None)
+    body = helper.make_graph(
+        body_nodes,
+        "greedy_step",
+        [
+            helper.make_tensor_value_info("body/iter", TensorProto.INT64, []),
+            helper.make_tensor_value_info("body/cond_in", TensorProto.BOOL, []),
+            helper.make_tensor_value_info("body/last_token", TensorProto.INT64, [1, 1]),
+        ] + [kv_value(f"body/{n}") for n in dec_kv],
+        [
+            helper.make_tensor_value_info("body/cond_out", TensorProto.BOOL, []),
+            helper.make_tensor_value_info("body/next_token_out", TensorProto.INT64, [1, 1]),
+        ] + [kv_value(f"body/{n}_out") for n in dec_kv] + [
+            helper.make_tensor_value_info("body/scan_token", TensorProto.INT64, [1, 1]),
+        ],
+    )
+
+    nodes.append(helper.make_node(
+        "Loop",
+        ["gen/remaining", "gen/cond0", "gen/first_token"] + [prefill_out[present[n]] for n in dec_kv],
+        ["gen/last_token"] + [f"gen/final_{n}" for n in dec_kv] + ["gen/loop_tokens"],
+        body=body,
+    ))
+    nodes += [
+        helper.make_node("Reshape", ["gen/loop_tokens", "gen/row_shape"], ["gen/loop_row"]),
+        helper.make_node("Concat", ["gen/eos", "gen/first_token", "gen/loop_row"], ["sequences"], axis=1),
+    ]
+
+    enc_hidden = next(i for i in dec.input if i.name == "encoder_hidden_states")
+    enc_mask = next(i for i in dec.input if i.name == "encoder_attention_mask")
+    graph = helper.make_graph(
+        nodes,
+        GENERATOR_NAME,
+        [enc_hidden, enc_mask, helper.make_tensor_value_info("max_new_tokens", TensorProto.INT64, [])],
+        [helper.make_tensor_value_info("sequences", TensorProto.INT64, [1, None])],
+        initializer=list(dec.initializer) + emb_inits + consts,
+    )
+
+    opsets: dict[str, int] = {}
+    for model in (decoder_model, embed_model):
+        for op in model.opset_import:
+            opsets[op.domain] = max(opsets.get(op.domain, 0), op.version)
+    return helper.make_model(
+        graph,
+        opset_imports=[helper.make_opsetid(domain, version) for domain, version in opsets.items()],
+        ir_version=max(decoder_model.ir_version, embed_model.ir_version),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build a single-graph greedy generator for the Florence-2 ONNX decoder"
+    )
+    parser.add_argument(
+        "--model-dir",
+        type=Path,
+        default=Path("florence2-onnx"),
+        help="Directory containing the onnx-community export (default: ./florence2-onnx)",
+    )
+    parser.add_argument(
+        "--quantization",
+        default="q4",
+        help='Quantization suffix of the source graphs (default: q4; "" for fp32)',
+    )
+    parser.add_argument(
+        "--eos-token-id",
+        type=int,
+        default=2,
+        help="Decoder start / end token id (default: 2, Florence-2's </s>)",
+    )
+    args = parser.parse_args()
+
+    onnx_dir = args.model_dir / "onnx"
+    suffix = f"_{args.quantization}" if args.quantization else ""
+    out_path = onnx_dir / f"{GENERATOR_NAME}{suffix}.onnx"
+
+    try:
+        print(f"Loading embed_tokens{suffix}.onnx and decoder_model_merged{suffix}.onnx ...")
+        embed_model = onnx.load(str(onnx_dir / f"embed_tokens{suffix}.onnx"))
+        decoder_model = onnx.load(str(onnx_dir / f"decoder_model_merged{suffix}.onnx"))
+
+        model = build_generator(embed_model, decoder_model, args.eos_token_id)
+
+        print(f"Writing {out_path}")
+        data_file = f"{out_path.name}_data"
+        (onnx_dir / data_file).unlink(missing_ok=True)
+        onnx.save(model, str(out_path), save_as_external_data=True, location=data_file)
+        print("✓ Greedy generator exported")
+        return 0
+    except Exception as e:
+        print(f"✗ Error exporting generator: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""Statically quantize the Florence-2 vision encoder to QDQ int8.
+
+The vision encoder is the largest single cost per cover (see
+docs/decisions/002-openvino-acceleration-abandoned.md). The onnx-community
+export only ships weight-only or dynamically quantized variants, which
+still run activations in float. This script uses ONNX
+Runtime's static quantization: activation ranges are calibrated on real
+covers (tests/integration/images plus any --corpus directories), and the
+result is written as a QDQ graph. ORT fuses that graph into integer
+kernels, which use VNNI/AMX where the CPU has them.
+
+The output is saved as onnx/vision_encoder_<suffix>.onnx (default suffix
+qdq_int8). Load it with ONNX_VISION_QUANTIZATION=qdq_int8; the other
+graphs keep ONNX_QUANTIZATION.
+
+Afterwards the script compares the new encoder against the source variant:
+- vision encoder latency and the resulting speed-up
+- end-to-end OCR latency
+- fixture keyword failures; a cover that passes with the source variant but
+  fails with the new one is a regression, and the script exits non-zero
+
+Usage:
+    python scripts/quantize_vision_encoder.py --model-dir florence2-onnx
+    python scripts/quantize_vision_encoder.py --model-dir florence2-onnx \\
+        --corpus ~/covers --max-images 300 --method entropy
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import onnxruntime as ort  # noqa: E402
+from onnxruntime.quantization import (  # noqa: E402
+    CalibrationDataReader,
+    CalibrationMethod,
+    QuantFormat,
+    QuantType,
+    quant_pre_process,
+    quantize_static,
+)
+
+from app import constants  # noqa: E402
+from app.engines.florence2_processing import Florence2Processor  # noqa: E402
+from app.services.autotune import (  # noqa: E402
+    cpu_isa_features,
+    default_max_threads,
+    fixture_failures,
+    load_fixture_images,
+    variant_label,
+)
+from app.services.images import decode_image  # noqa: E402
+
+REPO_ROOT = Path(__file__).parent.parent
+_IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+# Instruction sets with integer dot-product kernels; without them int8
+# activations gain little over q4/fp32.
+_INT8_ISA = {"avx512_vnni", "avx_vnni", "amx_int8", "asimddp", "i8mm"}
+_METHODS = {
+    "minmax": CalibrationMethod.MinMax,
+    "entropy": CalibrationMethod.Entropy,
+    "percentile": CalibrationMethod.Percentile,
+}
+
+
+def _suffix(quantization: str) -> str:
+    return f"_{quantization}" if quantization else ""
+
+
+def _calibration_paths(dirs: list[Path], max_images: int) -> list[Path]:
+    paths = []
+    for directory in dirs:
+        paths.extend(
+            sorted(p for p in directory.rglob("*") if p.suffix.lower() in _IMAGE_SUFFIXES)
+        )
+    return paths[:max_images]
+
+
+class CoverCalibrationReader(CalibrationDataReader):
+    """Feeds covers through the service's own preprocessing, one at a time."""
+
+    def __init__(self, processor: Florence2Processor, paths: list[Path]) -> None:
+        self._processor = processor
+        self._paths = iter(paths)
+
+    def get_next(self) -> dict | None:
+        for path in self._paths:
+            try:
+                image, _ = decode_image(path.read_bytes())
+            except Exception as e:  # one unreadable file shouldn't abort calibration
+                print(f"  skipping {path}: {e}")
+                continue
+            return {"pixel_values": self._processor.preprocess([image])}
+        return None
+
+
+def quantize(
+    source: Path,
+    output: Path,
+    reader: CalibrationDataReader,
+    method: CalibrationMethod,
+    op_types: list[str],
+    per_channel: bool = True,
+    preprocess: bool = True,
+) -> None:
+    """Write a QDQ int8 copy of ``source`` to ``output``, calibrated on ``reader``."""
+    with tempfile.TemporaryDirectory() as tmp:
+        model_input = source
+        if preprocess:
+            # Shape inference and graph cleanup make more nodes quantizable.
+            model_input = Path(tmp) / "preprocessed.onnx"
+            quant_pre_process(str(source), str(model_input))
+        quantize_static(
+            str(model_input),
+            str(output),
+            reader,
+            quant_format=QuantFormat.QDQ,
+            op_types_to_quantize=op_types,
+            per_channel=per_channel,
+            # u8 activations with s8 weights map onto the VNNI/AMX kernels.
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            calibrate_method=method,
+        )
+
+
+def _encoder_latency_ms(model: Path, pixel_values: list, threads: int, repeats: int) -> float:
+    opts = ort.SessionOptions()
+    opts.log_severity_level = 3
+    opts.intra_op_num_threads = threads
+    opts.inter_op_num_threads = 1
+    session = ort.InferenceSession(str(model), opts)
+    session.run(None, {"pixel_values": pixel_values[0]})  # warm-up
+    latencies = []
+    for _ in range(repeats):
+        for pixels in pixel_values:
+            t0 = time.perf_counter()
+            session.run(None, {"pixel_values": pixels})
+            latencies.append((time.perf_counter() - t0) * 1000)
+    return statistics.mean(latencies)
+
+
+async def _ocr(model_dir: Path, vision: str, images: dict[str, bytes], threads: int):
+    """Mean end-to-end latency in ms and missing keywords per cover."""
+    from app.engines.florence2_onnx_engine import Florence2OnnxEngine
+
+    engine = Florence2OnnxEngine(
+        model_path=str(model_dir),
+        vision_quantization=vision,
+        intra_op_num_threads=threads,
+        max_batch_size=1,
+    )
+    await engine.extract_text(next(iter(images.values())))  # warm-up
+    latencies = []
+    failures = {}
+    for name, image_bytes in images.items():
+        t0 = time.perf_counter()
+        result = await engine.extract_text(image_bytes)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        failures[name] = fixture_failures(name, result.text)
+    return statistics.mean(latencies), failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Static QDQ int8 quantization of the Florence-2 vision encoder")
+    parser.add_argument("--model-dir", type=Path, default=REPO_ROOT / "florence2-onnx", help="ONNX model directory")
+    parser.add_argument(
+        "--source", default="", help='Variant to quantize and compare against (default: "" = fp32)'
+    )
+    parser.add_argument("--suffix", default="qdq_int8", help="Output variant suffix (default: qdq_int8)")
+    parser.add_argument("--images", type=Path, default=REPO_ROOT / "tests" / "integration" / "images")
+    parser.add_argument("--corpus", type=Path, nargs="*", default=[], help="Extra cover directories to calibrate on")
+    parser.add_argument("--max-images", type=int, default=200, help="Calibration images to use at most")
+    parser.add_argument("--method", choices=sorted(_METHODS), default="minmax", help="Calibration method")
+    parser.add_argument(
+        "--op-types",
+        nargs="+",
+        default=["Conv", "MatMul", "Gemm"],
+        help="Operator types to quantize; norms and softmax stay in float by default",
+    )
+    parser.add_argument("--per-tensor", action="store_true", help="Per-tensor instead of per-channel weights")
+    parser.add_argument("--no-preprocess", action="store_true", help="Skip shape inference / graph cleanup")
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads (default: OCR thread budget)")
+    parser.add_argument("--repeats", type=int, default=3, help="Passes over the covers when timing the encoder")
+    parser.add_argument("--skip-eval", action="store_true", help="Only quantize; skip the speed/accuracy report")
+    args = parser.parse_args()
+
+    onnx_dir = args.model_dir / "onnx"
+    source = onnx_dir / f"vision_encoder{_suffix(args.source)}.onnx"
+    output = onnx_dir / f"vision_encoder{_suffix(args.suffix)}.onnx"
+    if not source.exists():
+        print(f"✗ {source} not found", file=sys.stderr)
+        return 1
+    paths = _calibration_paths([args.images, *args.corpus], args.max_images)
+    if not paths:
+        print("✗ No calibration images found", file=sys.stderr)
+        return 1
+
+    isa = cpu_isa_features()
+    if not isa & _INT8_ISA:
+        print(f"⚠ No integer dot-product instructions ({', '.join(sorted(_INT8_ISA))}); expect little speed-up")
+
+    processor = Florence2Processor(args.model_dir, constants.FLORENCE2_PROCESSOR_MODEL)
+    print(f"Calibrating {source.name} on {len(paths)} covers ({args.method})...")
+    t0 = time.perf_counter()
+    quantize(
+        source,
+        output,
+        CoverCalibrationReader(processor, paths),
+        _METHODS[args.method],
+        args.op_types,
+        per_channel=not args.per_tensor,
+        preprocess=not args.no_preprocess,
+    )
+    print(f"✓ Wrote {output} in {time.perf_counter() - t0:.0f}s")
+    if args.skip_eval:
+        return 0
+
+    images = load_fixture_images(args.images)
+    if not images:
+        print(f"✗ No fixture covers in {args.images} to evaluate on", file=sys.stderr)
+        return 1
+    threads = args.threads or default_max_threads()
+    pixel_values = [processor.preprocess([decode_image(b)[0]]) for b in images.values()]
+
+    source_ms = _encoder_latency_ms(source, pixel_values, threads, args.repeats)
+    output_ms = _encoder_latency_ms(output, pixel_values, threads, args.repeats)
+    source_e2e, source_failures = asyncio.run(_ocr(args.model_dir, args.source, images, threads))
+    output_e2e, output_failures = asyncio.run(_ocr(args.model_dir, args.suffix, images, threads))
+
+    print(f"\n{threads} threads, {len(images)} fixture covers")
+    print(f"{'':16}{variant_label(args.source):>12}{args.suffix:>12}{'speed-up':>10}")
+    print(f"{'vision encoder':<16}{source_ms:>10.0f}ms{output_ms:>10.0f}ms{source_ms / output_ms:>9.2f}x")
+    print(f"{'end to end':<16}{source_e2e:>10.0f}ms{output_e2e:>10.0f}ms{source_e2e / output_e2e:>9.2f}x")
+
+    regressions = {
+        name: missing for name, missing in output_failures.items() if missing and not source_failures[name]
+    }
+    for name, missing in output_failures.items():
+        if missing:
+            tag = "REGRESSION" if name in regressions else "also fails with source"
+            print(f"  {name}: missing {' '.join(missing)} ({tag})")
+    if regressions:
+        print(f"\n✗ {len(regressions)} fixture regression(s); don't adopt ONNX_VISION_QUANTIZATION={args.suffix}")
+        return 1
+    print(f"\n✓ No fixture regressions. Adopt with ONNX_VISION_QUANTIZATION={args.suffix}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
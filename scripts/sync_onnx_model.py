@@ -8,23 +8,164 @@ The ONNX model is the only pre-downloaded model in local dev, since it's
 loaded from a fixed local directory path. PyTorch and GLiNER are downloaded
 on-demand at runtime and don't need syncing.
 
+With --bundle the script instead builds an offline model bundle: one
+versioned directory holding everything the service loads, already prepared,
+plus a manifest.json with the size and SHA-256 of every file. Point
+MODEL_BUNDLE_PATH at it and start-up only maps files:
+
+- florence2-onnx/: the graphs for the configured ONNX_QUANTIZATION and
+  per-session overrides, the processor's tokenizer and image config, the
+  extracted embedding table and the ORT-optimized graphs
+- gliner/: GLiNER re-saved with its backbone config, and the DeBERTa
+  tokenizer pre-converted to a fast tokenizer.json
+- gliner-onnx/: with NLP_ENGINE=gliner_onnx, GLiNER exported to ONNX and
+  int8-quantized as scripts/export_gliner_onnx.py does
+
 Usage:
     python scripts/sync_onnx_model.py              # Download to default location
     python scripts/sync_onnx_model.py --cache-dir /path/to/cache
+    python scripts/sync_onnx_model.py --bundle bundles
 """
 
 import argparse
+import os
+import platform
 import shutil
 import sys
+from datetime import datetime, timezone
 from pathlib import Path
 
-from huggingface_hub import snapshot_download
+from huggingface_hub import hf_hub_download, snapshot_download
 from transformers import AutoProcessor
 
 # Add app module to path to import constants
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app import constants
+from app.config import settings
+from app.services.model_bundle import FLORENCE2_DIR, GLINER_DIR, GLINER_ONNX_DIR, bundle_version, write_manifest
+
+_GRAPHS = ("vision_encoder", "embed_tokens", "encoder_model", "decoder_model_merged")
+_PROCESSOR_FILES = ("tokenizer.json", "tokenizer_config.json", "preprocessor_config.json")
+
+
+def _graph_variants() -> dict[str, str]:
+    """Quantization variant the service will load for each graph."""
+    base = settings.onnx_quantization
+    return {
+        "vision_encoder": base if settings.onnx_vision_quantization is None else settings.onnx_vision_quantization,
+        "embed_tokens": base,
+        "encoder_model": base if settings.onnx_encoder_quantization is None else settings.onnx_encoder_quantization,
+        "decoder_model_merged": (
+            base if settings.onnx_decoder_quantization is None else settings.onnx_decoder_quantization
+        ),
+    }
+
+
+def _prepare_florence2(onnx_dir: Path, variants: dict[str, str]) -> None:
+    print(f"Downloading {constants.FLORENCE2_ONNX_MODEL}@{constants.FLORENCE2_ONNX_REVISION[:12]}")
+    snapshot_download(
+        constants.FLORENCE2_ONNX_MODEL,
+        local_dir=str(onnx_dir),
+        revision=constants.FLORENCE2_ONNX_REVISION,
+        allow_patterns=["*.json", *(f"onnx/{graph}{'_' + q if q else ''}.onnx*" for graph, q in variants.items())],
+    )
+    for filename in _PROCESSOR_FILES:
+        if not (onnx_dir / filename).exists():
+            hf_hub_download(constants.FLORENCE2_PROCESSOR_MODEL, filename, local_dir=str(onnx_dir))
+
+    # Loading the engine once writes the embedding table and the optimized
+    # graphs into the bundle, exactly as the service would on its first boot.
+    print("Extracting the embedding table and optimizing graphs")
+    from app.engines.florence2_onnx_engine import Florence2OnnxEngine
+
+    engine = Florence2OnnxEngine(
+        model_path=str(onnx_dir),
+        processor_name=constants.FLORENCE2_PROCESSOR_MODEL,
+        embedding_cache=True,
+        optimized_cache=True,
+        optimized_cache_dir=str(onnx_dir / "onnx" / "optimized"),
+        in_graph_generation=False,
+        bundled=True,
+    )
+    del engine
+
+
+def _prepare_gliner(gliner_dir: Path, gliner_onnx_dir: Path | None) -> None:
+    from gliner import GLiNER
+    from transformers import AutoTokenizer
+
+    print(f"Converting {constants.GLINER_MODEL}@{constants.GLINER_REVISION[:12]}")
+    model = GLiNER.from_pretrained(constants.GLINER_MODEL, revision=constants.GLINER_REVISION)
+    model.save_pretrained(str(gliner_dir))
+    # DeBERTa-v3 ships a sentencepiece tokenizer that transformers converts
+    # to a fast tokenizer on every load; saving it writes tokenizer.json.
+    AutoTokenizer.from_pretrained(constants.GLINER_BACKBONE_MODEL).save_pretrained(str(gliner_dir))
+    if gliner_onnx_dir is not None:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print("Exporting GLiNER to ONNX")
+        model.export_to_onnx(gliner_onnx_dir, onnx_filename="model.onnx", quantize=False)
+        quantize_dynamic(
+            str(gliner_onnx_dir / "model.onnx"),
+            str(gliner_onnx_dir / "model_int8.onnx"),
+            op_types_to_quantize=["MatMul", "Gemm"],
+            per_channel=True,
+            weight_type=QuantType.QInt8,
+        )
+
+
+def build_bundle(output: Path, force: bool) -> Path:
+    import onnxruntime as ort
+
+    from app.services.autotune import cpu_isa_features
+
+    variants = _graph_variants()
+    quantization = "+".join(dict.fromkeys(q or "fp32" for q in variants.values()))
+    gliner_onnx = settings.nlp_engine == "gliner_onnx"
+    version = bundle_version(
+        constants.FLORENCE2_ONNX_REVISION, constants.GLINER_REVISION, quantization, ort.__version__, gliner_onnx
+    )
+    final_dir = output / version
+    if final_dir.exists():
+        if not force:
+            print(f"Bundle already exists: {final_dir} (use --force to rebuild)")
+            return final_dir
+        shutil.rmtree(final_dir)
+
+    # Build in a temp directory and rename, so a failed build never leaves
+    # a bundle that looks complete.
+    tmp_dir = output / f".{version}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    try:
+        _prepare_florence2(tmp_dir / FLORENCE2_DIR, variants)
+        _prepare_gliner(tmp_dir / GLINER_DIR, tmp_dir / GLINER_ONNX_DIR if gliner_onnx else None)
+        print("Writing manifest")
+        manifest = write_manifest(tmp_dir, {
+            "version": version,
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "florence2_onnx_model": constants.FLORENCE2_ONNX_MODEL,
+            "florence2_onnx_revision": constants.FLORENCE2_ONNX_REVISION,
+            "florence2_processor_model": constants.FLORENCE2_PROCESSOR_MODEL,
+            "gliner_model": constants.GLINER_MODEL,
+            "gliner_revision": constants.GLINER_REVISION,
+            "gliner_backbone_model": constants.GLINER_BACKBONE_MODEL,
+            "nlp_engine": settings.nlp_engine,
+            "quantization": variants,
+            "embedding_dtype": settings.onnx_embedding_dtype,
+            "onnxruntime": ort.__version__,
+            # Optimized graphs are only reused on hosts with the same CPU features.
+            "machine": platform.machine(),
+            "cpu_isa": sorted(cpu_isa_features()),
+        })
+        os.replace(tmp_dir, final_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    size_mb = sum(entry["size"] for entry in manifest["files"].values()) / 1e6
+    print(f"✓ Bundle written to {final_dir} ({len(manifest['files'])} files, {size_mb:.0f} MB)")
+    return final_dir
 
 
 def main():
@@ -37,9 +178,24 @@ def main():
         default=None,
         help="Cache directory for downloaded model (defaults to current directory or $HF_HOME)",
     )
+    parser.add_argument(
+        "--bundle",
+        type=Path,
+        default=None,
+        help="Build a versioned offline model bundle in this directory instead",
+    )
+    parser.add_argument("--force", action="store_true", help="Rebuild an existing bundle")
 
     args = parser.parse_args()
 
+    if args.bundle:
+        try:
+            build_bundle(args.bundle, args.force)
+            return 0
+        except Exception as e:
+            print(f"✗ Error building bundle: {e}", file=sys.stderr)
+            return 1
+
     # Determine download directory
     if args.cache_dir:
         download_dir = args.cache_dir
@@ -9,8 +9,10 @@ class MockOcrEngine(OcrEngine):
     def __init__(self, result: OcrResult | None = None, error: Exception | None = None):
         self._result = result
         self._error = error
+        self.calls = 0
 
     async def extract_text(self, image_bytes: bytes) -> OcrResult:
+        self.calls += 1
         if self._error:
             raise self._error
         assert self._result is not None
@@ -22,8 +22,15 @@ def _titles(result) -> list[str]:
 import pytest
 
 
-@pytest.fixture(scope="session")
-def gliner_engine():
+@pytest.fixture(scope="session", params=["gliner", "gliner_onnx"])
+def gliner_engine(request):
+    if request.param == "gliner_onnx":
+        from app.config import settings
+        from app.engines.gliner_onnx_engine import GlinerOnnxEngine
+        model_file = Path(settings.gliner_onnx_model_path) / settings.gliner_onnx_model_file
+        if not model_file.exists():
+            pytest.skip(f"{model_file} not found; run scripts/export_gliner_onnx.py")
+        return GlinerOnnxEngine()
     from app.engines.gliner_engine import GlinerNlpEngine
     return GlinerNlpEngine()
 
@@ -0,0 +1,101 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from app.services.admission import AdmissionController, OverloadedError
+
+
+async def _hold(controller: AdmissionController, release: asyncio.Event) -> None:
+    async with controller.slot():
+        await release.wait()
+
+
+class TestAdmissionController:
+    def test_rejects_invalid_limits(self):
+        with pytest.raises(ValueError):
+            AdmissionController(max_concurrency=0, max_queue=1)
+        with pytest.raises(ValueError):
+            AdmissionController(max_concurrency=1, max_queue=-1)
+
+    @pytest.mark.asyncio
+    async def test_limits_concurrency_and_queues_the_rest(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=1)
+        release = asyncio.Event()
+
+        with patch("app.services.admission._IN_FLIGHT") as in_flight, \
+             patch("app.services.admission._QUEUE_DEPTH") as depth:
+            tasks = [asyncio.ensure_future(_hold(controller, release)) for _ in range(2)]
+            await asyncio.sleep(0)
+
+            assert in_flight.set.call_args[0][0] == 1
+            assert depth.set.call_args[0][0] == 1
+
+            release.set()
+            await asyncio.gather(*tasks)
+
+        assert in_flight.set.call_args[0][0] == 0
+        assert depth.set.call_args[0][0] == 0
+
+    @pytest.mark.asyncio
+    async def test_rejects_past_concurrency_plus_queue(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=1)
+        release = asyncio.Event()
+        tasks = [asyncio.ensure_future(_hold(controller, release)) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        with patch("app.services.admission._REJECTED") as rejected:
+            with pytest.raises(OverloadedError) as exc:
+                async with controller.slot():
+                    pass
+
+        rejected.inc.assert_called_once()
+        assert exc.value.retry_after >= 1
+        release.set()
+        await asyncio.gather(*tasks)
+
+    @pytest.mark.asyncio
+    async def test_slot_is_released_on_error(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=0)
+
+        with pytest.raises(RuntimeError):
+            async with controller.slot():
+                raise RuntimeError("pipeline crashed")
+
+        async with controller.slot():
+            pass
+
+    @pytest.mark.asyncio
+    async def test_queue_wait_is_recorded(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=0)
+
+        with patch("app.services.admission._QUEUE_WAIT") as wait:
+            async with controller.slot():
+                pass
+
+        wait.observe.assert_called_once()
+        assert wait.observe.call_args[0][0] >= 0
+
+
+class TestRetryAfter:
+    def test_scales_with_admitted_work_and_latency(self):
+        controller = AdmissionController(max_concurrency=2, max_queue=4, initial_latency_s=3.0)
+        controller._in_flight, controller._waiting = 2, 4
+
+        # Six analyses at 3 s each across two slots.
+        assert controller.retry_after() == 9
+
+    def test_is_at_least_one_second(self):
+        controller = AdmissionController(max_concurrency=4, max_queue=0, initial_latency_s=0.01)
+        assert controller.retry_after() == 1
+
+    @pytest.mark.asyncio
+    async def test_tracks_recent_latency(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=0, initial_latency_s=10.0)
+
+        for _ in range(30):
+            async with controller.slot():
+                pass
+
+        controller._in_flight = 1
+        assert controller.retry_after() == 1
@@ -1,10 +1,17 @@
+import asyncio
+import io
 import logging
 from unittest.mock import patch
 
+import numpy as np
 import pytest
+from PIL import Image
 
 from app.models import BookMatch, NlpAnalysis, OcrResult
+from app.services.admission import AdmissionController, OverloadedError
 from app.services.analyzer import CoverAnalyzer
+from app.services.near_duplicate import NearDuplicateIndex
+from app.services.result_cache import CacheStatus, ResultCache
 from tests.conftest import MockNlpEngine, MockOcrEngine
 
 
@@ -138,3 +145,191 @@ class TestCoverAnalyzer:
 
         assert result.ocr_result.text == "Specific Test Text"
         assert result.nlp_analysis.potential_authors == ["Text Author"]
+
+
+def _jpeg(image: Image.Image, quality: int) -> bytes:
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+class TestCoverAnalyzerResultCache:
+    @pytest.mark.asyncio
+    async def test_repeat_upload_is_served_from_cache(self, sample_ocr_result, sample_nlp_analysis):
+        ocr = MockOcrEngine(result=sample_ocr_result)
+        analyzer = CoverAnalyzer(
+            ocr, MockNlpEngine(result=sample_nlp_analysis),
+            result_cache=ResultCache(max_entries=4, fingerprint="test"),
+        )
+
+        first, first_status = await analyzer.analyze_with_cache_status(b"same bytes")
+        second, second_status = await analyzer.analyze_with_cache_status(b"same bytes")
+
+        assert (first_status, second_status) == (CacheStatus.MISS, CacheStatus.HIT)
+        assert second == first
+        assert ocr.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_failures_are_not_cached(self):
+        ocr = MockOcrEngine(error=RuntimeError("OCR crashed"))
+        analyzer = CoverAnalyzer(
+            ocr, MockNlpEngine(result=NlpAnalysis()),
+            result_cache=ResultCache(max_entries=4, fingerprint="test"),
+        )
+
+        await analyzer.analyze(b"bad bytes")
+        _, status = await analyzer.analyze_with_cache_status(b"bad bytes")
+
+        assert status == CacheStatus.MISS
+        assert ocr.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_no_cache_reports_no_status(self, sample_ocr_result, sample_nlp_analysis):
+        analyzer = CoverAnalyzer(
+            MockOcrEngine(result=sample_ocr_result), MockNlpEngine(result=sample_nlp_analysis)
+        )
+
+        _, status = await analyzer.analyze_with_cache_status(b"bytes")
+
+        assert status is None
+
+    @pytest.mark.asyncio
+    async def test_near_duplicate_photo_skips_pipeline(self, sample_ocr_result, sample_nlp_analysis):
+        ocr = MockOcrEngine(result=sample_ocr_result)
+        analyzer = CoverAnalyzer(
+            ocr, MockNlpEngine(result=sample_nlp_analysis),
+            near_duplicates=NearDuplicateIndex(max_entries=4, max_distance=8),
+        )
+        cover = Image.fromarray(
+            np.random.default_rng(0).integers(0, 256, (8, 6, 3), dtype=np.uint8)
+        ).resize((600, 800), Image.Resampling.NEAREST)
+
+        _, first_status = await analyzer.analyze_with_cache_status(_jpeg(cover, 95))
+        second, second_status = await analyzer.analyze_with_cache_status(_jpeg(cover, 50))
+
+        assert (first_status, second_status) == (CacheStatus.MISS, CacheStatus.NEAR_HIT)
+        assert second.nlp_analysis.potential_authors == ["F Scott Fitzgerald"]
+        assert ocr.calls == 1
+
+
+class _GatedOcrEngine(MockOcrEngine):
+    """Holds every extraction open until ``release`` is set."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.release = asyncio.Event()
+
+    async def extract_text(self, image_bytes: bytes) -> OcrResult:
+        await self.release.wait()
+        return await super().extract_text(image_bytes)
+
+
+async def _wait_for_coalesced(counter, count: int) -> None:
+    # Hashing runs in a worker thread, so give every request time to reach
+    # the in-flight check before the gated analysis is released.
+    for _ in range(200):
+        if counter.inc.call_count == count:
+            return
+        await asyncio.sleep(0.005)
+    raise AssertionError(f"expected {count} coalesced requests, got {counter.inc.call_count}")
+
+
+class TestCoverAnalyzerCoalescing:
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_uploads_share_one_analysis(self, sample_ocr_result, sample_nlp_analysis):
+        ocr = _GatedOcrEngine(result=sample_ocr_result)
+        analyzer = CoverAnalyzer(ocr, MockNlpEngine(result=sample_nlp_analysis))
+
+        with patch("app.services.analyzer._COALESCED") as coalesced:
+            tasks = [asyncio.ensure_future(analyzer.analyze(b"same bytes")) for _ in range(3)]
+            await _wait_for_coalesced(coalesced, 2)
+            ocr.release.set()
+            results = await asyncio.gather(*tasks)
+
+        assert coalesced.inc.call_count == 2
+        assert ocr.calls == 1
+        assert all(r == results[0] for r in results)
+        assert results[0].analysisStatus.is_success is True
+
+    @pytest.mark.asyncio
+    async def test_different_uploads_are_not_coalesced(self, sample_ocr_result, sample_nlp_analysis):
+        ocr = _GatedOcrEngine(result=sample_ocr_result)
+        ocr.release.set()
+        analyzer = CoverAnalyzer(ocr, MockNlpEngine(result=sample_nlp_analysis))
+
+        await asyncio.gather(analyzer.analyze(b"cover one"), analyzer.analyze(b"cover two"))
+
+        assert ocr.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_waiters_share_the_first_requests_cache_status(self, sample_ocr_result, sample_nlp_analysis):
+        ocr = _GatedOcrEngine(result=sample_ocr_result)
+        analyzer = CoverAnalyzer(
+            ocr, MockNlpEngine(result=sample_nlp_analysis),
+            result_cache=ResultCache(max_entries=4, fingerprint="test"),
+        )
+
+        with patch("app.services.analyzer._COALESCED") as coalesced:
+            tasks = [asyncio.ensure_future(analyzer.analyze_with_cache_status(b"same")) for _ in range(2)]
+            await _wait_for_coalesced(coalesced, 1)
+            ocr.release.set()
+            statuses = [status for _, status in await asyncio.gather(*tasks)]
+        _, later_status = await analyzer.analyze_with_cache_status(b"same")
+
+        assert statuses == [CacheStatus.MISS, CacheStatus.MISS]
+        assert later_status == CacheStatus.HIT
+        assert ocr.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_cancelled_first_caller_does_not_cancel_waiters(self, sample_ocr_result, sample_nlp_analysis):
+        ocr = _GatedOcrEngine(result=sample_ocr_result)
+        analyzer = CoverAnalyzer(ocr, MockNlpEngine(result=sample_nlp_analysis))
+
+        with patch("app.services.analyzer._COALESCED") as coalesced:
+            first = asyncio.ensure_future(analyzer.analyze(b"same"))
+            second = asyncio.ensure_future(analyzer.analyze(b"same"))
+            await _wait_for_coalesced(coalesced, 1)
+            first.cancel()
+            ocr.release.set()
+            result = await second
+
+        assert result.analysisStatus.is_success is True
+        assert ocr.calls == 1
+
+
+class TestCoverAnalyzerAdmission:
+    @pytest.mark.asyncio
+    async def test_full_queue_raises_overloaded(self, sample_ocr_result, sample_nlp_analysis):
+        ocr = _GatedOcrEngine(result=sample_ocr_result)
+        analyzer = CoverAnalyzer(
+            ocr, MockNlpEngine(result=sample_nlp_analysis),
+            admission=AdmissionController(max_concurrency=1, max_queue=0),
+        )
+        first = asyncio.ensure_future(analyzer.analyze(b"cover one"))
+        await asyncio.sleep(0.05)
+
+        with pytest.raises(OverloadedError):
+            await analyzer.analyze(b"cover two")
+
+        ocr.release.set()
+        assert (await first).analysisStatus.is_success is True
+
+    @pytest.mark.asyncio
+    async def test_cache_hits_bypass_a_full_queue(self, sample_ocr_result, sample_nlp_analysis):
+        ocr = _GatedOcrEngine(result=sample_ocr_result)
+        ocr.release.set()
+        analyzer = CoverAnalyzer(
+            ocr, MockNlpEngine(result=sample_nlp_analysis),
+            result_cache=ResultCache(max_entries=4, fingerprint="test"),
+            admission=AdmissionController(max_concurrency=1, max_queue=0),
+        )
+        await analyzer.analyze(b"cached cover")
+        ocr.release.clear()
+        busy = asyncio.ensure_future(analyzer.analyze(b"slow cover"))
+        await asyncio.sleep(0.05)
+
+        _, status = await analyzer.analyze_with_cache_status(b"cached cover")
+
+        assert status == CacheStatus.HIT
+        ocr.release.set()
+        await busy
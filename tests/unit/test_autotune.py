@@ -0,0 +1,189 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from app.models import OcrResult
+from app.services import autotune as autotune_module
+from app.services.autotune import (
+    FIXTURE_KEYWORDS,
+    TuningResult,
+    autotune,
+    available_variants,
+    candidate_threads,
+    candidate_variants,
+    cpu_isa_features,
+    fixture_failures,
+    load_or_autotune,
+    load_tuning,
+    save_tuning,
+)
+
+_PASSING_TEXT = " ".join(word for words in FIXTURE_KEYWORDS.values() for word in words)
+
+
+def _write_variant(model_dir, quantization):
+    onnx_dir = model_dir / "onnx"
+    onnx_dir.mkdir(parents=True, exist_ok=True)
+    suffix = f"_{quantization}" if quantization else ""
+    for graph in ("vision_encoder", "embed_tokens", "encoder_model", "decoder_model_merged"):
+        (onnx_dir / f"{graph}{suffix}.onnx").write_bytes(b"")
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def perf_counter(self):
+        return self.now
+
+
+def _fake_engine_class(clock, cost_ms, text_for=lambda quantization: _PASSING_TEXT):
+    """Engine whose extract_text advances ``clock`` by cost_ms[(quantization, threads)]."""
+    built = []
+
+    class FakeEngine:
+        def __init__(self, quantization, intra_op_num_threads, **kwargs):
+            assert kwargs["decoder_quantization"] == quantization
+            self._cost = cost_ms[(quantization, intra_op_num_threads)] / 1000
+            self._text = text_for(quantization)
+            built.append((quantization, intra_op_num_threads))
+
+        async def extract_text(self, image_bytes):
+            clock.now += self._cost
+            return OcrResult(text=self._text, regions=[])
+
+    return FakeEngine, built
+
+
+class TestHostDetection:
+    def test_parses_x86_flags(self, tmp_path):
+        cpuinfo = tmp_path / "cpuinfo"
+        cpuinfo.write_text("processor\t: 0\nflags\t\t: fpu sse2 avx2 fma avx512f avx512_vnni amx_int8\n")
+        assert cpu_isa_features(cpuinfo) == {"avx2", "fma", "avx512f", "avx512_vnni", "amx_int8"}
+
+    def test_parses_arm_features(self, tmp_path):
+        cpuinfo = tmp_path / "cpuinfo"
+        cpuinfo.write_text("processor\t: 0\nFeatures\t: fp asimd asimdhp asimddp i8mm\n")
+        assert cpu_isa_features(cpuinfo) == {"asimd", "asimdhp", "asimddp", "i8mm"}
+
+    def test_missing_cpuinfo(self, tmp_path):
+        assert cpu_isa_features(tmp_path / "missing") == set()
+
+
+class TestCandidates:
+    def test_thread_counts(self):
+        assert candidate_threads(6) == [1, 2, 4, 6]
+        assert candidate_threads(8) == [1, 2, 4, 8]
+        assert candidate_threads(1) == [1]
+
+    def test_only_complete_variants(self, tmp_path):
+        _write_variant(tmp_path, "q4")
+        _write_variant(tmp_path, "")
+        (tmp_path / "onnx" / "vision_encoder_int8.onnx").write_bytes(b"")
+
+        assert available_variants(tmp_path) == ["q4", ""]
+
+    def test_fp16_needs_native_support(self, tmp_path):
+        _write_variant(tmp_path, "fp16")
+        _write_variant(tmp_path, "int8")
+
+        assert candidate_variants(tmp_path, {"avx2"}) == ["int8"]
+        assert candidate_variants(tmp_path, {"avx512_fp16"}) == ["int8", "fp16"]
+
+    def test_fixture_failures(self):
+        assert fixture_failures("mistborn", "BRANDON SANDERSON MISTBORN") == []
+        assert fixture_failures("mistborn", "Brandon Mistborn") == ["sanderson"]
+
+
+class TestPersistence:
+    def test_round_trip(self, tmp_path):
+        result = TuningResult("int8", 4, 812.5, host={"cpu_model": "x"})
+        save_tuning(tmp_path / "autotune.json", result)
+
+        assert load_tuning(tmp_path / "autotune.json", {"cpu_model": "x"}) == result
+
+    def test_stale_host_is_ignored(self, tmp_path):
+        save_tuning(tmp_path / "autotune.json", TuningResult("int8", 4, 812.5, host={"cpu_model": "x"}))
+
+        assert load_tuning(tmp_path / "autotune.json", {"cpu_model": "y"}) is None
+
+    def test_unreadable_file_is_ignored(self, tmp_path):
+        (tmp_path / "autotune.json").write_text("{not json")
+
+        assert load_tuning(tmp_path / "autotune.json", {}) is None
+
+
+class TestAutotune:
+    @pytest.mark.asyncio
+    async def test_picks_fastest_passing_candidate(self):
+        clock = _FakeClock()
+        costs = {("q4", 1): 900, ("q4", 2): 500, ("int8", 1): 700, ("int8", 2): 400}
+        engine_cls, _ = _fake_engine_class(clock, costs)
+
+        with patch("app.engines.florence2_onnx_engine.Florence2OnnxEngine", engine_cls), \
+             patch.object(autotune_module, "time", SimpleNamespace(perf_counter=clock.perf_counter)):
+            result = await autotune("/m", {"mistborn": b"x"}, max_threads=2, variants=["q4", "int8"])
+
+        assert (result.quantization, result.intra_op_num_threads) == ("int8", 2)
+        assert result.mean_latency_ms == 400
+        assert len(result.candidates) == 4
+
+    @pytest.mark.asyncio
+    async def test_inaccurate_variant_is_dropped(self):
+        clock = _FakeClock()
+        costs = {("q4", 1): 900, ("q4", 2): 500, ("int8", 1): 100, ("int8", 2): 50}
+        engine_cls, built = _fake_engine_class(
+            clock, costs, text_for=lambda q: "Brandon Mistborn" if q == "int8" else _PASSING_TEXT
+        )
+
+        with patch("app.engines.florence2_onnx_engine.Florence2OnnxEngine", engine_cls), \
+             patch.object(autotune_module, "time", SimpleNamespace(perf_counter=clock.perf_counter)):
+            result = await autotune("/m", {"mistborn": b"x"}, max_threads=2, variants=["q4", "int8"])
+
+        assert (result.quantization, result.intra_op_num_threads) == ("q4", 2)
+        assert ("int8", 2) not in built
+        assert result.candidates[-1]["failures"] == {"mistborn": ["sanderson"]}
+
+    @pytest.mark.asyncio
+    async def test_no_passing_candidate(self):
+        clock = _FakeClock()
+        engine_cls, _ = _fake_engine_class(clock, {("q4", 1): 100}, text_for=lambda q: "")
+
+        with patch("app.engines.florence2_onnx_engine.Florence2OnnxEngine", engine_cls):
+            with pytest.raises(RuntimeError):
+                await autotune("/m", {"mistborn": b"x"}, max_threads=1, variants=["q4"])
+
+
+class TestLoadOrAutotune:
+    @pytest.mark.asyncio
+    async def test_reuses_persisted_result(self, tmp_path):
+        host = autotune_module.host_fingerprint(cpu_isa_features(), 2)
+        save_tuning(tmp_path / "autotune.json", TuningResult("int8", 2, 400.0, host=host))
+
+        with patch.object(autotune_module, "autotune") as search:
+            result = await load_or_autotune("/m", tmp_path / "images", tmp_path / "autotune.json", max_threads=2)
+
+        search.assert_not_called()
+        assert result.quantization == "int8"
+
+    @pytest.mark.asyncio
+    async def test_without_images_keeps_settings(self, tmp_path):
+        result = await load_or_autotune("/m", tmp_path / "missing", tmp_path / "autotune.json", max_threads=2)
+
+        assert result is None
+        assert not (tmp_path / "autotune.json").exists()
+
+    @pytest.mark.asyncio
+    async def test_searches_and_persists(self, tmp_path):
+        (tmp_path / "images").mkdir()
+        (tmp_path / "images" / "mistborn.jpg").write_bytes(b"x")
+        found = TuningResult("q4", 1, 100.0, host={})
+
+        with patch.object(autotune_module, "autotune", return_value=found) as search:
+            result = await load_or_autotune("/m", tmp_path / "images", tmp_path / "autotune.json", max_threads=1)
+
+        search.assert_called_once()
+        assert search.call_args[0][1] == {"mistborn": b"x"}
+        assert result == found
+        assert (tmp_path / "autotune.json").exists()
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from app.services.batching import MicroBatcher
+
+
+class _RecordingBatchFn:
+    def __init__(self, error: Exception | None = None):
+        self.calls: list[list[int]] = []
+        self._error = error
+
+    def __call__(self, items: list[int]) -> list[int]:
+        self.calls.append(list(items))
+        if self._error:
+            raise self._error
+        return [i * 10 for i in items]
+
+
+class TestMicroBatcher:
+    @pytest.mark.asyncio
+    async def test_single_submit_returns_result(self):
+        fn = _RecordingBatchFn()
+        batcher = MicroBatcher(fn, max_batch_size=4, window_ms=1, stage="test")
+
+        assert await batcher.submit(3) == 30
+        assert fn.calls == [[3]]
+
+    @pytest.mark.asyncio
+    async def test_concurrent_submits_coalesce_into_one_call(self):
+        fn = _RecordingBatchFn()
+        batcher = MicroBatcher(fn, max_batch_size=8, window_ms=50, stage="test")
+
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(3)))
+
+        assert results == [0, 10, 20]
+        assert fn.calls == [[0, 1, 2]]
+
+    @pytest.mark.asyncio
+    async def test_full_batch_flushes_and_overflow_starts_new_batch(self):
+        fn = _RecordingBatchFn()
+        batcher = MicroBatcher(fn, max_batch_size=2, window_ms=50, stage="test")
+
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+
+        assert results == [0, 10, 20, 30, 40]
+        assert fn.calls == [[0, 1], [2, 3], [4]]
+
+    @pytest.mark.asyncio
+    async def test_full_batch_does_not_wait_for_window(self):
+        fn = _RecordingBatchFn()
+        batcher = MicroBatcher(fn, max_batch_size=2, window_ms=10_000, stage="test")
+
+        results = await asyncio.wait_for(
+            asyncio.gather(batcher.submit(1), batcher.submit(2)), timeout=1
+        )
+
+        assert results == [10, 20]
+
+    @pytest.mark.asyncio
+    async def test_error_propagates_to_every_caller(self):
+        fn = _RecordingBatchFn(error=RuntimeError("model crashed"))
+        batcher = MicroBatcher(fn, max_batch_size=4, window_ms=20, stage="test")
+
+        results = await asyncio.gather(
+            batcher.submit(1), batcher.submit(2), return_exceptions=True
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert len(fn.calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_result_count_mismatch_raises(self):
+        batcher = MicroBatcher(lambda items: [], max_batch_size=4, window_ms=1, stage="test")
+
+        with pytest.raises(RuntimeError, match="returned 0 results for 1 inputs"):
+            await batcher.submit(1)
+
+    def test_rejects_non_positive_batch_size(self):
+        with pytest.raises(ValueError):
+            MicroBatcher(lambda items: items, max_batch_size=0, window_ms=1, stage="test")
@@ -0,0 +1,69 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.config import settings
+from app.engines.cascade_engine import CascadingNlpEngine
+from app.models import NlpAnalysis, OcrResult
+
+OCR = OcrResult(text="", regions=[])
+INDEX_RESULT = NlpAnalysis(potential_authors=["Brandon Sanderson"], potential_titles=["Mistborn"])
+GLINER_RESULT = NlpAnalysis(potential_authors=["Fonda Lee"], potential_titles=["Jade City"])
+
+
+def _cascade(index_result):
+    index = MagicMock()
+    index.match.return_value = index_result
+    fallback = MagicMock()
+    fallback.analyze = AsyncMock(return_value=GLINER_RESULT)
+    return CascadingNlpEngine(index, fallback), fallback
+
+
+def _requests(engine: str) -> float:
+    return REGISTRY.get_sample_value("cover_detection_nlp_cascade_requests_total", {"engine": engine}) or 0.0
+
+
+async def test_confident_index_skips_gliner():
+    cascade, fallback = _cascade(INDEX_RESULT)
+    before = _requests("name_index")
+
+    assert await cascade.analyze(OCR) == INDEX_RESULT
+    fallback.analyze.assert_not_called()
+    assert _requests("name_index") == before + 1
+
+
+async def test_falls_back_to_gliner():
+    cascade, fallback = _cascade(None)
+    before = _requests("gliner")
+
+    assert await cascade.analyze(OCR) == GLINER_RESULT
+    fallback.analyze.assert_awaited_once_with(OCR)
+    assert _requests("gliner") == before + 1
+
+
+async def test_share_and_p50_gauges():
+    cascade, _ = _cascade(INDEX_RESULT)
+    assert REGISTRY.get_sample_value("cover_detection_nlp_gliner_skipped_ratio") == 0.0
+
+    await cascade.analyze(OCR)
+    await cascade.analyze(OCR)
+    cascade._index.match.return_value = None
+    await cascade.analyze(OCR)
+    cascade._index.match.return_value = INDEX_RESULT
+    await cascade.analyze(OCR)
+
+    assert REGISTRY.get_sample_value("cover_detection_nlp_gliner_skipped_ratio") == pytest.approx(0.75)
+    assert REGISTRY.get_sample_value("cover_detection_nlp_latency_p50_seconds") == cascade.p50_latency() > 0
+
+
+def test_name_index_path_wraps_gliner():
+    from app import main
+    with patch.object(settings, "name_index_path", "/data/names.idx"), \
+         patch.object(main, "_load_gliner_engine") as load_gliner, \
+         patch("app.engines.name_index_engine.NameIndexNlpEngine") as index_cls:
+        engine = main._load_nlp_engine(None, None)
+
+    assert isinstance(engine, CascadingNlpEngine)
+    assert engine._fallback is load_gliner.return_value
+    index_cls.assert_called_once_with("/data/names.idx")
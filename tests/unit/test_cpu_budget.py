@@ -0,0 +1,145 @@
+from unittest.mock import MagicMock, patch
+
+import onnxruntime as ort
+import pytest
+
+from app.services import executors
+from app.services.cpu_budget import CpuBudget, _cgroup_cpu_quota, container_cpu_count
+
+
+class TestCgroupQuota:
+    def test_v2_limited(self, tmp_path):
+        (tmp_path / "cpu.max").write_text("150000 100000\n")
+        assert _cgroup_cpu_quota(tmp_path) == 1.5
+
+    def test_v2_unlimited(self, tmp_path):
+        (tmp_path / "cpu.max").write_text("max 100000\n")
+        assert _cgroup_cpu_quota(tmp_path) is None
+
+    def test_v1_limited(self, tmp_path):
+        (tmp_path / "cpu,cpuacct").mkdir()
+        (tmp_path / "cpu,cpuacct" / "cpu.cfs_quota_us").write_text("200000\n")
+        (tmp_path / "cpu,cpuacct" / "cpu.cfs_period_us").write_text("100000\n")
+        assert _cgroup_cpu_quota(tmp_path) == 2.0
+
+    def test_v1_unlimited(self, tmp_path):
+        (tmp_path / "cpu").mkdir()
+        (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("-1\n")
+        (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+        assert _cgroup_cpu_quota(tmp_path) is None
+
+    def test_no_cgroup_files(self, tmp_path):
+        assert _cgroup_cpu_quota(tmp_path) is None
+
+
+class TestContainerCpuCount:
+    def test_quota_caps_visible_cores(self, tmp_path):
+        (tmp_path / "cpu.max").write_text("250000 100000\n")
+        with patch("app.services.cpu_budget._allowed_cores", return_value=list(range(32))):
+            assert container_cpu_count(tmp_path) == 2
+
+    def test_fractional_quota_keeps_one_core(self, tmp_path):
+        (tmp_path / "cpu.max").write_text("50000 100000\n")
+        with patch("app.services.cpu_budget._allowed_cores", return_value=list(range(8))):
+            assert container_cpu_count(tmp_path) == 1
+
+    def test_affinity_mask_without_quota(self, tmp_path):
+        with patch("app.services.cpu_budget._allowed_cores", return_value=[2, 3, 5]):
+            assert container_cpu_count(tmp_path) == 3
+
+
+class TestCpuBudgetSplit:
+    def test_splits_cores_between_stages(self):
+        budget = CpuBudget(8, ocr_share=0.75, cores=list(range(8)))
+        assert (budget.ocr_threads, budget.nlp_threads) == (6, 2)
+        assert budget.ocr_cores == (0, 1, 2, 3, 4, 5)
+        assert budget.nlp_cores == (6, 7)
+
+    def test_each_stage_keeps_a_core(self):
+        budget = CpuBudget(2, ocr_share=0.9, cores=[0, 1])
+        assert (budget.ocr_threads, budget.nlp_threads) == (1, 1)
+
+    def test_single_core_is_time_shared(self):
+        budget = CpuBudget(1, cores=[0], affinity=True)
+        assert (budget.ocr_threads, budget.nlp_threads) == (1, 1)
+        assert budget.affinity is False
+
+    def test_rejects_invalid_arguments(self):
+        with pytest.raises(ValueError):
+            CpuBudget(0)
+        with pytest.raises(ValueError):
+            CpuBudget(4, ocr_share=1.0)
+
+
+class TestSessionOptions:
+    def test_per_session_threads(self):
+        opts = ort.SessionOptions()
+        CpuBudget(4, cores=[0, 1, 2, 3]).configure_session_options(opts)
+        assert opts.intra_op_num_threads == 2
+        assert opts.inter_op_num_threads == 1
+
+    def test_global_pool_disables_per_session_threads(self):
+        opts = ort.SessionOptions()
+        CpuBudget(4, cores=[0, 1, 2, 3], global_thread_pool=True).configure_session_options(opts)
+        assert opts.use_per_session_threads is False
+
+    def test_affinity_pins_intra_op_threads(self):
+        opts = ort.SessionOptions()
+        CpuBudget(8, ocr_share=0.5, cores=list(range(8)), affinity=True).configure_session_options(opts)
+        # The calling thread takes core 0; ORT numbers processors from 1.
+        assert opts.get_session_config_entry("session.intra_op_thread_affinities") == "2;3;4"
+
+    def test_tuned_thread_count_keeps_affinity(self):
+        opts = ort.SessionOptions()
+        CpuBudget(8, ocr_share=0.5, cores=list(range(8)), affinity=True).configure_session_options(opts, threads=2)
+        assert opts.intra_op_num_threads == 2
+        assert opts.get_session_config_entry("session.intra_op_thread_affinities") == "2"
+
+    def test_tuned_thread_count_is_capped_at_the_share(self):
+        opts = ort.SessionOptions()
+        CpuBudget(4, cores=[0, 1, 2, 3], global_thread_pool=True).configure_session_options(opts, threads=8)
+        assert opts.intra_op_num_threads == 2
+        assert opts.use_per_session_threads is False
+
+    def test_nlp_stage_uses_nlp_share(self):
+        opts = ort.SessionOptions()
+        CpuBudget(8, ocr_share=0.25, cores=list(range(8)), affinity=True).configure_session_options(opts, stage="nlp")
+        assert opts.intra_op_num_threads == 6
+        assert opts.get_session_config_entry("session.intra_op_thread_affinities") == "4;5;6;7;8"
+
+
+class TestRebalance:
+    def test_nlp_takes_every_core_while_ocr_is_idle(self):
+        budget = CpuBudget(4, cores=[0, 1, 2, 3])
+        assert budget.nlp_thread_count() == 4
+
+        with budget.ocr_running():
+            assert budget.nlp_thread_count() == 2
+        assert budget.nlp_thread_count() == 4
+
+    def test_disabled(self):
+        budget = CpuBudget(4, cores=[0, 1, 2, 3], rebalance=False)
+        assert budget.nlp_thread_count() == 2
+
+    def test_affinity_keeps_nlp_on_its_cores(self):
+        budget = CpuBudget(4, cores=[0, 1, 2, 3], affinity=True)
+        assert budget.nlp_thread_count() == 2
+
+
+class TestInstall:
+    def test_sets_global_pool_sizes(self):
+        with patch("onnxruntime.capi._pybind_state.set_global_thread_pool_sizes") as set_sizes:
+            CpuBudget(4, cores=[0, 1, 2, 3], global_thread_pool=True).install()
+        set_sizes.assert_called_once_with(2, 1)
+
+    def test_pins_stage_executors(self):
+        with patch.dict(executors._executors, clear=True), \
+             patch.dict(executors._stage_cores, clear=True):
+            CpuBudget(4, cores=[0, 1, 2, 3], affinity=True).install()
+            assert executors._stage_cores == {"ocr": (0, 1), "nlp": (2, 3)}
+
+    def test_affinity_after_executor_creation_fails(self):
+        with patch.dict(executors._executors, {"ocr": MagicMock()}, clear=True), \
+             patch.dict(executors._stage_cores, clear=True):
+            with pytest.raises(RuntimeError):
+                CpuBudget(4, cores=[0, 1, 2, 3], affinity=True).install()
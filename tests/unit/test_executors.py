@@ -0,0 +1,77 @@
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from app.services import executors
+from app.services.executors import NLP, StageExecutor, shutdown_executors, stage_executor
+
+
+@pytest.fixture(autouse=True)
+def fresh_executors():
+    # Isolate the registry so engines built by other tests keep their pools.
+    with patch.dict(executors._executors, clear=True):
+        yield
+        shutdown_executors()
+
+
+class TestStageExecutor:
+    def test_rejects_empty_pool(self):
+        with pytest.raises(ValueError):
+            StageExecutor("ocr", 0)
+
+    def test_runs_tasks_on_named_threads(self):
+        executor = StageExecutor("nlp", 1)
+        try:
+            assert executor.submit(lambda: threading.current_thread().name).result().startswith("nlp-worker")
+        finally:
+            executor.shutdown()
+
+    def test_exports_utilisation_metrics(self):
+        with patch.object(executors, "_BUSY_SECONDS") as busy, \
+             patch.object(executors, "_ACTIVE") as active, \
+             patch.object(executors, "_QUEUED") as queued:
+            executor = StageExecutor("ocr", 1)
+            started, release = threading.Event(), threading.Event()
+            first = executor.submit(lambda: (started.set(), release.wait()))
+            started.wait()
+            second = executor.submit(lambda: None)
+
+            assert active.labels.return_value.set.call_args[0][0] == 1
+            assert queued.labels.return_value.set.call_args[0][0] == 1
+
+            release.set()
+            first.result()
+            second.result()
+            executor.shutdown()
+
+        busy.labels.assert_called_with(stage="ocr")
+        assert busy.labels.return_value.inc.call_count == 2
+        assert active.labels.return_value.set.call_args[0][0] == 0
+        assert queued.labels.return_value.set.call_args[0][0] == 0
+
+    def test_cancelled_task_leaves_the_queue(self):
+        with patch.object(executors, "_QUEUED") as queued:
+            executor = StageExecutor("decode", 1)
+            release = threading.Event()
+            executor.submit(release.wait)
+            pending = executor.submit(lambda: None)
+
+            assert pending.cancel()
+            release.set()
+            executor.shutdown()
+
+        assert queued.labels.return_value.set.call_args[0][0] == 0
+
+
+class TestStageExecutorRegistry:
+    def test_executor_is_shared_per_stage(self):
+        assert stage_executor(NLP) is stage_executor(NLP)
+
+    def test_sized_from_settings(self):
+        with patch("app.services.executors.settings.decode_workers", 3):
+            assert stage_executor("decode")._max_workers == 3
+
+    def test_unknown_stage(self):
+        with pytest.raises(ValueError):
+            stage_executor("search")
@@ -1,3 +1,4 @@
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -89,14 +90,8 @@ class TestFlorence2OcrEngineExtractText:
         self._setup_processor(processor_instance, parsed)
         model_instance.generate.return_value = MagicMock()
 
-        with patch("app.engines.florence2_engine.Image") as mock_image:
-            mock_image.open.return_value.__enter__ = MagicMock()
-            img_mock = MagicMock()
-            img_mock.width = 100
-            img_mock.height = 200
-            mock_image.open.return_value.convert.return_value = img_mock
-
-            engine = Florence2OcrEngine()
+        with patch("app.engines.florence2_engine.decode_image", return_value=(MagicMock(), (100, 200))):
+            engine = Florence2OcrEngine(kv_cache=False)
             result = await engine.extract_text(FAKE_BYTES)
 
         assert isinstance(result, OcrResult)
@@ -108,19 +103,111 @@ class TestFlorence2OcrEngineExtractText:
         self._setup_processor(processor_instance, parsed)
         model_instance.generate.return_value = MagicMock()
 
-        with patch("app.engines.florence2_engine.Image") as mock_image:
-            img_mock = MagicMock()
-            img_mock.width = 100
-            img_mock.height = 200
-            mock_image.open.return_value.convert.return_value = img_mock
-
-            engine = Florence2OcrEngine()
+        with patch("app.engines.florence2_engine.decode_image", return_value=(MagicMock(), (100, 200))):
+            engine = Florence2OcrEngine(kv_cache=False)
             result = await engine.extract_text(FAKE_BYTES)
 
         assert "The Great Gatsby" in result.text
         assert "F Scott Fitzgerald" in result.text
 
 
+class _ScriptedLanguageModel:
+    """Emits ``script`` one token per call and records the decoder inputs."""
+
+    def __init__(self, script, vocab=10, **generation):
+        self.script = list(script)
+        self.vocab = vocab
+        self.calls = []
+        self.generation_config = SimpleNamespace(
+            decoder_start_token_id=2, eos_token_id=2, **generation
+        )
+
+    def get_encoder(self):
+        return lambda **kwargs: "encoder-outputs"
+
+    def __call__(self, **kwargs):
+        step = len(self.calls)
+        self.calls.append(kwargs)
+        logits = torch.zeros(1, 1, self.vocab)
+        logits[0, -1, self.script[step]] = 1.0
+        # The runner-up token wins whenever the scripted one is banned.
+        logits[0, -1, (self.script[step] + 1) % self.vocab] = 0.5
+        return SimpleNamespace(logits=logits, past_key_values=("past", step))
+
+
+class TestFlorence2OcrEngineKvCache:
+    def _engine(self, mock_transformers, language_model, **kwargs):
+        _, _, model_instance, _ = mock_transformers
+        model_instance.language_model = language_model
+        model_instance._merge_input_ids_with_image_features.return_value = ("embeds", "mask")
+        return Florence2OcrEngine(**kwargs)
+
+    def test_feeds_only_the_last_token_with_the_cache(self, mock_transformers):
+        lm = _ScriptedLanguageModel([5, 6, 2])
+        engine = self._engine(mock_transformers, lm)
+
+        tokens = engine._greedy_generate(MagicMock(), MagicMock())
+
+        assert tokens == [2, 5, 6, 2]
+        assert [c["decoder_input_ids"].tolist() for c in lm.calls] == [[[2]], [[5]], [[6]]]
+        assert [c["past_key_values"] for c in lm.calls] == [None, ("past", 0), ("past", 1)]
+        assert all(c["use_cache"] and c["encoder_outputs"] == "encoder-outputs" for c in lm.calls)
+        assert all(c["attention_mask"] == "mask" for c in lm.calls)
+
+    def test_forced_bos_token(self, mock_transformers):
+        lm = _ScriptedLanguageModel([7, 5, 2], forced_bos_token_id=0)
+        engine = self._engine(mock_transformers, lm)
+
+        assert engine._greedy_generate(MagicMock(), MagicMock()) == [2, 0, 5, 2]
+
+    def test_forced_eos_at_max_length(self, mock_transformers):
+        lm = _ScriptedLanguageModel([5, 6, 7], forced_eos_token_id=2)
+        engine = self._engine(mock_transformers, lm)
+
+        with patch("app.engines.florence2_engine._MAX_NEW_TOKENS", 3):
+            assert engine._greedy_generate(MagicMock(), MagicMock()) == [2, 5, 6, 2]
+
+    def test_no_repeat_ngram(self, mock_transformers):
+        # 5 6 5 would repeat the bigram "5 6" with 6 again; the runner-up 7 is used.
+        lm = _ScriptedLanguageModel([5, 6, 5, 6, 2], no_repeat_ngram_size=2)
+        engine = self._engine(mock_transformers, lm)
+
+        assert engine._greedy_generate(MagicMock(), MagicMock()) == [2, 5, 6, 5, 7, 2]
+
+    @pytest.mark.asyncio
+    async def test_extract_text_uses_cached_loop(self, mock_transformers):
+        _, _, model_instance, processor_instance = mock_transformers
+        TestFlorence2OcrEngineExtractText()._setup_processor(processor_instance, _make_mock_parsed())
+        engine = self._engine(mock_transformers, _ScriptedLanguageModel([5, 2]))
+
+        with patch("app.engines.florence2_engine.decode_image", return_value=(MagicMock(), (100, 200))):
+            result = await engine.extract_text(FAKE_BYTES)
+
+        model_instance.generate.assert_not_called()
+        processor_instance.batch_decode.assert_called_once_with([[2, 5, 2]], skip_special_tokens=False)
+        assert "The Great Gatsby" in result.text
+
+    def test_beam_search_falls_back_to_generate(self, mock_transformers):
+        assert not Florence2OcrEngine(num_beams=3)._kv_cache
+
+    def test_int8_quantizes_linear_layers(self, mock_transformers):
+        with patch("app.engines.florence2_engine.torch.ao.quantization.quantize_dynamic") as quantize:
+            engine = Florence2OcrEngine(int8=True)
+        _, _, model_instance, _ = mock_transformers
+        quantize.assert_called_once_with(model_instance, {torch.nn.Linear}, dtype=torch.qint8)
+        assert engine._model is quantize.return_value
+
+    def test_int8_and_bf16_are_exclusive(self, mock_transformers):
+        with pytest.raises(ValueError):
+            Florence2OcrEngine(int8=True, bf16=True)
+
+    def test_bf16_needs_native_support(self, mock_transformers):
+        with patch("app.engines.florence2_engine.cpu_isa_features", return_value={"avx2"}):
+            assert not Florence2OcrEngine(bf16=True)._bf16
+        with patch("app.engines.florence2_engine.cpu_isa_features", return_value={"avx512_bf16"}):
+            assert Florence2OcrEngine(bf16=True)._bf16
+
+
 class TestBuildOcrResult:
     def test_quad_to_coordinate_pairs(self):
         ocr_data = {
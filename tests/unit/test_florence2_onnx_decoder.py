@@ -0,0 +1,361 @@
+import ctypes
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from app.engines.florence2_onnx_decoder import ContinuousBatchDecoder
+
+NUM_LAYERS = 6
+VOCAB = 16
+EOS = 2
+ENC_LEN = 5
+TIMEOUT = 5
+
+
+def _output_names():
+    names = ["logits"]
+    for layer in range(NUM_LAYERS):
+        names.extend([
+            f"present.{layer}.decoder.key",
+            f"present.{layer}.decoder.value",
+            f"present.{layer}.encoder.key",
+            f"present.{layer}.encoder.value",
+        ])
+    return names
+
+
+class _ScriptedSession:
+    """Mock decoder whose next token per row is read from the row's encoder hidden state.
+
+    Row r of ``encoder_hidden_states`` carries a request id in ``[r, 0, 0]``;
+    ``scripts[request_id]`` is the token sequence that request generates. The
+    decoder KV tensors carry the request id too, so tests can check that KV
+    rows stay aligned with their requests when rows are sliced out.
+    """
+
+    def __init__(self, scripts: dict[int, list[int]], fail_on_call: int | None = None):
+        self._scripts = scripts
+        self._fail_on_call = fail_on_call
+        self._lock = threading.Lock()
+        self.feeds: list[dict] = []
+        self._outputs = []
+        for name in _output_names():
+            out = MagicMock()
+            out.name = name
+            self._outputs.append(out)
+
+    def get_outputs(self):
+        return self._outputs
+
+    def run(self, _, feed):
+        with self._lock:
+            self.feeds.append(feed)
+            call = len(self.feeds)
+        if self._fail_on_call == call:
+            raise RuntimeError("decoder crashed")
+
+        ids = feed["encoder_hidden_states"][:, 0, 0].astype(int)
+        past = feed["past_key_values.0.decoder.key"]
+        step = past.shape[2]
+        if step:
+            # KV rows must still belong to the same requests.
+            assert (past[:, 0, 0, 0].astype(int) == ids).all()
+        logits = np.zeros((len(ids), 1, VOCAB), dtype=np.float32)
+        for row, rid in enumerate(ids):
+            script = self._scripts[rid]
+            logits[row, 0, script[min(step, len(script) - 1)]] = 10.0
+        dec_kv = np.repeat(ids.astype(np.float32)[:, None, None, None], step + 1, axis=2)
+        dec_kv = np.broadcast_to(dec_kv, (len(ids), 12, step + 1, 64)).copy()
+        enc_kv = np.zeros((len(ids), 12, ENC_LEN, 64), dtype=np.float32)
+        outs = [logits]
+        for _ in range(NUM_LAYERS):
+            outs.extend([dec_kv, dec_kv, enc_kv, enc_kv])
+        return outs
+
+
+class _FakeOrtValue:
+    def __init__(self, array):
+        self._array = array
+
+    def numpy(self):
+        return self._array
+
+
+class _FakeBinding:
+    def __init__(self, session):
+        self._session = session
+        self.inputs: dict = {}
+        self.outputs: list = []
+        self.bind_counts: dict[str, int] = {}
+        self.result = []
+
+    def bind_cpu_input(self, name, array):
+        self.bind_counts[name] = self.bind_counts.get(name, 0) + 1
+        self.inputs[name] = array
+
+    def bind_ortvalue_input(self, name, value):
+        assert isinstance(value, _FakeOrtValue)
+        self.inputs[name] = value.numpy()
+
+    def clear_binding_outputs(self):
+        self.outputs = []
+
+    def bind_output(self, name, device, device_id=0, element_type=None, shape=None, buffer_ptr=None):
+        self.outputs.append((name, shape, buffer_ptr))
+
+    def get_outputs(self):
+        return self.result
+
+
+class _BindingScriptedSession(_ScriptedSession):
+    def __init__(self, scripts):
+        super().__init__(scripts)
+        self.bindings: list[_FakeBinding] = []
+
+    def io_binding(self):
+        binding = _FakeBinding(self)
+        self.bindings.append(binding)
+        return binding
+
+    def run_with_iobinding(self, binding):
+        outs = self.run(None, dict(binding.inputs))
+        name, shape, ptr = binding.outputs[0]
+        assert name == "logits" and ptr is not None
+        buffer = np.ctypeslib.as_array(ctypes.cast(ptr, ctypes.POINTER(ctypes.c_float)), shape=shape)
+        buffer[...] = outs[0]
+        binding.result = [None] + [_FakeOrtValue(o) for o in outs[1:]]
+
+
+def _hidden(*request_ids: int) -> np.ndarray:
+    hidden = np.zeros((len(request_ids), ENC_LEN, 8), dtype=np.float32)
+    hidden[:, 0, 0] = request_ids
+    return hidden
+
+
+def _make_decoder(session, max_active=8, max_tokens=1024, io_binding=False, workers=4):
+    return ContinuousBatchDecoder(
+        session,
+        embed=lambda ids: np.zeros(ids.shape + (8,), dtype=np.float32),
+        eos_token_id=EOS,
+        max_active=max_active,
+        max_tokens=max_tokens,
+        io_binding=io_binding,
+        executor=ThreadPoolExecutor(max_workers=workers),
+    )
+
+
+class TestContinuousBatchDecoder:
+    def test_cohort_shares_one_run_per_step(self):
+        session = _ScriptedSession({0: [5, 6, EOS], 1: [7, 8, EOS], 2: [9, 10, EOS]})
+        decoder = _make_decoder(session)
+
+        futures = decoder.submit(_hidden(0, 1, 2))
+
+        assert [f.result(TIMEOUT) for f in futures] == [
+            [EOS, 5, 6, EOS],
+            [EOS, 7, 8, EOS],
+            [EOS, 9, 10, EOS],
+        ]
+        # prefill + 2 decode steps, each covering all three rows
+        assert len(session.feeds) == 3
+        assert all(f["inputs_embeds"].shape[0] == 3 for f in session.feeds)
+
+    def test_finished_row_leaves_and_kv_rows_are_sliced(self):
+        session = _ScriptedSession({0: [5, 6, 7, EOS], 1: [EOS], 2: [9, 10, 11, EOS]})
+        decoder = _make_decoder(session)
+
+        futures = decoder.submit(_hidden(0, 1, 2))
+
+        assert [f.result(TIMEOUT) for f in futures] == [
+            [EOS, 5, 6, 7, EOS],
+            [EOS, EOS],
+            [EOS, 9, 10, 11, EOS],
+        ]
+        decode_feeds = session.feeds[1:]
+        assert all(f["inputs_embeds"].shape[0] == 2 for f in decode_feeds)
+        assert all(f["past_key_values.0.encoder.key"].shape[0] == 2 for f in decode_feeds)
+        # The scripted session asserts KV rows still match request ids.
+        assert decode_feeds[0]["encoder_hidden_states"][:, 0, 0].tolist() == [0, 2]
+
+    def test_late_joiner_decodes_alongside_running_cohort(self):
+        release = threading.Event()
+        scripts = {0: [5] * 50 + [EOS], 1: [7, EOS]}
+        session = _ScriptedSession(scripts)
+        original_run = session.run
+
+        def gated_run(names, feed):
+            # Hold the first cohort after its prefill until the joiner is queued.
+            if len(session.feeds) == 1:
+                release.wait(TIMEOUT)
+            return original_run(names, feed)
+        session.run = gated_run
+        decoder = _make_decoder(session)
+
+        [first] = decoder.submit(_hidden(0))
+        [late] = decoder.submit(_hidden(1))
+        release.set()
+
+        assert late.result(TIMEOUT) == [EOS, 7, EOS]
+        assert first.result(TIMEOUT) == [EOS] + [5] * 50 + [EOS]
+
+    def test_max_active_queues_until_capacity_frees(self):
+        session = _ScriptedSession({0: [5, EOS], 1: [6, EOS], 2: [7, EOS]})
+        decoder = _make_decoder(session, max_active=2)
+
+        futures = decoder.submit(_hidden(0, 1, 2))
+
+        assert [f.result(TIMEOUT) for f in futures] == [
+            [EOS, 5, EOS], [EOS, 6, EOS], [EOS, 7, EOS],
+        ]
+        assert max(f["inputs_embeds"].shape[0] for f in session.feeds) == 2
+
+    def test_cohorts_share_the_executor_workers(self):
+        session = _ScriptedSession({0: [5] * 20 + [EOS], 1: [6] * 20 + [EOS], 2: [7, EOS]})
+        original_run = session.run
+        lock = threading.Lock()
+        running, peak = 0, 0
+
+        def counting_run(names, feed):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            try:
+                return original_run(names, feed)
+            finally:
+                with lock:
+                    running -= 1
+        session.run = counting_run
+        decoder = _make_decoder(session, workers=1)
+
+        futures = [f for i in range(3) for f in decoder.submit(_hidden(i))]
+
+        assert [len(f.result(TIMEOUT)) for f in futures] == [22, 22, 3]
+        assert peak == 1
+
+    def test_default_executor_is_the_ocr_stage(self):
+        from app.services.executors import OCR, stage_executor
+        decoder = ContinuousBatchDecoder(
+            _ScriptedSession({}), embed=lambda ids: ids, eos_token_id=EOS
+        )
+        assert decoder._executor is stage_executor(OCR)
+
+    def test_max_tokens_limit(self):
+        session = _ScriptedSession({0: [5]})
+        decoder = _make_decoder(session, max_tokens=4)
+
+        [future] = decoder.submit(_hidden(0))
+
+        assert future.result(TIMEOUT) == [EOS, 5, 5, 5, 5]
+
+    def test_prefill_failure_fails_every_row_and_frees_capacity(self):
+        session = _ScriptedSession({0: [EOS], 1: [EOS], 2: [5, EOS]}, fail_on_call=1)
+        decoder = _make_decoder(session, max_active=2)
+
+        futures = decoder.submit(_hidden(0, 1))
+        for f in futures:
+            with pytest.raises(RuntimeError, match="decoder crashed"):
+                f.result(TIMEOUT)
+
+        [after] = decoder.submit(_hidden(2))
+        assert after.result(TIMEOUT) == [EOS, 5, EOS]
+
+    def test_step_failure_keeps_results_of_rows_that_already_finished(self):
+        session = _ScriptedSession({0: [EOS], 1: [5, 6, EOS]}, fail_on_call=2)
+        decoder = _make_decoder(session)
+
+        done, failed = decoder.submit(_hidden(0, 1))
+
+        assert done.result(TIMEOUT) == [EOS, EOS]
+        with pytest.raises(RuntimeError, match="decoder crashed"):
+            failed.result(TIMEOUT)
+
+    def test_cancelled_request_does_not_break_later_requests(self):
+        release = threading.Event()
+        session = _ScriptedSession({0: [5] * 1000, 1: [6, 7, EOS], 2: [8, EOS]})
+        original_run = session.run
+
+        def gated_run(names, feed):
+            if len(session.feeds) == 1:
+                release.wait(TIMEOUT)
+            return original_run(names, feed)
+        session.run = gated_run
+        decoder = _make_decoder(session)
+
+        cancelled, survivor = decoder.submit(_hidden(0, 1))
+        assert cancelled.cancel()
+        release.set()
+
+        assert survivor.result(TIMEOUT) == [EOS, 6, 7, EOS]
+        # The cancelled row is dropped instead of decoding to max_tokens.
+        assert len(session.feeds) < 10
+
+        [later] = decoder.submit(_hidden(2))
+        assert later.result(TIMEOUT) == [EOS, 8, EOS]
+
+    def test_fully_cancelled_cohort_skips_prefill(self):
+        session = _ScriptedSession({0: [5, EOS]})
+        decoder = _make_decoder(session, max_active=1)
+        blocker = threading.Event()
+        original_run = session.run
+
+        def gated_run(names, feed):
+            blocker.wait(TIMEOUT)
+            return original_run(names, feed)
+        session.run = gated_run
+
+        [running] = decoder.submit(_hidden(0))
+        [queued] = decoder.submit(_hidden(0))
+        assert queued.cancel()
+        blocker.set()
+
+        assert running.result(TIMEOUT) == [EOS, 5, EOS]
+        wait([queued], TIMEOUT)
+        # prefill + one step for the running request only
+        assert len(session.feeds) == 2
+
+    def test_decode_runs_synchronously(self):
+        session = _ScriptedSession({0: [5, 6, EOS]})
+        decoder = _make_decoder(session)
+
+        assert decoder.decode(_hidden(0), np.ones((1, ENC_LEN), dtype=np.int64)) == [EOS, 5, 6, EOS]
+
+
+class TestContinuousBatchDecoderIoBinding:
+    def test_matches_feed_dict_results_with_rows_retiring(self):
+        scripts = {0: [5, 6, 7, EOS], 1: [EOS], 2: [9, 10, 11, 12, EOS]}
+        plain = _make_decoder(_ScriptedSession(scripts))
+        session = _BindingScriptedSession(scripts)
+        bound = _make_decoder(session, io_binding=True)
+
+        expected = [f.result(TIMEOUT) for f in plain.submit(_hidden(0, 1, 2))]
+        results = [f.result(TIMEOUT) for f in bound.submit(_hidden(0, 1, 2))]
+
+        assert results == expected
+
+    def test_static_inputs_bound_once_per_row_set(self):
+        session = _BindingScriptedSession({0: [5, 6, 7, EOS], 1: [EOS], 2: [9, 10, 11, EOS]})
+        decoder = _make_decoder(session, io_binding=True)
+
+        [f.result(TIMEOUT) for f in decoder.submit(_hidden(0, 1, 2))]
+
+        # Row 1 retires after prefill, so a single binding covers every step
+        # for the remaining two rows; static inputs are bound exactly once.
+        assert len(session.bindings) == 1
+        binding = session.bindings[0]
+        assert binding.bind_counts["encoder_hidden_states"] == 1
+        assert binding.bind_counts["past_key_values.0.encoder.key"] == 1
+        assert binding.bind_counts["inputs_embeds"] == 3
+
+    def test_rebinds_when_rows_retire_mid_decode(self):
+        session = _BindingScriptedSession({0: [5, EOS], 1: [6, 7, 8, EOS]})
+        decoder = _make_decoder(session, io_binding=True)
+
+        results = [f.result(TIMEOUT) for f in decoder.submit(_hidden(0, 1))]
+
+        assert results == [[EOS, 5, EOS], [EOS, 6, 7, 8, EOS]]
+        assert len(session.bindings) == 2
+        assert session.bindings[1].inputs["encoder_hidden_states"].shape[0] == 1
@@ -1,3 +1,5 @@
+import asyncio
+import os
 from unittest.mock import MagicMock, patch
 
 import numpy as np
@@ -49,15 +51,16 @@ def _make_sessions():
 @pytest.fixture
 def mock_onnx_deps():
     with patch(f"{MODULE}.ort") as mock_ort, \
-         patch(f"{MODULE}.AutoProcessor") as mock_proc_cls:
+         patch(f"{MODULE}.Florence2Processor") as mock_proc_cls:
         mock_ort.SessionOptions.return_value = MagicMock()
 
         sessions = _make_sessions()
         mock_ort.InferenceSession.side_effect = list(sessions.values())
 
         processor_instance = MagicMock()
-        processor_instance.tokenizer.eos_token_id = 2
-        mock_proc_cls.from_pretrained.return_value = processor_instance
+        processor_instance.eos_token_id = 2
+        processor_instance.prompt_ids = np.zeros((1, 9), dtype=np.int64)
+        mock_proc_cls.return_value = processor_instance
 
         yield sessions, processor_instance
 
@@ -75,17 +78,18 @@ def _configure_embed_run(sessions):
     sessions["embed_tokens"].run.side_effect = _embed_side_effect
 
 
-def _build_engine(sessions, processor_instance):
-    """Build engine with fresh mocks for ort and AutoProcessor."""
+def _build_engine(sessions, processor_instance, **engine_kwargs):
+    """Build engine with fresh mocks for ort and Florence2Processor."""
     _configure_embed_run(sessions)
     with patch(f"{MODULE}.ort") as mock_ort, \
-         patch(f"{MODULE}.AutoProcessor") as mock_proc_cls:
+         patch(f"{MODULE}.Florence2Processor") as mock_proc_cls:
         mock_ort.SessionOptions.return_value = MagicMock()
         mock_ort.InferenceSession.side_effect = list(sessions.values())
-        mock_proc_cls.from_pretrained.return_value = processor_instance
+        mock_proc_cls.return_value = processor_instance
 
         from app.engines.florence2_onnx_engine import Florence2OnnxEngine
-        return Florence2OnnxEngine(model_path="/fake/path"), mock_ort
+        engine_kwargs.setdefault("model_path", "/fake/path")
+        return Florence2OnnxEngine(**engine_kwargs), mock_ort
 
 
 class TestFlorence2OnnxEngineInit:
@@ -99,10 +103,10 @@ class TestFlorence2OnnxEngineInit:
         sessions = _make_sessions()
         _configure_embed_run(sessions)
         with patch(f"{MODULE}.ort") as mock_ort, \
-             patch(f"{MODULE}.AutoProcessor") as mock_proc_cls:
+             patch(f"{MODULE}.Florence2Processor") as mock_proc_cls:
             mock_ort.SessionOptions.return_value = MagicMock()
             mock_ort.InferenceSession.side_effect = list(sessions.values())
-            mock_proc_cls.from_pretrained.return_value = proc
+            mock_proc_cls.return_value = proc
 
             from app.engines.florence2_onnx_engine import Florence2OnnxEngine
             Florence2OnnxEngine(model_path="/fake/path", quantization="q4")
@@ -118,10 +122,10 @@ class TestFlorence2OnnxEngineInit:
         sessions = _make_sessions()
         _configure_embed_run(sessions)
         with patch(f"{MODULE}.ort") as mock_ort, \
-             patch(f"{MODULE}.AutoProcessor") as mock_proc_cls:
+             patch(f"{MODULE}.Florence2Processor") as mock_proc_cls:
             mock_ort.SessionOptions.return_value = MagicMock()
             mock_ort.InferenceSession.side_effect = list(sessions.values())
-            mock_proc_cls.from_pretrained.return_value = proc
+            mock_proc_cls.return_value = proc
 
             from app.engines.florence2_onnx_engine import Florence2OnnxEngine
             Florence2OnnxEngine(model_path="/fake/path", quantization="")
@@ -130,21 +134,42 @@ class TestFlorence2OnnxEngineInit:
             assert any("vision_encoder.onnx" in p for p in paths)
             assert any("decoder_model_merged.onnx" in p for p in paths)
 
-    def test_processor_loaded_from_local_path(self, mock_onnx_deps):
+    def test_per_graph_quantization_overrides(self, mock_onnx_deps):
         _, proc = mock_onnx_deps
         sessions = _make_sessions()
         _configure_embed_run(sessions)
         with patch(f"{MODULE}.ort") as mock_ort, \
-             patch(f"{MODULE}.AutoProcessor") as mock_proc_cls:
+             patch(f"{MODULE}.Florence2Processor") as mock_proc_cls:
             mock_ort.SessionOptions.return_value = MagicMock()
             mock_ort.InferenceSession.side_effect = list(sessions.values())
-            mock_proc_cls.from_pretrained.return_value = proc
+            mock_proc_cls.return_value = proc
+
+            from app.engines.florence2_onnx_engine import Florence2OnnxEngine
+            Florence2OnnxEngine(
+                model_path="/fake/path", quantization="q4", vision_quantization="fp16", encoder_quantization=""
+            )
+
+            paths = [str(c[0][0]) for c in mock_ort.InferenceSession.call_args_list]
+            assert any("vision_encoder_fp16.onnx" in p for p in paths)
+            assert any("embed_tokens_q4.onnx" in p for p in paths)
+            assert any(p.endswith("encoder_model.onnx") for p in paths)
+            assert any("decoder_model_merged_q4.onnx" in p for p in paths)
+
+    def test_processor_loaded_from_model_path(self, mock_onnx_deps):
+        _, proc = mock_onnx_deps
+        sessions = _make_sessions()
+        _configure_embed_run(sessions)
+        with patch(f"{MODULE}.ort") as mock_ort, \
+             patch(f"{MODULE}.Florence2Processor") as mock_proc_cls:
+            mock_ort.SessionOptions.return_value = MagicMock()
+            mock_ort.InferenceSession.side_effect = list(sessions.values())
+            mock_proc_cls.return_value = proc
 
             from app.engines.florence2_onnx_engine import Florence2OnnxEngine
             Florence2OnnxEngine(model_path="/fake/path")
 
-            mock_proc_cls.from_pretrained.assert_called_once_with(
-                "microsoft/Florence-2-base-ft", trust_remote_code=True, local_files_only=True
+            mock_proc_cls.assert_called_once_with(
+                "/fake/path", "microsoft/Florence-2-base-ft", task=TASK
             )
 
 
@@ -164,26 +189,18 @@ class TestFlorence2OnnxEngineExtractText:
         kv_tensors = [np.zeros((1, 12, 1, 64), dtype=np.float32)] * (NUM_LAYERS * 4)
         sessions["decoder"].run.return_value = [decoder_logits] + kv_tensors
 
-        # Processor: return correct shapes for pixel_values and input_ids.
-        # input_ids must be 2D (1, seq_len) so that input_ids[0] is a 1D
-        # index array suitable for numpy fancy indexing into _embedding_weights.
-        def _inputs_getitem(self_mock, key):
-            if key == "pixel_values":
-                return np.zeros((1, 3, 768, 768), dtype=np.float32)
-            return np.zeros((1, 9), dtype=np.int64)  # input_ids
-
-        inputs_mock = MagicMock()
-        inputs_mock.__getitem__ = _inputs_getitem
-        processor_instance.return_value = inputs_mock
-        processor_instance.batch_decode.return_value = ["<fake text>"]
-        processor_instance.post_process_generation.return_value = {
-            TASK: {
-                "labels": ["The Great Gatsby", "F Scott Fitzgerald"],
-                "quad_boxes": [
-                    [0, 0, 50, 0, 50, 10, 0, 10],
-                    [0, 15, 60, 15, 60, 25, 0, 25],
-                ],
-            }
+        # Processor: pixel_values shaped by the incoming batch; the prompt
+        # ids are a fixed (1, seq_len) array repeated per image.
+        processor_instance.preprocess.side_effect = lambda images: np.zeros(
+            (len(images), 3, 768, 768), dtype=np.float32
+        )
+        processor_instance.decode.return_value = "<fake text>"
+        processor_instance.parse_ocr.return_value = {
+            "labels": ["The Great Gatsby", "F Scott Fitzgerald"],
+            "quad_boxes": [
+                [0, 0, 50, 0, 50, 10, 0, 10],
+                [0, 15, 60, 15, 60, 25, 0, 25],
+            ],
         }
 
     @pytest.mark.asyncio
@@ -193,17 +210,14 @@ class TestFlorence2OnnxEngineExtractText:
 
         engine, _ = _build_engine(_make_sessions_with(sessions), processor_instance)
 
-        with patch(f"{MODULE}.Image") as mock_image:
-            img_mock = MagicMock()
-            img_mock.width = 100
-            img_mock.height = 200
-            mock_image.open.return_value.convert.return_value = img_mock
-
+        with patch(f"{MODULE}.decode_image", return_value=(MagicMock(), (100, 200))):
             result = await engine.extract_text(FAKE_BYTES)
 
         assert isinstance(result, OcrResult)
         assert "The Great Gatsby" in result.text
         assert "F Scott Fitzgerald" in result.text
+        # Regions are mapped to the original image size, not the decoded one.
+        assert processor_instance.parse_ocr.call_args.kwargs["image_size"] == (100, 200)
 
     @pytest.mark.asyncio
     async def test_calls_vision_encoder(self, mock_onnx_deps):
@@ -212,16 +226,44 @@ class TestFlorence2OnnxEngineExtractText:
 
         engine, _ = _build_engine(_make_sessions_with(sessions), processor_instance)
 
-        with patch(f"{MODULE}.Image") as mock_image:
-            img_mock = MagicMock()
-            img_mock.width = 100
-            img_mock.height = 200
-            mock_image.open.return_value.convert.return_value = img_mock
-
+        with patch(f"{MODULE}.decode_image", return_value=(MagicMock(), (100, 200))):
             await engine.extract_text(FAKE_BYTES)
 
         sessions["vision_encoder"].run.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_encoder_run(self, mock_onnx_deps):
+        sessions, processor_instance = mock_onnx_deps
+        self._setup_mocks(sessions, processor_instance)
+
+        # Shape outputs by the incoming batch so a batch of 2 round-trips.
+        sessions["vision_encoder"].run.side_effect = lambda _, feed: [
+            np.zeros((feed["pixel_values"].shape[0], 577, 768), dtype=np.float32)
+        ]
+        sessions["encoder"].run.side_effect = lambda _, feed: [feed["inputs_embeds"]]
+
+        def _decoder_run(_, feed):
+            n = feed["inputs_embeds"].shape[0]
+            logits = np.zeros((n, 1, 51289), dtype=np.float32)
+            logits[:, 0, 2] = 10.0
+            return [logits] + [np.zeros((n, 12, 1, 64), dtype=np.float32)] * (NUM_LAYERS * 4)
+        sessions["decoder"].run.side_effect = _decoder_run
+
+        engine, _ = _build_engine(_make_sessions_with(sessions), processor_instance)
+
+        with patch(f"{MODULE}.decode_image", return_value=(MagicMock(), (100, 200))):
+            results = await asyncio.gather(
+                engine.extract_text(FAKE_BYTES), engine.extract_text(FAKE_BYTES)
+            )
+
+        assert all(isinstance(r, OcrResult) for r in results)
+        sessions["vision_encoder"].run.assert_called_once()
+        assert sessions["vision_encoder"].run.call_args[0][1]["pixel_values"].shape[0] == 2
+        assert sessions["encoder"].run.call_args[0][1]["inputs_embeds"].shape == (2, 586, 768)
+        # Both rows are prefilled together and finish on EOS in the same call.
+        sessions["decoder"].run.assert_called_once()
+        assert sessions["decoder"].run.call_args[0][1]["inputs_embeds"].shape[0] == 2
+
 
 def _make_sessions_with(real_sessions):
     """Return session dict that reuses pre-configured mock sessions."""
@@ -233,7 +275,7 @@ def _make_sessions_with(real_sessions):
     }
 
 
-class TestGreedyDecode:
+class TestSynchronousDecode:
     def _make_engine(self, sessions, processor_instance):
         engine = _build_engine(
             _make_sessions_with(sessions), processor_instance
@@ -264,10 +306,10 @@ class TestGreedyDecode:
 
         encoder_hidden = np.zeros((1, 578, 768), dtype=np.float32)
         attention_mask = np.ones((1, 578), dtype=np.int64)
-        result = engine._greedy_decode(encoder_hidden, attention_mask)
+        result = engine._batch_decoder.decode(encoder_hidden, attention_mask)
 
         # Should have: [EOS_start, 100, EOS_end]
-        assert result[0] == [2, 100, 2]
+        assert result == [2, 100, 2]
 
     def test_max_tokens_limit(self, mock_onnx_deps):
         sessions, processor_instance = mock_onnx_deps
@@ -281,10 +323,10 @@ class TestGreedyDecode:
 
         encoder_hidden = np.zeros((1, 578, 768), dtype=np.float32)
         attention_mask = np.ones((1, 578), dtype=np.int64)
-        result = engine._greedy_decode(encoder_hidden, attention_mask, max_tokens=5)
+        result = engine._batch_decoder.decode(encoder_hidden, attention_mask, max_tokens=5)
 
         # Should have: [EOS_start, 100, 100, 100, 100, 100] (1 seed + 5 generated)
-        assert len(result[0]) == 6
+        assert len(result) == 6
 
     def test_kv_cache_passed_correctly(self, mock_onnx_deps):
         sessions, processor_instance = mock_onnx_deps
@@ -307,7 +349,7 @@ class TestGreedyDecode:
 
         encoder_hidden = np.zeros((1, 578, 768), dtype=np.float32)
         attention_mask = np.ones((1, 578), dtype=np.int64)
-        engine._greedy_decode(encoder_hidden, attention_mask)
+        engine._batch_decoder.decode(encoder_hidden, attention_mask)
 
         # Verify second call (decode step) has KV cache and use_cache_branch=True
         assert sessions["decoder"].run.call_count == 2
@@ -331,12 +373,46 @@ class TestGreedyDecode:
 
         encoder_hidden = np.zeros((1, 578, 768), dtype=np.float32)
         attention_mask = np.ones((1, 578), dtype=np.int64)
-        engine._greedy_decode(encoder_hidden, attention_mask)
+        engine._batch_decoder.decode(encoder_hidden, attention_mask)
 
         # embed_tokens.run must NOT be called during decode (numpy indexing is used instead)
         assert sessions["embed_tokens"].run.call_count == init_call_count
 
 
+class TestInGraphGeneration:
+    def _make_engine(self, sessions, processor_instance):
+        generator = _make_mock_session(["sequences"])
+        generator.run.side_effect = lambda _, feed: [
+            np.array([[2, 100, 101, 2]], dtype=np.int64)
+        ]
+        all_sessions = {**_make_sessions_with(sessions), "generator": generator}
+        engine, mock_ort = _build_engine(all_sessions, processor_instance, in_graph_generation=True)
+        return engine, mock_ort, generator
+
+    def test_loads_generator_graph(self, mock_onnx_deps):
+        sessions, proc = mock_onnx_deps
+        _, mock_ort, _ = self._make_engine(sessions, proc)
+
+        paths = [str(c[0][0]) for c in mock_ort.InferenceSession.call_args_list]
+        assert any("greedy_generate_q4.onnx" in p for p in paths)
+
+    def test_each_row_is_one_generator_run(self, mock_onnx_deps):
+        sessions, proc = mock_onnx_deps
+        engine, _, generator = self._make_engine(sessions, proc)
+
+        encoder_hidden = np.zeros((2, 578, 768), dtype=np.float32)
+        with patch.object(engine, "_encode_batch", return_value=encoder_hidden):
+            futures = engine._encode_and_submit([MagicMock(), MagicMock()])
+            tokens = [f.result(timeout=5) for f in futures]
+
+        assert tokens == [[2, 100, 101, 2]] * 2
+        assert generator.run.call_count == 2
+        feed = generator.run.call_args[0][1]
+        assert feed["encoder_hidden_states"].shape == (1, 578, 768)
+        assert feed["encoder_attention_mask"].shape == (1, 578)
+        sessions["decoder"].run.assert_not_called()
+
+
 class TestFlorence2OnnxEngineInitEmbedding:
     def test_embedding_weights_shape(self, mock_onnx_deps):
         sessions, proc = mock_onnx_deps
@@ -348,3 +424,177 @@ class TestFlorence2OnnxEngineInitEmbedding:
         _build_engine(_make_sessions_with(sessions), proc)
         # Chunked extraction: ceil(51289 / 1024) = 51 chunks
         assert sessions["embed_tokens"].run.call_count == 51
+
+
+class TestEmbeddingCache:
+    @pytest.fixture
+    def model_dir(self, tmp_path):
+        (tmp_path / "onnx").mkdir()
+        return tmp_path
+
+    def _build(self, proc, model_dir, **kwargs):
+        sessions = _make_sessions()
+        engine, _ = _build_engine(sessions, proc, model_path=str(model_dir), embedding_cache=True, **kwargs)
+        return engine, sessions
+
+    def test_miss_extracts_and_persists_memory_mapped_table(self, mock_onnx_deps, model_dir):
+        _, proc = mock_onnx_deps
+        engine, sessions = self._build(proc, model_dir)
+
+        assert sessions["embed_tokens"].run.call_count == 51
+        files = list((model_dir / "onnx").glob("embed_tokens_q4.*.float32.npy"))
+        assert len(files) == 1
+        assert isinstance(engine._embedding_weights, np.memmap)
+
+    def test_hit_skips_extraction(self, mock_onnx_deps, model_dir):
+        _, proc = mock_onnx_deps
+        self._build(proc, model_dir)
+        engine, sessions = self._build(proc, model_dir)
+
+        sessions["embed_tokens"].run.assert_not_called()
+        assert engine._embedding_weights.shape == (51289, 768)
+
+    def test_cache_is_keyed_by_dtype(self, mock_onnx_deps, model_dir):
+        _, proc = mock_onnx_deps
+        self._build(proc, model_dir)
+        engine, sessions = self._build(proc, model_dir, embedding_dtype="float16")
+
+        assert sessions["embed_tokens"].run.call_count == 51
+        assert engine._embedding_weights.dtype == np.float16
+
+    def test_fp16_lookup_upcasts_rows(self, mock_onnx_deps, model_dir):
+        _, proc = mock_onnx_deps
+        engine, _ = self._build(proc, model_dir, embedding_dtype="float16")
+
+        embeds = engine._embed(np.array([[1, 2, 3]], dtype=np.int64))
+
+        assert embeds.shape == (1, 3, 768)
+        assert embeds.dtype == np.float32
+
+    def test_unexpected_layout_is_rebuilt(self, mock_onnx_deps, model_dir):
+        _, proc = mock_onnx_deps
+        engine, _ = self._build(proc, model_dir)
+        path = next((model_dir / "onnx").glob("embed_tokens_q4.*.npy"))
+        del engine
+        np.save(path, np.zeros((10, 768), dtype=np.float32))
+
+        engine, sessions = self._build(proc, model_dir)
+
+        assert sessions["embed_tokens"].run.call_count == 51
+        assert engine._embedding_weights.shape == (51289, 768)
+
+    def test_unwritable_dir_falls_back_to_memory(self, mock_onnx_deps, tmp_path):
+        _, proc = mock_onnx_deps
+        engine, _ = self._build(proc, tmp_path / "missing")
+
+        assert engine._embedding_weights.shape == (51289, 768)
+        assert not isinstance(engine._embedding_weights, np.memmap)
+
+
+class TestOptimizedGraphCache:
+    @pytest.fixture
+    def source(self, tmp_path):
+        path = tmp_path / "vision_encoder_q4.onnx"
+        path.write_bytes(b"graph")
+        return path
+
+    def _create(self, source, cache_dir, write_error=None, bundled=False):
+        import onnxruntime as ort
+
+        from app.engines.florence2_onnx_engine import _create_session
+
+        opts = ort.SessionOptions()
+        calls = []
+
+        def fake_session(path, session_opts):
+            # ORT writes the optimized graph while the session is created.
+            calls.append((path, session_opts.graph_optimization_level, session_opts.optimized_model_filepath))
+            if session_opts.optimized_model_filepath:
+                if write_error is not None:
+                    raise write_error
+                with open(session_opts.optimized_model_filepath, "wb") as f:
+                    f.write(b"optimized")
+            return MagicMock()
+
+        with patch(f"{MODULE}.ort.InferenceSession", side_effect=fake_session):
+            _, cache = _create_session(source, opts, cache_dir, bundled=bundled)
+        return cache, calls, opts
+
+    def test_miss_optimizes_source_and_persists_graph(self, source, tmp_path):
+        cache, calls, opts = self._create(source, tmp_path / "optimized")
+
+        assert cache == "miss"
+        assert calls[0][0] == str(source)
+        files = list((tmp_path / "optimized").iterdir())
+        assert [f.name.split(".")[0] for f in files] == ["vision_encoder_q4"]
+        assert files[0].read_bytes() == b"optimized"
+        assert opts.optimized_model_filepath == ""
+
+    def test_hit_loads_optimized_graph_without_reoptimizing(self, source, tmp_path):
+        import onnxruntime as ort
+
+        self._create(source, tmp_path / "optimized")
+        cache, calls, opts = self._create(source, tmp_path / "optimized")
+
+        assert cache == "hit"
+        assert calls[0][0].startswith(str(tmp_path / "optimized"))
+        assert calls[0][1] == ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        assert opts.graph_optimization_level == ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+    def test_changed_source_is_rebuilt(self, source, tmp_path):
+        self._create(source, tmp_path / "optimized")
+        source.write_bytes(b"new revision")
+
+        cache, _, _ = self._create(source, tmp_path / "optimized")
+
+        assert cache == "miss"
+        assert len(list((tmp_path / "optimized").iterdir())) == 2
+
+    def test_bundled_graph_hits_after_copy_resets_mtime(self, source, tmp_path):
+        self._create(source, tmp_path / "optimized", bundled=True)
+        os.utime(source, (1_000_000, 1_000_000))
+
+        cache, _, _ = self._create(source, tmp_path / "optimized", bundled=True)
+
+        assert cache == "hit"
+
+    def test_unbundled_graph_is_rebuilt_when_mtime_changes(self, source, tmp_path):
+        self._create(source, tmp_path / "optimized")
+        os.utime(source, (1_000_000, 1_000_000))
+
+        cache, _, _ = self._create(source, tmp_path / "optimized")
+
+        assert cache == "miss"
+
+    def test_unwritable_cache_dir_loads_source(self, source, tmp_path):
+        (tmp_path / "file").write_bytes(b"")
+
+        cache, calls, _ = self._create(source, tmp_path / "file" / "optimized")
+
+        assert cache == "off"
+        assert [(path, written) for path, _, written in calls] == [(str(source), "")]
+
+    def test_read_only_cache_dir_loads_source(self, source, tmp_path):
+        (tmp_path / "optimized").mkdir()
+
+        with patch(f"{MODULE}.os.access", return_value=False):
+            cache, calls, _ = self._create(source, tmp_path / "optimized")
+
+        assert cache == "off"
+        assert [(path, written) for path, _, written in calls] == [(str(source), "")]
+
+    def test_failed_graph_write_falls_back_to_uncached_session(self, source, tmp_path):
+        error = RuntimeError("[ONNXRuntimeError] : 2 : INVALID_ARGUMENT : Failed to open file")
+
+        cache, calls, opts = self._create(source, tmp_path / "optimized", write_error=error)
+
+        assert cache == "off"
+        assert [path for path, _, _ in calls] == [str(source), str(source)]
+        assert calls[1][2] == "" and opts.optimized_model_filepath == ""
+        assert list((tmp_path / "optimized").iterdir()) == []
+
+    def test_engine_reports_per_session_load_times(self, mock_onnx_deps):
+        sessions, proc = mock_onnx_deps
+        engine, _ = _build_engine(sessions, proc)
+
+        assert set(engine.session_load_ms) == {"vision_encoder", "embed_tokens", "encoder_model", "decoder_model_merged"}
@@ -0,0 +1,100 @@
+import json
+
+import numpy as np
+import pytest
+from PIL import Image
+from tokenizers import Tokenizer, models, pre_tokenizers, processors
+
+from app.engines.florence2_processing import Florence2Processor
+
+PROMPT_WORDS = ["What", "is", "the", "text", "in", "image,", "with", "regions?"]
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    """Model directory with a tiny word-level tokenizer standing in for BART's."""
+    vocab = {"<s>": 0, "<pad>": 1, "</s>": 2, "<unk>": 3}
+    for word in PROMPT_WORDS:
+        vocab[word] = len(vocab)
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="<s> $A </s>", special_tokens=[("<s>", 0), ("</s>", 2)]
+    )
+    tokenizer.save(str(tmp_path / "tokenizer.json"))
+    return tmp_path
+
+
+def _processor(model_dir):
+    return Florence2Processor(model_dir, "unused/processor")
+
+
+class TestFlorence2ProcessorInit:
+    def test_prompt_is_tokenised_once_with_special_tokens(self, model_dir):
+        processor = _processor(model_dir)
+
+        ids = processor.prompt_ids
+        assert ids.dtype == np.int64
+        assert ids.shape == (1, len("What is the text in the image, with regions?".split()) + 2)
+        assert ids[0, 0] == 0 and ids[0, -1] == 2
+
+    def test_eos_token_id_from_tokenizer(self, model_dir):
+        assert _processor(model_dir).eos_token_id == 2
+
+    def test_missing_tokenizer_raises(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            _processor(tmp_path)
+
+
+class TestFlorence2ProcessorPreprocess:
+    def test_resizes_and_normalises(self, model_dir):
+        processor = _processor(model_dir)
+        white = Image.new("RGB", (300, 500), (255, 255, 255))
+
+        pixels = processor.preprocess([white, white])
+
+        assert pixels.shape == (2, 3, 768, 768)
+        assert pixels.dtype == np.float32
+        expected = (1.0 - np.array([0.485, 0.456, 0.406])) / np.array([0.229, 0.224, 0.225])
+        np.testing.assert_allclose(pixels[0, :, 0, 0], expected, rtol=1e-5)
+
+    def test_preprocessor_config_overrides_defaults(self, model_dir):
+        (model_dir / "preprocessor_config.json").write_text(json.dumps({
+            "size": {"height": 32, "width": 64},
+            "image_mean": [0.0, 0.0, 0.0],
+            "image_std": [1.0, 1.0, 1.0],
+        }))
+        processor = _processor(model_dir)
+
+        pixels = processor.preprocess([Image.new("RGB", (10, 10), (255, 0, 0))])
+
+        assert pixels.shape == (1, 3, 32, 64)
+        np.testing.assert_allclose(pixels[0, :, 0, 0], [1.0, 0.0, 0.0], atol=1e-6)
+
+
+class TestFlorence2ProcessorParseOcr:
+    def test_dequantises_loc_bins_to_bin_centres(self, model_dir):
+        processor = _processor(model_dir)
+        text = "<s>HELLO<loc_0><loc_0><loc_999><loc_0><loc_999><loc_999><loc_0><loc_999></s>"
+
+        parsed = processor.parse_ocr(text, image_size=(1000, 2000))
+
+        assert parsed["labels"] == ["HELLO"]
+        assert parsed["quad_boxes"] == [[0.5, 1.0, 999.5, 1.0, 999.5, 1999.0, 0.5, 1999.0]]
+
+    def test_keeps_leading_eos_like_florence_post_processor(self, model_dir):
+        processor = _processor(model_dir)
+        loc = "<loc_10>" * 8
+        text = f"</s><s>A NOVEL{loc}SNOW CRASH{loc}</s>"
+
+        parsed = processor.parse_ocr(text, image_size=(100, 100))
+
+        assert parsed["labels"] == ["</s>A NOVEL", "SNOW CRASH"]
+        assert len(parsed["quad_boxes"]) == 2
+
+    def test_trailing_text_without_locations_is_dropped(self, model_dir):
+        processor = _processor(model_dir)
+
+        parsed = processor.parse_ocr("<s>no boxes here</s>", image_size=(100, 100))
+
+        assert parsed == {"quad_boxes": [], "labels": []}
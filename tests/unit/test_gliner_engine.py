@@ -1,4 +1,6 @@
+import asyncio
 import sys
+import threading
 import types
 import pytest
 from unittest.mock import MagicMock, patch
@@ -205,6 +207,118 @@ async def test_titles_sorted_by_height_descending(mock_gliner_module):
     ]
     from app.engines.gliner_engine import GlinerNlpEngine
     engine = GlinerNlpEngine()
-    ocr = _make_ocr_with_regions([("A Wizard Of Earthsea", 80), ("Mistborn", 300)])
+    ocr = _make_ocr_with_regions([("A Wizard Of Earthsea", 150), ("Mistborn", 300)])
     result = await engine.analyze(ocr)
     assert result.potential_titles == ["Mistborn", "A Wizard Of Earthsea"]
+
+
+async def test_predicts_on_the_nlp_executor(mock_gliner_module):
+    threads = []
+    mock_gliner_module.from_pretrained.return_value.predict_entities.side_effect = (
+        lambda *args, **kwargs: threads.append(threading.current_thread().name) or []
+    )
+
+    from app.engines.gliner_engine import GlinerNlpEngine
+    engine = GlinerNlpEngine()
+    await engine.analyze(_make_ocr("Brandon Sanderson Mistborn"))
+
+    assert threads[0].startswith("nlp-worker")
+
+
+async def test_sizes_torch_threads_from_cpu_budget(mock_gliner_module):
+    mock_gliner_module.from_pretrained.return_value.predict_entities.return_value = []
+    budget = MagicMock()
+    budget.nlp_thread_count.return_value = 3
+
+    from app.engines.gliner_engine import GlinerNlpEngine
+    engine = GlinerNlpEngine(cpu_budget=budget)
+    with patch("app.engines.gliner_engine.set_torch_threads") as set_threads:
+        await engine.analyze(_make_ocr("Brandon Sanderson Mistborn"))
+
+    set_threads.assert_called_once_with(3)
+
+
+def test_bundled_model_loads_its_own_tokenizer(mock_gliner_module):
+    from app.engines.gliner_engine import GlinerNlpEngine
+    GlinerNlpEngine(model_name="/bundle/gliner", bundled=True)
+
+    mock_gliner_module.from_pretrained.assert_called_once_with("/bundle/gliner", load_tokenizer=True)
+
+
+async def test_concurrent_requests_share_one_batched_call(mock_gliner_module):
+    model = mock_gliner_module.from_pretrained.return_value
+    model.inference.return_value = [
+        [{"text": "Fonda Lee", "label": "author", "score": 0.9, "start": 0, "end": 9}],
+        [{"text": "Mistborn", "label": "book title", "score": 0.9, "start": 18, "end": 26},
+         {"text": "Brandon Sanderson", "label": "author", "score": 0.9, "start": 0, "end": 17}],
+    ]
+
+    from app.engines.gliner_engine import GlinerNlpEngine
+    engine = GlinerNlpEngine(max_batch_size=8, batch_window_ms=50)
+    jade, mistborn = await asyncio.gather(
+        engine.analyze(_make_ocr_with_regions([("Fonda Lee", 100)])),
+        engine.analyze(_make_ocr_with_regions([("Brandon Sanderson", 80), ("Mistborn", 300)])),
+    )
+
+    model.inference.assert_called_once_with(
+        ["Fonda Lee", "Brandon Sanderson Mistborn"], ["author", "book title"], threshold=0.4, batch_size=2
+    )
+    model.predict_entities.assert_not_called()
+    assert jade.potential_authors == ["Fonda Lee"]
+    assert jade.potential_titles == []
+    # Each request's own region heights rank its entities.
+    assert mistborn.potential_authors == ["Brandon Sanderson"]
+    assert mistborn.potential_titles == ["Mistborn"]
+
+
+async def test_batch_size_one_disables_batching(mock_gliner_module):
+    model = mock_gliner_module.from_pretrained.return_value
+    model.predict_entities.return_value = []
+
+    from app.engines.gliner_engine import GlinerNlpEngine
+    engine = GlinerNlpEngine(max_batch_size=1, batch_window_ms=50)
+    await asyncio.gather(engine.analyze(_make_ocr("Fonda Lee")), engine.analyze(_make_ocr("Mistborn")))
+
+    assert model.predict_entities.call_count == 2
+    model.inference.assert_not_called()
+
+
+async def test_precomputed_label_embeddings(mock_gliner_module):
+    model = mock_gliner_module.from_pretrained.return_value
+    model.config.labels_encoder = "BAAI/bge-small-en-v1.5"
+    model.encode_labels.return_value = "label-embeddings"
+    model.batch_predict_with_embeds.return_value = [
+        [{"text": "Brandon Sanderson", "label": "author", "score": 0.95}]
+    ]
+
+    from app.engines.gliner_engine import GlinerNlpEngine
+    engine = GlinerNlpEngine(label_embeddings=True)
+    result = await engine.analyze(_make_ocr("Brandon Sanderson Mistborn"))
+
+    model.encode_labels.assert_called_once_with(["author", "book title"])
+    model.batch_predict_with_embeds.assert_called_once_with(
+        ["Brandon Sanderson Mistborn"], "label-embeddings", ["author", "book title"], threshold=0.4, batch_size=1
+    )
+    model.predict_entities.assert_not_called()
+    assert result.potential_authors == ["Brandon Sanderson"]
+
+
+def test_label_embeddings_need_a_bi_encoder(mock_gliner_module):
+    mock_gliner_module.from_pretrained.return_value.config.labels_encoder = None
+
+    from app.engines.gliner_engine import GlinerNlpEngine
+    with pytest.raises(ValueError, match="bi-encoder"):
+        GlinerNlpEngine(label_embeddings=True)
+
+
+async def test_small_regions_are_pruned_before_gliner(mock_gliner_module):
+    model = mock_gliner_module.from_pretrained.return_value
+    model.predict_entities.return_value = []
+
+    from app.engines.gliner_engine import GlinerNlpEngine
+    engine = GlinerNlpEngine()
+    await engine.analyze(_make_ocr_with_regions([
+        ("JADE CITY", 700), ("FONDA LEE", 200), ("Gripping and stylish - Ken Liu", 60),
+    ]))
+
+    assert model.predict_entities.call_args[0][0] == "Jade City Fonda Lee"
@@ -0,0 +1,78 @@
+import sys
+import types
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.config import settings
+from app.models import OcrBoundingBox, OcrResult
+from app.services.cpu_budget import CpuBudget
+
+
+def _make_ocr_with_regions(regions: list[tuple[str, float]]) -> OcrResult:
+    boxes = [
+        OcrBoundingBox(text=text, confidence=1.0, coordinates=[[0, 0], [100, 0], [100, h], [0, h]])
+        for text, h in regions
+    ]
+    return OcrResult(text=" ".join(t for t, _ in regions), regions=boxes)
+
+
+@pytest.fixture(autouse=True)
+def mock_gliner_module():
+    """Inject a fake gliner module so tests run without installing the package."""
+    gliner_mod = types.ModuleType("gliner")
+    gliner_mod.GLiNER = MagicMock()
+    with patch.dict(sys.modules, {"gliner": gliner_mod}):
+        sys.modules.pop("app.engines.gliner_engine", None)
+        sys.modules.pop("app.engines.gliner_onnx_engine", None)
+        yield gliner_mod.GLiNER
+
+
+def test_loads_onnx_model_from_settings(mock_gliner_module):
+    from app.engines.gliner_onnx_engine import GlinerOnnxEngine
+    GlinerOnnxEngine()
+
+    args, kwargs = mock_gliner_module.from_pretrained.call_args
+    assert args == (settings.gliner_onnx_model_path,)
+    assert kwargs["load_onnx_model"] is True
+    assert kwargs["onnx_model_file"] == settings.gliner_onnx_model_file == "model_int8.onnx"
+    assert kwargs["load_tokenizer"] is True
+    assert kwargs["session_options"].intra_op_num_threads == settings.onnx_num_threads
+
+
+def test_session_gets_nlp_share_of_cpu_budget(mock_gliner_module):
+    from app.engines.gliner_onnx_engine import GlinerOnnxEngine
+    GlinerOnnxEngine(model_path="/models/gliner-onnx", model_file="model.onnx", cpu_budget=CpuBudget(4, ocr_share=0.25))
+
+    args, kwargs = mock_gliner_module.from_pretrained.call_args
+    assert args == ("/models/gliner-onnx",)
+    assert kwargs["onnx_model_file"] == "model.onnx"
+    assert kwargs["session_options"].intra_op_num_threads == 3
+
+
+async def test_same_analysis_shape_and_height_ranking(mock_gliner_module):
+    mock_gliner_module.from_pretrained.return_value.predict_entities.return_value = [
+        {"text": "Fonda Lee", "label": "author", "score": 0.90, "start": 0, "end": 9},
+        {"text": "Brandon Sanderson", "label": "author", "score": 0.85, "start": 10, "end": 27},
+        {"text": "Mistborn", "label": "book title", "score": 0.92, "start": 28, "end": 36},
+    ]
+    from app.engines.gliner_onnx_engine import GlinerOnnxEngine
+    engine = GlinerOnnxEngine()
+    ocr = _make_ocr_with_regions([("Fonda Lee", 100), ("Brandon Sanderson", 200), ("Mistborn", 300)])
+    result = await engine.analyze(ocr)
+
+    assert result.potential_authors == ["Brandon Sanderson", "Fonda Lee"]
+    assert result.potential_titles == ["Mistborn"]
+    mock_gliner_module.from_pretrained.return_value.predict_entities.assert_called_once_with(
+        "Fonda Lee Brandon Sanderson Mistborn", ["author", "book title"], threshold=0.4
+    )
+
+
+def test_nlp_engine_setting_selects_onnx_engine(mock_gliner_module):
+    from app import main
+    with patch.object(settings, "nlp_engine", "gliner_onnx"), \
+         patch("app.engines.gliner_onnx_engine.GlinerOnnxEngine") as engine_cls:
+        engine = main._load_nlp_engine(None, None)
+
+    assert engine is engine_cls.return_value
+    engine_cls.assert_called_once_with(model_path=settings.gliner_onnx_model_path, cpu_budget=None)
@@ -0,0 +1,63 @@
+import io
+
+import pytest
+from PIL import Image
+
+from app.services.images import ImageTooLargeError, decode_image
+
+
+def _encode(image: Image.Image, fmt: str, **kwargs) -> bytes:
+    buf = io.BytesIO()
+    image.save(buf, format=fmt, **kwargs)
+    return buf.getvalue()
+
+
+def _jpeg(width: int, height: int, orientation: int | None = None) -> bytes:
+    image = Image.new("RGB", (width, height), (200, 30, 30))
+    if orientation is None:
+        return _encode(image, "JPEG")
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    return _encode(image, "JPEG", exif=exif)
+
+
+class TestDecodeImage:
+    def test_jpeg_is_drafted_to_at_least_target_size(self):
+        image, size = decode_image(_jpeg(4000, 3000), target_size=768, max_pixels=50_000_000)
+
+        assert size == (4000, 3000)
+        assert image.mode == "RGB"
+        assert 768 <= image.height < 3000
+        assert 768 <= image.width < 4000
+
+    def test_small_jpeg_is_not_upscaled(self):
+        image, size = decode_image(_jpeg(500, 400), target_size=768, max_pixels=50_000_000)
+
+        assert image.size == size == (500, 400)
+
+    def test_zero_target_decodes_full_resolution(self):
+        image, size = decode_image(_jpeg(2000, 1600), target_size=0, max_pixels=50_000_000)
+
+        assert image.size == size == (2000, 1600)
+
+    def test_exif_orientation_is_applied(self):
+        image, size = decode_image(_jpeg(1600, 1200, orientation=6), target_size=0, max_pixels=50_000_000)
+
+        assert size == (1200, 1600)
+        assert image.size == (1200, 1600)
+
+    def test_png_decodes_at_full_size(self):
+        data = _encode(Image.new("RGBA", (900, 800)), "PNG")
+
+        image, size = decode_image(data, target_size=768, max_pixels=50_000_000)
+
+        assert image.mode == "RGB"
+        assert image.size == size == (900, 800)
+
+    def test_oversized_header_is_rejected(self):
+        with pytest.raises(ImageTooLargeError, match="4000x3000"):
+            decode_image(_jpeg(4000, 3000), target_size=768, max_pixels=10_000_000)
+
+    def test_invalid_bytes_raise(self):
+        with pytest.raises(OSError):
+            decode_image(b"not an image", target_size=768, max_pixels=50_000_000)
@@ -0,0 +1,79 @@
+import pytest
+
+from app.services.model_bundle import MANIFEST, BundleError, bundle_version, load_bundle, write_manifest
+
+
+@pytest.fixture
+def bundle_dir(tmp_path):
+    root = tmp_path / "bundle"
+    (root / "florence2-onnx" / "onnx").mkdir(parents=True)
+    (root / "gliner").mkdir()
+    (root / "florence2-onnx" / "onnx" / "vision_encoder_q4.onnx").write_bytes(b"vision")
+    (root / "florence2-onnx" / "tokenizer.json").write_text("{}")
+    (root / "gliner" / "pytorch_model.bin").write_bytes(b"weights")
+    write_manifest(root, {"version": "v1"})
+    return root
+
+
+def test_manifest_lists_every_file_with_size_and_checksum(bundle_dir):
+    bundle = load_bundle(bundle_dir)
+
+    files = bundle.manifest["files"]
+    assert set(files) == {
+        "florence2-onnx/onnx/vision_encoder_q4.onnx",
+        "florence2-onnx/tokenizer.json",
+        "gliner/pytorch_model.bin",
+    }
+    assert files["gliner/pytorch_model.bin"]["size"] == 7
+    assert len(files["gliner/pytorch_model.bin"]["sha256"]) == 64
+
+
+def test_bundle_exposes_model_paths(bundle_dir):
+    bundle = load_bundle(bundle_dir)
+
+    assert bundle.version == "v1"
+    assert bundle.onnx_model_path == str(bundle_dir / "florence2-onnx")
+    assert bundle.gliner_model_path == str(bundle_dir / "gliner")
+    assert bundle.gliner_onnx_model_path == str(bundle_dir / "gliner-onnx")
+
+
+def test_missing_manifest_raises(tmp_path):
+    with pytest.raises(BundleError, match="manifest"):
+        load_bundle(tmp_path)
+
+
+def test_missing_file_raises(bundle_dir):
+    (bundle_dir / "gliner" / "pytorch_model.bin").unlink()
+
+    with pytest.raises(BundleError, match="pytorch_model.bin: missing"):
+        load_bundle(bundle_dir)
+
+
+def test_size_mismatch_raises(bundle_dir):
+    (bundle_dir / "florence2-onnx" / "tokenizer.json").write_text("{truncated")
+
+    with pytest.raises(BundleError, match="tokenizer.json: size"):
+        load_bundle(bundle_dir)
+
+
+def test_checksum_is_only_checked_when_verifying(bundle_dir):
+    (bundle_dir / "gliner" / "pytorch_model.bin").write_bytes(b"WEIGHTS")
+
+    load_bundle(bundle_dir)
+    with pytest.raises(BundleError, match="checksum mismatch"):
+        load_bundle(bundle_dir, verify=True)
+
+
+def test_files_written_after_the_manifest_are_ignored(bundle_dir):
+    # The service writes e.g. autotune.json into the bundle at run time.
+    (bundle_dir / "florence2-onnx" / "autotune.json").write_text("{}")
+
+    load_bundle(bundle_dir, verify=True)
+    assert (bundle_dir / MANIFEST).exists()
+
+
+def test_bundle_version_names_its_inputs():
+    version = bundle_version("e88a44eaf379", "abd49a1f1ebc", "", "1.17.0")
+
+    assert version == "florence2-e88a44ea_gliner-abd49a1f_fp32_ort-1.17.0"
+    assert "_gliner-onnx-abd49a1f_" in bundle_version("e88a44eaf379", "abd49a1f1ebc", "", "1.17.0", gliner_onnx=True)
@@ -0,0 +1,101 @@
+from pathlib import Path
+
+import pytest
+
+from app.engines.name_index_engine import NameIndex, NameIndexNlpEngine, write_name_index
+from app.models import OcrBoundingBox, OcrResult
+
+FIXTURES_DIR = Path(__file__).parent.parent / "integration" / "fixtures"
+
+FIRST_NAMES = ["Brandon", "Fonda", "Jade", "Neal", "Steven", "Freya", "Harper", "Ursula"]
+SURNAMES = ["SANDERSON", "LEE", "STEPHENSON", "ERIKSON", "MARSKE", "LE-GUIN"]
+
+
+def _make_ocr_with_regions(regions: list[tuple[str, float]]) -> OcrResult:
+    boxes = [
+        OcrBoundingBox(text=text, confidence=1.0, coordinates=[[0, 0], [100, 0], [100, h], [0, h]])
+        for text, h in regions
+    ]
+    return OcrResult(text=" ".join(t for t, _ in regions), regions=boxes)
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    path = tmp_path / "names.idx"
+    write_name_index(path, FIRST_NAMES, SURNAMES)
+    return str(path)
+
+
+def test_index_round_trip(index_path):
+    index = NameIndex(index_path)
+    assert index.sizes == (len(FIRST_NAMES), len(SURNAMES))
+    assert all(index.is_first_name(name) for name in FIRST_NAMES)
+    assert index.is_surname("Le-Guin")
+    assert not index.is_first_name("SANDERSON")
+    assert not index.is_surname("MISTBORN")
+    assert not index.is_surname("")
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "names.txt"
+    path.write_bytes(b"BRANDON\nSANDERSON\n" * 4)
+    with pytest.raises(ValueError, match="not a name index"):
+        NameIndex(path)
+
+
+def test_two_consecutive_caps_regions(index_path):
+    engine = NameIndexNlpEngine(index_path)
+    analysis = engine.match(_make_ocr_with_regions([("</s>BRANDON", 442), ("SANDERSON", 498), ("MISTBORN", 551)]))
+    assert analysis.potential_authors == ["Brandon Sanderson"]
+    assert analysis.potential_titles == ["Mistborn"]
+
+
+def test_one_region_with_middle_initial(index_path):
+    engine = NameIndexNlpEngine(index_path)
+    analysis = engine.match(_make_ocr_with_regions([("A WIZARD OF", 300), ("EARTHSEA", 320), ("URSULA K LE-GUIN", 150)]))
+    assert analysis.potential_authors == ["Ursula K Le-Guin"]
+    assert analysis.potential_titles == ["A Wizard Of Earthsea"]
+
+
+def test_title_skips_small_taglines(index_path):
+    engine = NameIndexNlpEngine(index_path)
+    analysis = engine.match(_make_ocr_with_regions([
+        ("DELIGHTFUL,", 53), ("A", 178), ("RESTLESS", 208), ("TRUTH", 208), ("FREYA", 73), ("MARSKE", 73),
+    ]))
+    assert analysis.potential_titles == ["A Restless Truth"]
+
+
+@pytest.mark.parametrize("regions", [
+    # Two candidates: a title that looks like a name is ambiguous.
+    [("JADE", 769), ("LEE", 756), ("FONDA LEE", 208)],
+    # Mixed case and reviewer attributions aren't name-shaped.
+    [("Harper Lee", 158), ("MOCKINGBIRD", 158)],
+    [("MISTBORN", 551), ("-BRANDON SANDERSON", 498)],
+    # Unknown surname.
+    [("NEAL", 125), ("MISTBORN", 148)],
+])
+def test_not_confident(index_path, regions):
+    assert NameIndexNlpEngine(index_path).match(_make_ocr_with_regions(regions)) is None
+
+
+async def test_analyze_returns_empty_when_not_confident(index_path):
+    analysis = await NameIndexNlpEngine(index_path).analyze(_make_ocr_with_regions([("MISTBORN", 551)]))
+    assert analysis.potential_authors == [] and analysis.potential_titles == []
+
+
+def test_fixture_covers(index_path):
+    engine = NameIndexNlpEngine(index_path)
+    authors = {}
+    for path in sorted(FIXTURES_DIR.glob("*.json")):
+        analysis = engine.match(OcrResult.model_validate_json(path.read_text()))
+        authors[path.stem] = analysis.potential_authors[0] if analysis is not None else None
+    assert authors == {
+        "a-restless-truth": "Freya Marske",
+        "gardens-of-the-moon": "Steven Erikson",
+        "jade-city": "Fonda Lee",
+        "mistborn": "Brandon Sanderson",
+        "snow-crash": "Neal Stephenson",
+        # Mixed-case author and an unindexed first name fall back to GLiNER.
+        "to-kill-a-mockingbird": None,
+        "under-the-whispering-door": None,
+    }
@@ -0,0 +1,107 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.models import AnalysisStatus, CoverAnalysisResponse, OcrBoundingBox, OcrResult
+from app.services.near_duplicate import NearDuplicateIndex, perceptual_hash, phash
+
+
+def _cover(seed: int) -> Image.Image:
+    """Blocky synthetic cover: large flat regions like title/author panels."""
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(0, 256, (8, 6, 3), dtype=np.uint8)
+    return Image.fromarray(blocks).resize((600, 800), Image.Resampling.NEAREST)
+
+
+def _jpeg(image: Image.Image, quality: int = 90) -> bytes:
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def _response(text: str = "TITLE", coordinates=None) -> CoverAnalysisResponse:
+    region = OcrBoundingBox(
+        text=text, confidence=1.0, coordinates=coordinates or [[10, 20], [110, 20], [110, 40], [10, 40]]
+    )
+    return CoverAnalysisResponse(
+        analysisStatus=AnalysisStatus(is_success=True),
+        ocr_result=OcrResult(text=text, regions=[region]),
+    )
+
+
+class TestPerceptualHash:
+    def test_recompression_keeps_hash_close(self):
+        cover = _cover(1)
+        original, _ = perceptual_hash(_jpeg(cover, 95))
+        recompressed, _ = perceptual_hash(_jpeg(cover, 40))
+
+        assert (original ^ recompressed).bit_count() <= 4
+
+    def test_different_covers_are_far_apart(self):
+        assert (phash(_cover(1)) ^ phash(_cover(2))).bit_count() > 8
+
+    def test_returns_full_resolution_size(self):
+        _, size = perceptual_hash(_jpeg(_cover(1)))
+        assert size == (600, 800)
+
+    def test_undecodable_bytes_return_none(self):
+        assert perceptual_hash(b"not an image") is None
+
+
+class TestNearDuplicateIndex:
+    def test_finds_match_within_distance(self):
+        index = NearDuplicateIndex(max_entries=10, max_distance=8)
+        index.add(0b1011, (100, 100), _response("A"))
+
+        match = index.find(0b1011 ^ (0b111 << 40), (100, 100))  # 3 bits away
+
+        assert match.ocr_result.text == "A"
+
+    def test_misses_beyond_distance(self):
+        index = NearDuplicateIndex(max_entries=10, max_distance=4)
+        index.add(0, (100, 100), _response())
+
+        assert index.find((1 << 5) - 1, (100, 100)) is None  # 5 bits away
+
+    def test_finds_match_spread_across_all_chunks(self):
+        index = NearDuplicateIndex(max_entries=10, max_distance=8)
+        stored = 0x0123_4567_89AB_CDEF
+        index.add(stored, (100, 100), _response())
+        # Two flipped bits in each 16-bit chunk: 8 total.
+        probe = stored ^ sum(0b11 << (16 * i + 3) for i in range(4))
+
+        assert index.find(probe, (100, 100)) is not None
+
+    def test_returns_nearest_candidate(self):
+        index = NearDuplicateIndex(max_entries=10, max_distance=8)
+        index.add(0b1111, (100, 100), _response("far"))
+        index.add(0b0001, (100, 100), _response("near"))
+
+        assert index.find(0, (100, 100)).ocr_result.text == "near"
+
+    def test_evicts_least_recently_used(self):
+        a, b, c = 0, 0xFFFF_0000, 0xFFFF_0000_0000_0000
+        index = NearDuplicateIndex(max_entries=2, max_distance=2)
+        index.add(a, (1, 1), _response("a"))
+        index.add(b, (1, 1), _response("b"))
+        index.find(a, (1, 1))  # a is now most recent
+
+        index.add(c, (1, 1), _response("c"))
+
+        assert len(index) == 2
+        assert index.find(b, (1, 1)) is None
+        assert index.find(a, (1, 1)) is not None
+
+    def test_rescales_regions_to_new_photo(self):
+        index = NearDuplicateIndex(max_entries=10, max_distance=2)
+        index.add(7, (100, 200), _response())
+
+        match = index.find(7, (200, 100))
+
+        assert match.ocr_result.regions[0].coordinates[0] == [20.0, 10.0]
+
+    def test_rejects_out_of_range_distance(self):
+        with pytest.raises(ValueError):
+            NearDuplicateIndex(max_entries=10, max_distance=64)
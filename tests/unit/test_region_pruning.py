@@ -0,0 +1,58 @@
+from pathlib import Path
+
+import pytest
+
+from app.models import OcrResult
+from app.services.autotune import FIXTURE_KEYWORDS
+from app.services.region_pruning import RegionPruner, count_tokens
+
+FIXTURES_DIR = Path(__file__).parent.parent / "integration" / "fixtures"
+
+
+def _regions(stem: str) -> list[tuple[str, float]]:
+    from app.engines.gliner_engine import _regions_with_heights
+    return _regions_with_heights(OcrResult.model_validate_json((FIXTURES_DIR / f"{stem}.json").read_text()))
+
+
+def test_count_tokens_matches_gliner_word_splitting():
+    assert count_tokens("Stylish and -ANN LECKIE") == 5
+    assert count_tokens("") == 0
+
+
+def test_drops_regions_far_below_the_tallest():
+    pruner = RegionPruner(min_height_ratio=0.2)
+    regions = [("JADE", 700.0), ("FONDA LEE", 200.0), ("-KEN LIU", 70.0)]
+    assert pruner.prune(regions) == [("JADE", 700.0), ("FONDA LEE", 200.0)]
+
+
+def test_fine_print_drops_long_small_text_but_keeps_short_names():
+    pruner = RegionPruner(fine_print_height_ratio=0.4, fine_print_max_words=3)
+    regions = [("RESTLESS", 200.0), ("A LUSH HISTORICAL FANTASY", 60.0), ("FREYA", 70.0)]
+    assert pruner.prune(regions) == [("RESTLESS", 200.0), ("FREYA", 70.0)]
+
+
+def test_disabled_pruner_keeps_everything():
+    regions = [("JADE", 700.0), ("-KEN LIU", 10.0)]
+    assert RegionPruner().prune(regions) == regions
+
+
+def test_no_heights_keeps_everything():
+    regions = [("a", 0.0), ("b", 0.0)]
+    assert RegionPruner(min_height_ratio=0.5).prune(regions) == regions
+
+
+@pytest.mark.parametrize("stem", sorted(FIXTURE_KEYWORDS))
+def test_default_settings_never_prune_the_true_author_or_title(stem):
+    kept = " ".join(text for text, _ in RegionPruner.from_settings().prune(_regions(stem))).lower()
+    assert [word for word in FIXTURE_KEYWORDS[stem] if word not in kept] == []
+
+
+def test_default_settings_save_tokens_on_the_fixtures():
+    pruner = RegionPruner.from_settings()
+    before = sum(count_tokens(text) for stem in FIXTURE_KEYWORDS for text, _ in _regions(stem))
+    after = sum(count_tokens(text) for stem in FIXTURE_KEYWORDS for text, _ in pruner.prune(_regions(stem)))
+    # The jade-city reviewer quotes alone are ~25 words.
+    assert before - after >= 40
+
+    jade = " ".join(text for text, _ in pruner.prune(_regions("jade-city"))).lower()
+    assert "leckie" not in jade and "lynch" not in jade
@@ -0,0 +1,138 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from app.models import AnalysisStatus, CoverAnalysisResponse, NlpAnalysis
+from app.services.result_cache import ResultCache, cache_fingerprint
+
+
+def _response(author: str) -> CoverAnalysisResponse:
+    return CoverAnalysisResponse(
+        analysisStatus=AnalysisStatus(is_success=True),
+        nlp_analysis=NlpAnalysis(potential_authors=[author]),
+    )
+
+
+class TestResultCacheKeys:
+    def test_same_bytes_same_key(self):
+        cache = ResultCache(max_entries=4, fingerprint="a")
+        assert cache.key(b"image") == cache.key(b"image")
+        assert cache.key(b"image") != cache.key(b"other")
+
+    def test_fingerprint_changes_key(self):
+        assert ResultCache(4, fingerprint="a").key(b"image") != ResultCache(4, fingerprint="b").key(b"image")
+
+    def test_fingerprint_tracks_output_settings(self):
+        base = cache_fingerprint()
+        with patch("app.services.result_cache.settings.ocr_engine", "pytorch"):
+            assert cache_fingerprint() != base
+        with patch("app.services.result_cache.settings.model_bundle_path", "/bundles/other"):
+            assert cache_fingerprint() != base
+        assert cache_fingerprint(model_bundle_version="florence2-a_gliner-b") != base
+
+    def test_fingerprint_ignores_throughput_settings(self):
+        base = cache_fingerprint()
+        with patch("app.services.result_cache.settings.onnx_num_threads", 99):
+            assert cache_fingerprint() == base
+
+    def test_rejects_non_positive_size(self):
+        with pytest.raises(ValueError):
+            ResultCache(max_entries=0)
+
+
+class TestResultCacheMemory:
+    @pytest.mark.asyncio
+    async def test_miss_then_hit(self):
+        cache = ResultCache(max_entries=4, fingerprint="t")
+
+        assert await cache.get("k") is None
+        await cache.put("k", _response("A"))
+        assert (await cache.get("k")).nlp_analysis.potential_authors == ["A"]
+
+    @pytest.mark.asyncio
+    async def test_evicts_least_recently_used(self):
+        cache = ResultCache(max_entries=2, fingerprint="t")
+        await cache.put("a", _response("A"))
+        await cache.put("b", _response("B"))
+        await cache.get("a")  # a is now most recent
+
+        await cache.put("c", _response("C"))
+
+        assert await cache.get("b") is None
+        assert await cache.get("a") is not None
+        assert await cache.get("c") is not None
+
+
+class TestResultCacheDisk:
+    @pytest.mark.asyncio
+    async def test_entries_survive_restart(self, tmp_path):
+        await ResultCache(4, disk_dir=tmp_path, fingerprint="t").put("abc123", _response("A"))
+
+        restarted = ResultCache(4, disk_dir=tmp_path, fingerprint="t")
+        hit = await restarted.get("abc123")
+
+        assert hit == _response("A")
+        assert (tmp_path / "ab" / "abc123.json").exists()
+
+    @pytest.mark.asyncio
+    async def test_disk_hit_is_promoted_to_memory(self, tmp_path):
+        await ResultCache(4, disk_dir=tmp_path, fingerprint="t").put("abc123", _response("A"))
+        restarted = ResultCache(4, disk_dir=tmp_path, fingerprint="t")
+        await restarted.get("abc123")
+
+        (tmp_path / "ab" / "abc123.json").unlink()
+
+        assert await restarted.get("abc123") is not None
+
+    @pytest.mark.asyncio
+    async def test_corrupt_entry_is_discarded(self, tmp_path):
+        (tmp_path / "ab").mkdir()
+        (tmp_path / "ab" / "abc123.json").write_text("{not json")
+
+        cache = ResultCache(4, disk_dir=tmp_path, fingerprint="t")
+
+        assert await cache.get("abc123") is None
+        assert not (tmp_path / "ab" / "abc123.json").exists()
+
+    @pytest.mark.asyncio
+    async def test_disk_tier_is_pruned_oldest_first(self, tmp_path):
+        cache = ResultCache(max_entries=1, disk_dir=tmp_path, disk_max_entries=10, fingerprint="t")
+        for i in range(10):
+            key = f"{i:02d}key"
+            await cache.put(key, _response(str(i)))
+            path = tmp_path / key[:2] / f"{key}.json"
+            os.utime(path, (1_000_000 + i, 1_000_000 + i))
+
+        await cache.put("10key", _response("10"))
+
+        remaining = sorted(p.stem for p in tmp_path.glob("*/*.json"))
+        assert len(remaining) == 9
+        assert "00key" not in remaining and "01key" not in remaining
+        assert "10key" in remaining
+
+    @pytest.mark.asyncio
+    async def test_prune_skips_files_deleted_by_another_worker(self, tmp_path):
+        cache = ResultCache(max_entries=1, disk_dir=tmp_path, disk_max_entries=10, fingerprint="t")
+        for i in range(10):
+            await cache.put(f"{i:02d}key", _response(str(i)))
+        vanished = tmp_path / "00" / "00key.json"
+        real_stat = type(vanished).stat
+
+        def racing_stat(path, *args, **kwargs):
+            if path == vanished:
+                path.unlink(missing_ok=True)
+            return real_stat(path, *args, **kwargs)
+
+        with patch.object(type(vanished), "stat", racing_stat):
+            await cache.put("10key", _response("10"))
+
+        assert (tmp_path / "10" / "10key.json").exists()
+
+    @pytest.mark.asyncio
+    async def test_disk_failure_does_not_fail_put(self, tmp_path):
+        cache = ResultCache(max_entries=4, disk_dir=tmp_path, fingerprint="t")
+        with patch.object(cache, "_write_disk", side_effect=PermissionError("read-only")):
+            await cache.put("abc123", _response("a"))
+
+        assert await cache.get("abc123") == _response("a")
@@ -6,18 +6,23 @@ from httpx import ASGITransport, AsyncClient
 
 from app.main import app
 from app.models import AnalysisStatus, CoverAnalysisResponse, NlpAnalysis, OcrResult
+from app.services.admission import OverloadedError
+from app.services.result_cache import CacheStatus
 
 
 @pytest.fixture
 def mock_analyzer():
     with patch("app.main.analyzer") as mock:
-        mock.analyze = AsyncMock(
-            return_value=CoverAnalysisResponse(
-                analysisStatus=AnalysisStatus(
-                    is_success=True
+        mock.analyze_with_cache_status = AsyncMock(
+            return_value=(
+                CoverAnalysisResponse(
+                    analysisStatus=AnalysisStatus(
+                        is_success=True
+                    ),
+                    nlp_analysis=NlpAnalysis(potential_authors=["F. Scott Fitzgerald"]),
+                    ocr_result=OcrResult(text="F. Scott Fitzgerald Great Gatsby", regions=[])
                 ),
-                nlp_analysis=NlpAnalysis(potential_authors=["F. Scott Fitzgerald"]),
-                ocr_result=OcrResult(text="F. Scott Fitzgerald Great Gatsby", regions=[])
+                None,
             )
         )
         yield mock
@@ -40,6 +45,28 @@ class TestHealthEndpoint:
         assert data["version"] == "0.1.0"
 
 
+class TestReadyEndpoint:
+    @pytest.mark.asyncio
+    async def test_not_ready_until_warm_up_finishes(self, client):
+        with patch("app.main.readiness") as readiness:
+            readiness.ready = False
+            readiness.status = "warming_up"
+            readiness.warmup_ms = None
+            response = await client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "warming_up"
+
+    @pytest.mark.asyncio
+    async def test_ready_reports_warm_up_latency(self, client):
+        with patch("app.main.readiness") as readiness:
+            readiness.ready = True
+            readiness.status = "ready"
+            readiness.warmup_ms = 812.5
+            response = await client.get("/ready")
+        assert response.status_code == 200
+        assert response.json() == {"status": "ready", "warmupMs": 812.5}
+
+
 class TestAnalyzeEndpoint:
     @pytest.mark.asyncio
     async def test_analyze_success(self, client, mock_analyzer):
@@ -51,7 +78,33 @@ class TestAnalyzeEndpoint:
         assert response.status_code == 200
         data = response.json()
         assert data["analysisStatus"]["isSuccess"] is True
-        mock_analyzer.analyze.assert_called_once()
+        mock_analyzer.analyze_with_cache_status.assert_called_once()
+        assert "X-Cache-Status" not in response.headers
+
+    @pytest.mark.asyncio
+    async def test_cache_status_header(self, client, mock_analyzer):
+        cached, _ = mock_analyzer.analyze_with_cache_status.return_value
+        mock_analyzer.analyze_with_cache_status.return_value = (cached, CacheStatus.HIT)
+
+        response = await client.post(
+            "/analyze",
+            files={"file": ("cover.jpg", io.BytesIO(b"fake image data"), "image/jpeg")},
+        )
+
+        assert response.status_code == 200
+        assert response.headers["X-Cache-Status"] == "HIT"
+
+    @pytest.mark.asyncio
+    async def test_overloaded_returns_503_with_retry_after(self, client, mock_analyzer):
+        mock_analyzer.analyze_with_cache_status.side_effect = OverloadedError(retry_after=7)
+
+        response = await client.post(
+            "/analyze",
+            files={"file": ("cover.jpg", io.BytesIO(b"fake image data"), "image/jpeg")},
+        )
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "7"
 
     @pytest.mark.asyncio
     async def test_invalid_content_type(self, client, mock_analyzer):
@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from prometheus_client import REGISTRY
+
+import app.services.startup as startup_module
+from app.models import NlpAnalysis, OcrResult
+from app.services.startup import Readiness, startup_phase, warm_up
+
+_OCR = OcrResult(text="Brandon Sanderson Mistborn", regions=[])
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def perf_counter(self):
+        return self.now
+
+
+def _engines(clock, costs_ms):
+    """OCR engine whose calls advance ``clock`` by successive ``costs_ms``."""
+    costs = iter(costs_ms)
+
+    async def extract_text(image_bytes):
+        clock.now += next(costs) / 1000
+        return _OCR
+
+    ocr = AsyncMock()
+    ocr.extract_text.side_effect = extract_text
+    nlp = AsyncMock()
+    nlp.analyze.return_value = NlpAnalysis()
+    return ocr, nlp
+
+
+async def _warm_up(costs_ms, **kwargs):
+    clock = _FakeClock()
+    ocr, nlp = _engines(clock, costs_ms)
+    readiness = Readiness()
+    with patch.object(startup_module, "time", SimpleNamespace(perf_counter=clock.perf_counter)):
+        await warm_up(ocr, nlp, b"cover", readiness, **kwargs)
+    return readiness, ocr, nlp
+
+
+async def test_ready_after_first_run_without_budget():
+    readiness, ocr, nlp = await _warm_up([5000])
+
+    assert readiness.status == "ready"
+    assert readiness.warmup_ms == 5000
+    ocr.extract_text.assert_awaited_once_with(b"cover")
+    nlp.analyze.assert_awaited_once_with(_OCR)
+    assert REGISTRY.get_sample_value("cover_detection_ready") == 1
+
+
+async def test_retries_until_a_run_meets_the_budget():
+    readiness, ocr, _ = await _warm_up([3000, 1200, 800], budget_ms=1000, max_runs=3)
+
+    assert readiness.ready
+    assert readiness.warmup_ms == 800
+    assert ocr.extract_text.await_count == 3
+
+
+async def test_not_ready_when_budget_is_never_met():
+    readiness, ocr, _ = await _warm_up([3000, 2000], budget_ms=1000, max_runs=2)
+
+    assert readiness.status == "not_ready"
+    assert readiness.warmup_ms == 2000
+    assert REGISTRY.get_sample_value("cover_detection_ready") == 0
+
+
+async def test_failed_inference_is_not_ready():
+    ocr, nlp = AsyncMock(), AsyncMock()
+    ocr.extract_text.side_effect = RuntimeError("boom")
+    readiness = Readiness()
+
+    await warm_up(ocr, nlp, b"cover", readiness)
+
+    assert readiness.status == "not_ready"
+    nlp.analyze.assert_not_called()
+
+
+def test_startup_phase_exports_its_duration():
+    clock = _FakeClock()
+    with patch.object(startup_module, "time", SimpleNamespace(perf_counter=clock.perf_counter)):
+        with startup_phase("test_phase"):
+            clock.now += 2.5
+
+    assert REGISTRY.get_sample_value("cover_detection_startup_phase_seconds", {"phase": "test_phase"}) == 2.5